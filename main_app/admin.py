@@ -1,5 +1,18 @@
 from django.contrib import admin
 from .models import Literature, Library
+from .membership import set_libraries
 
-admin.site.register(Literature)
-admin.site.register(Library)
\ No newline at end of file
+
+class LiteratureAdmin(admin.ModelAdmin):
+
+    def save_related(self, request, form, formsets, change):
+        # Membership changes go through write_memberships() so they take the
+        # same library locks as the API.
+        libraries = form.cleaned_data.pop('libraries', None)
+        super().save_related(request, form, formsets, change)
+        if libraries is not None:
+            set_libraries(form.instance, libraries)
+
+
+admin.site.register(Literature, LiteratureAdmin)
+admin.site.register(Library)
@@ -0,0 +1,163 @@
+"""
+Async versions of the read endpoints, served under /async/ through the ASGI
+entry point.
+
+They return the same bodies as the DRF views in views.py. They use Django's
+async ORM, so a slow read waits on the event loop instead of holding a
+worker thread. The sync views are unchanged and still serve the usual
+routes.
+"""
+import asyncio
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+
+from .authentication import CachedJWTAuthentication
+from .cache import literature_cache
+from .fieldsets import (
+    LIBRARY_COLUMN_MAP, LIBRARY_DETAIL_FIELDS, LIBRARY_FIELDS, LITERATURE_FIELDS, model_columns, parse_fieldset,
+    select_fields,
+)
+from .filters import filter_literature
+from .models import Library, Literature
+from .pagination import LiteratureCursorPagination
+from .renderers import FastJSONRenderer
+from .payloads import alibrary_literature_page, aliterature_payloads, library_detail_payload, literature_columns
+from .serializers import LibrarySerializer
+
+jwt_authentication = CachedJWTAuthentication()
+
+
+def render(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+async def aauthenticate(request):
+    """Async counterpart of JWTAuthentication.authenticate(); returns a User or None."""
+    header = jwt_authentication.get_header(request)
+    if header is None:
+        return None
+    raw_token = jwt_authentication.get_raw_token(header)
+    if raw_token is None:
+        return None
+    return await jwt_authentication.aget_user(jwt_authentication.get_validated_token(raw_token))
+
+
+class AsyncReadView(View):
+    """Authenticate with the JWT header, then hand over to `respond()`."""
+    http_method_names = ['get', 'options']
+    login_required = False
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            request.user = await aauthenticate(request) or AnonymousUser()
+            if self.login_required and not request.user.is_authenticated:
+                raise NotAuthenticated()
+            return render(await self.respond(request, *args, **kwargs))
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+            return render(detail, exc.status_code)
+
+    async def respond(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+
+class AsyncLiteratureList(AsyncReadView):
+
+    async def respond(self, request):
+        fieldset = parse_fieldset(request.GET, LITERATURE_FIELDS)
+        queryset = filter_literature(Literature.objects.values(*literature_columns(fieldset)), request.GET)
+        paginator = LiteratureCursorPagination()
+        paginator.base_url = request.build_absolute_uri()
+        rows = await paginator.apaginate_rows(queryset, request.GET)
+        return paginator.get_paginated_response(await aliterature_payloads(rows, fieldset)).data
+
+
+class AsyncLiteratureDetail(AsyncReadView):
+    """
+    The literature row and the user's libraries do not depend on each other,
+    so on a cache miss both are fetched with asyncio.gather().
+    """
+
+    async def load_literature(self, id):
+        try:
+            row = await Literature.objects.values(*literature_columns()).aget(id=id)
+        except Literature.DoesNotExist:
+            raise NotFound()
+        return (await aliterature_payloads([row]))[0]
+
+    async def load_user_libraries(self, user):
+        return [library async for library in Library.objects.filter(user=user)]
+
+    async def respond(self, request, id):
+        fieldset = parse_fieldset(request.GET, LITERATURE_FIELDS)
+        user = request.user
+        literature = await literature_cache.aget_literature(id)
+        membership = version = None
+        if user.is_authenticated:
+            membership, version = await literature_cache.aget_membership(id, user.id)
+
+        pending = {}
+        if literature is None:
+            pending['literature'] = self.load_literature(id)
+        if user.is_authenticated and membership is None:
+            pending['libraries'] = self.load_user_libraries(user)
+        loaded = dict(zip(pending, await asyncio.gather(*pending.values())))
+
+        if 'literature' in loaded:
+            literature = loaded['literature']
+            # Always cache the full payload; the fieldset is applied below.
+            await literature_cache.aset_literature(id, literature)
+
+        if not user.is_authenticated:
+            return {'literature': select_fields(literature, fieldset), 'user_owns': False}
+
+        if membership is None:
+            associated_ids = {library['id'] for library in literature['libraries']}
+            membership = {
+                'libraries_not_associated': LibrarySerializer([
+                    library for library in loaded['libraries'] if library.id not in associated_ids
+                ], many=True).data,
+                'user_associated_libraries': [
+                    library for library in literature['libraries'] if library['user'] == user.id
+                ],
+            }
+            await literature_cache.aset_membership(id, user.id, version, membership)
+
+        return {
+            'literature': select_fields(literature, fieldset),
+            'libraries_not_associated': membership['libraries_not_associated'],
+            'user_associated_libraries': membership['user_associated_libraries'],
+            'user_owns': literature['user'] == user.id,
+        }
+
+
+class AsyncLibraryList(AsyncReadView):
+    login_required = True
+
+    async def respond(self, request):
+        fieldset = parse_fieldset(request.GET, LIBRARY_FIELDS)
+        queryset = Library.objects.filter(user=request.user).order_by('name', 'id')
+        if fieldset is not None:
+            queryset = queryset.only(*model_columns(fieldset, LIBRARY_COLUMN_MAP))
+        return LibrarySerializer([library async for library in queryset], many=True, fields=fieldset).data
+
+
+class AsyncLibraryDetail(AsyncReadView):
+    login_required = True
+
+    async def respond(self, request, id):
+        fieldset = parse_fieldset(request.GET, LIBRARY_DETAIL_FIELDS)
+        queryset = Library.objects.filter(user=request.user)
+        if fieldset is not None:
+            queryset = queryset.only(*model_columns(fieldset, LIBRARY_COLUMN_MAP))
+        try:
+            library = await queryset.aget(id=id)
+        except Library.DoesNotExist:
+            raise NotFound()
+        literature, literature_next = [], None
+        if fieldset is None or {'literature', 'literature_next'} & set(fieldset):
+            literature, literature_next = await alibrary_literature_page(library, request.GET, request)
+        return library_detail_payload(library, fieldset, literature, literature_next)
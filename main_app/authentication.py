@@ -0,0 +1,144 @@
+"""
+JWT authentication that keeps recently seen users in memory.
+
+The token already carries the user id, so the only reason to touch
+`auth_user` is to load the flags and fields the views read from
+`request.user`. CachedJWTAuthentication keeps those User rows in a bounded,
+per-process LRU with a TTL. Only the first request in each TTL window
+loads the row. Saving or deleting a user drops their entry (see
+signals.py). Other worker processes catch up within AUTH_USER_CACHE_TTL
+seconds.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """
+    Thread-safe LRU of User instances with a per-entry expiry. Keys are
+    str(pk) because tokens carry the id claim as a string.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.reset_stats()
+
+    @property
+    def ttl(self):
+        return settings.AUTH_USER_CACHE_TTL
+
+    @property
+    def max_entries(self):
+        return settings.AUTH_USER_CACHE_MAX_ENTRIES
+
+    def get(self, user_id):
+        """Return a private copy of the cached user, or None."""
+        user_id, now = str(user_id), time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] <= now:
+                del self.entries[user_id]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(user_id)
+            self.hits += 1
+        # Views may set attributes on request.user, so never hand out the
+        # shared instance.
+        return copy.copy(entry[1])
+
+    def set(self, user, load_seconds=0.0):
+        user_id = str(user.pk)
+        with self.lock:
+            self.entries[user_id] = (time.monotonic() + self.ttl, copy.copy(user))
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            self.load_seconds += load_seconds
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+        self.load_seconds = 0.0
+
+    def snapshot(self):
+        with self.lock:
+            total = self.hits + self.misses
+            average_load = self.load_seconds / self.misses if self.misses else None
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else None,
+                'average_load_ms': average_load * 1000 if average_load is not None else None,
+                # Every hit skips one load of roughly the average cost.
+                'estimated_saved_ms': self.hits * average_load * 1000 if average_load is not None else None,
+            }
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication whose get_user() goes through `user_cache`."""
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    def check_user(self, validated_token, user):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+    def user_not_found(self):
+        return AuthenticationFailed(_('User not found'), code='user_not_found')
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            started = time.perf_counter()
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise self.user_not_found()
+            user_cache.set(user, time.perf_counter() - started)
+        return self.check_user(validated_token, user)
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            started = time.perf_counter()
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise self.user_not_found()
+            user_cache.set(user, time.perf_counter() - started)
+        return self.check_user(validated_token, user)
@@ -0,0 +1,168 @@
+"""
+Normalized authors.
+
+`Literature.authors` stays the display string that clients read: a
+comma-separated list of at most 100 characters, or semicolon-separated
+when a name is written "Last, First". The names behind it are
+also kept, in order, in Author and LiteratureAuthor. That makes "everything
+by this author" an indexed lookup instead of an icontains scan.
+
+A writer can pass the full list as `author_names`. The through table then
+keeps every name, and `authors` is derived from the list, ending in
+"et al." when the names do not fit. Rows written with `authors` alone are
+parsed by split_authors(), which accepts ";", " and " and "," as
+separators.
+
+The post_save receiver in signals.py syncs a row when its authors change.
+Bulk writers call sync_authors() themselves.
+"""
+import re
+
+from django.db.models import Exists, OuterRef
+
+from .models import Author, Literature, LiteratureAuthor
+
+ET_AL = ' et al.'
+AUTHORS_MAX_LENGTH = Literature._meta.get_field('authors').max_length
+NAME_MAX_LENGTH = Author._meta.get_field('name').max_length
+
+# Bounded so IN lists stay under SQLite's host parameter limit.
+QUERY_CHUNK = 900
+
+AND_RE = re.compile(r',?\s+and\s+|,?\s*&\s*', re.IGNORECASE)
+SERIAL_COMMA_RE = re.compile(r',\s*(?:and\s|&)', re.IGNORECASE)
+INITIALS_SEPARATOR_RE = re.compile(r'[\s.-]+')
+
+
+def clean_name(name):
+    return ' '.join(name.split())[:NAME_MAX_LENGTH]
+
+
+def normalize_name(name):
+    """The Author lookup key: whitespace collapsed and case folded."""
+    return clean_name(name).casefold()
+
+
+def split_authors(authors):
+    """
+    Names of a display string, undoing the "et al." of display_authors().
+
+    Names are separated by ";" when there is one, otherwise by " and " or
+    "&", otherwise by ",". Commas inside a name keep "Last, First" pairs
+    together: see split_commas().
+    """
+    authors = authors.strip()
+    if authors.endswith(ET_AL.strip()):
+        authors = authors[:-len(ET_AL.strip())]
+    if ';' in authors:
+        return unique_names(authors.split(';'))
+    parts = AND_RE.split(authors)
+    if SERIAL_COMMA_RE.search(authors):
+        # "Knuth, Lamport, and Hoare": an English list.
+        return unique_names(name for part in parts for name in part.split(','))
+    if len(parts) > 1:
+        # "Doe, Jane and Roe, Richard": each part is one name.
+        return unique_names(parts)
+    return unique_names(split_commas(authors))
+
+
+def split_commas(authors):
+    """
+    Split a comma-separated list, keeping "Last, Initials" pairs: a piece
+    made of initials joins the name before it ("Knuth, D. E., Lamport, L.").
+    "Abelson, Sussman" stays two names; write "Doe, Jane" with a ";" or
+    " and " elsewhere in the string, as display_authors() does.
+    """
+    pieces = [piece.strip() for piece in authors.split(',') if piece.strip()]
+    names = []
+    for piece in pieces:
+        if names and is_initials(piece) and ',' not in names[-1]:
+            names[-1] = f'{names[-1]}, {piece}'
+        else:
+            names.append(piece)
+    return names
+
+
+def is_initials(piece):
+    """True for a given name reduced to initials: "J.", "J. R.", "J.-P."."""
+    letters = [part for part in INITIALS_SEPARATOR_RE.split(piece) if part]
+    return bool(letters) and all(len(letter) == 1 and letter.isalpha() for letter in letters)
+
+
+def unique_names(names):
+    """Cleaned names, first spelling wins, empty ones dropped."""
+    seen = set()
+    result = []
+    for name in map(clean_name, names):
+        key = name.casefold()
+        if key and key not in seen:
+            seen.add(key)
+            result.append(name)
+    return result
+
+
+def display_authors(names):
+    """
+    The `authors` string for `names`, cut to the leading names that fit.
+    Names are joined with "; " when one of them holds a comma, so
+    split_authors() gives the same names back.
+    """
+    separator = '; ' if any(',' in name for name in names) else ', '
+    joined = separator.join(names)
+    if len(joined) <= AUTHORS_MAX_LENGTH:
+        return joined
+    shown = names[0][:AUTHORS_MAX_LENGTH - len(ET_AL)]
+    for name in names[1:]:
+        if len(shown) + len(name) + len(separator) + len(ET_AL) > AUTHORS_MAX_LENGTH:
+            break
+        shown = f'{shown}{separator}{name}'
+    return shown + ET_AL
+
+
+def author_ids(names):
+    """Map normalized names to Author ids, creating the missing authors."""
+    spellings = {normalize_name(name): name for name in names}
+    ids = {}
+    keys = list(spellings)
+    for start in range(0, len(keys), QUERY_CHUNK):
+        ids.update(Author.objects.filter(normalized_name__in=keys[start:start + QUERY_CHUNK]).values_list('normalized_name', 'id'))
+    missing = [key for key in keys if key not in ids]
+    if missing:
+        # ignore_conflicts leaves ids unset, and a concurrent writer may
+        # have created some of them, so read them back.
+        Author.objects.bulk_create(
+            [Author(name=spellings[key], normalized_name=key) for key in missing], ignore_conflicts=True
+        )
+        for start in range(0, len(missing), QUERY_CHUNK):
+            ids.update(Author.objects.filter(normalized_name__in=missing[start:start + QUERY_CHUNK]).values_list('normalized_name', 'id'))
+    return ids
+
+
+def sync_authors(entries):
+    """Replace the authors of each `(literature_id, names)` entry."""
+    entries = [(literature_id, unique_names(names)) for literature_id, names in entries]
+    if not entries:
+        return
+    ids = author_ids([name for _, names in entries for name in names])
+    literature_ids = [literature_id for literature_id, _ in entries]
+    for start in range(0, len(literature_ids), QUERY_CHUNK):
+        LiteratureAuthor.objects.filter(literature_id__in=literature_ids[start:start + QUERY_CHUNK]).delete()
+    LiteratureAuthor.objects.bulk_create([
+        LiteratureAuthor(literature_id=literature_id, author_id=ids[normalize_name(name)], position=position)
+        for literature_id, names in entries
+        for position, name in enumerate(names)
+    ])
+
+
+def autocomplete(prefix, limit):
+    """
+    Authors whose normalized name starts with `prefix` and who still have
+    literature, alphabetically. On PostgreSQL the prefix match uses the
+    varchar_pattern_ops index Django adds for the unique column.
+    """
+    return list(
+        Author.objects.filter(normalized_name__startswith=normalize_name(prefix))
+        .filter(Exists(LiteratureAuthor.objects.filter(author=OuterRef('pk'))))
+        .order_by('normalized_name')
+        .values('id', 'name')[:limit]
+    )
@@ -0,0 +1,97 @@
+"""
+Helpers shared by the benchmarking management commands.
+
+Requests go through Django's test clients, so the numbers measure the
+handler, middleware, views and database, not a network server. That is
+enough to compare code paths against each other on the same machine.
+Call allow_test_clients() first so the clients' `testserver` host is
+accepted.
+"""
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.test import AsyncClient, Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return None
+    rank = max(1, math.ceil(fraction * len(samples)))
+    return samples[rank - 1]
+
+
+def summarize(label, timings, elapsed, failures=0):
+    """Turn per-request timings (seconds) into a result dict in milliseconds."""
+    timings = sorted(timings)
+    return {
+        'label': label,
+        'requests': len(timings),
+        'failures': failures,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(timings) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 2) if timings else None,
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 2) if timings else None,
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 2) if timings else None,
+    }
+
+
+def allow_test_clients():
+    if 'testserver' not in settings.ALLOWED_HOSTS:
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+
+
+def auth_headers(user=None):
+    if user is None:
+        return {}
+    return {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+
+def run_wsgi(paths, headers, threads, data=None):
+    """
+    Request every path through the WSGI handler from a pool of `threads`
+    workers: a GET, or a JSON POST of `data` when it is given.
+    """
+    def fetch(path):
+        client = Client()
+        started = time.perf_counter()
+        if data is None:
+            response = client.get(path, headers=headers)
+        else:
+            response = client.post(path, data, content_type='application/json', headers=headers)
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(fetch, paths))
+    return results, time.perf_counter() - started
+
+
+def run_asgi(paths, headers, concurrency):
+    """GET every path through the ASGI handler with at most `concurrency` in flight."""
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def fetch(path):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(fetch(path) for path in paths))
+        return results, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+def summarize_results(label, results, elapsed):
+    """Summarize the (seconds, status_code) pairs returned by run_wsgi() / run_asgi()."""
+    timings = [timing for timing, status_code in results]
+    failures = sum(1 for timing, status_code in results if status_code >= 400)
+    return summarize(label, timings, elapsed, failures)
@@ -0,0 +1,197 @@
+"""
+Cache of serialized LiteratureDetail responses.
+
+Two kinds of entries live in the `LITERATURE_CACHE_ALIAS` cache:
+
+* `literature:<id>` holds the LiteratureSerializer payload, shared by every
+  caller, along with the version of each library nested in it. A library
+  change bumps that library's version, and a payload stored under an older
+  one is treated as a miss.
+* `literature:<id>:member:<user>:<version>` holds one user's
+  `libraries_not_associated` / `user_associated_libraries` block. It is keyed
+  by a per-user version that is bumped whenever one of that user's libraries
+  changes, so a single write drops all of their blocks.
+
+Versions start from the clock rather than at 1, so a version key that was
+evicted and created again never matches entries stored under the old one.
+
+Eviction follows the alias configuration (the server's policy for Redis or
+Memcached). Invalidation is driven by the receivers in signals.py, and only
+reaches the workers that share the backend: with a process-local backend
+such as LocMemCache nothing is cached unless LITERATURE_CACHE_ALLOW_LOCAL
+says the site runs as a single process.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+INVALIDATION_CHUNK_SIZE = 1000
+
+# Stands in for a process-local cache that other workers could not invalidate.
+disabled_cache = DummyCache('disabled', {})
+
+
+def shared_cache(alias):
+    """The `alias` cache, or one that stores nothing if it lives in this process only."""
+    cache = caches[alias]
+    if isinstance(cache, LocMemCache) and not settings.LITERATURE_CACHE_ALLOW_LOCAL:
+        return disabled_cache
+    return cache
+
+
+def new_version():
+    return time.time_ns()
+
+
+class CacheStats:
+    """Per-process hit/miss counters, keyed by entry kind."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    def record(self, kind, hit):
+        with self.lock:
+            self.counts[(kind, 'hits' if hit else 'misses')] += 1
+
+    def snapshot(self):
+        with self.lock:
+            counts = dict(self.counts)
+        stats = {}
+        for kind in ('literature', 'membership'):
+            hits = counts.get((kind, 'hits'), 0)
+            misses = counts.get((kind, 'misses'), 0)
+            total = hits + misses
+            stats[kind] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / total if total else None,
+            }
+        return stats
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+
+class LiteratureCache:
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @property
+    def cache(self):
+        return shared_cache(settings.LITERATURE_CACHE_ALIAS)
+
+    def literature_key(self, literature_id):
+        return f'literature:{literature_id}'
+
+    def user_version_key(self, user_id):
+        return f'literature-member-version:{user_id}'
+
+    def library_version_key(self, library_id):
+        return f'library-version:{library_id}'
+
+    def membership_key(self, literature_id, user_id, version):
+        return f'literature:{literature_id}:member:{user_id}:{version}'
+
+    def library_versions(self, library_ids):
+        """Map the version key of each library to its current version, creating missing ones."""
+        keys = [self.library_version_key(library_id) for library_id in library_ids]
+        versions = self.cache.get_many(keys)
+        for key in set(keys) - versions.keys():
+            versions[key] = new_version()
+            self.cache.add(key, versions[key], timeout=None)
+        return versions
+
+    def get_literature(self, literature_id):
+        entry = self.cache.get(self.literature_key(literature_id))
+        # get_many() leaves out evicted keys, so those count as changed too.
+        if entry is not None and entry[1] and self.cache.get_many(list(entry[1])) != entry[1]:
+            entry = None
+        self.stats.record('literature', entry is not None)
+        return entry and entry[0]
+
+    def set_literature(self, literature_id, payload):
+        versions = self.library_versions(library['id'] for library in payload['libraries'])
+        self.cache.set(self.literature_key(literature_id), (payload, versions))
+
+    def get_user_version(self, user_id):
+        version = self.cache.get(self.user_version_key(user_id))
+        if version is None:
+            version = new_version()
+            self.cache.add(self.user_version_key(user_id), version, timeout=None)
+        return version
+
+    def get_membership(self, literature_id, user_id):
+        version = self.get_user_version(user_id)
+        block = self.cache.get(self.membership_key(literature_id, user_id, version))
+        self.stats.record('membership', block is not None)
+        return block, version
+
+    def set_membership(self, literature_id, user_id, version, block):
+        self.cache.set(self.membership_key(literature_id, user_id, version), block)
+
+    async def alibrary_versions(self, library_ids):
+        keys = [self.library_version_key(library_id) for library_id in library_ids]
+        versions = await self.cache.aget_many(keys)
+        for key in set(keys) - versions.keys():
+            versions[key] = new_version()
+            await self.cache.aadd(key, versions[key], timeout=None)
+        return versions
+
+    async def aget_literature(self, literature_id):
+        entry = await self.cache.aget(self.literature_key(literature_id))
+        if entry is not None and entry[1] and await self.cache.aget_many(list(entry[1])) != entry[1]:
+            entry = None
+        self.stats.record('literature', entry is not None)
+        return entry and entry[0]
+
+    async def aset_literature(self, literature_id, payload):
+        versions = await self.alibrary_versions(library['id'] for library in payload['libraries'])
+        await self.cache.aset(self.literature_key(literature_id), (payload, versions))
+
+    async def aget_membership(self, literature_id, user_id):
+        version = await self.cache.aget(self.user_version_key(user_id))
+        if version is None:
+            version = new_version()
+            await self.cache.aadd(self.user_version_key(user_id), version, timeout=None)
+        block = await self.cache.aget(self.membership_key(literature_id, user_id, version))
+        self.stats.record('membership', block is not None)
+        return block, version
+
+    async def aset_membership(self, literature_id, user_id, version, block):
+        await self.cache.aset(self.membership_key(literature_id, user_id, version), block)
+
+    def invalidate_literature(self, literature_ids):
+        keys = [self.literature_key(pk) for pk in literature_ids]
+        for start in range(0, len(keys), INVALIDATION_CHUNK_SIZE):
+            self.cache.delete_many(keys[start:start + INVALIDATION_CHUNK_SIZE])
+
+    def bump(self, keys):
+        for key in keys:
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                # No version stored yet, so nothing is cached under one either.
+                pass
+
+    def invalidate_users(self, user_ids):
+        self.bump(self.user_version_key(user_id) for user_id in set(user_ids) if user_id is not None)
+
+    def invalidate_libraries(self, libraries):
+        """
+        Drop everything that embeds `libraries`: the payload of each
+        literature they contain (nested names and counts) and every block of
+        their owners. Both are versioned, so this reads nothing.
+        """
+        self.bump(self.library_version_key(library_id) for library_id in {library.id for library in libraries})
+        self.invalidate_users(library.user_id for library in libraries)
+
+
+literature_cache = LiteratureCache()
@@ -0,0 +1,39 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha1(repr(parts).encode('utf-8')).hexdigest())
+
+
+class ConditionalGetMixin:
+    """
+    Add ETag / Last-Modified to GET responses and answer If-None-Match /
+    If-Modified-Since with 304 Not Modified.
+
+    Views implement get_validators(), which returns `(parts, last_modified)`
+    from a cheap timestamp query: `parts` is anything repr()-able that
+    changes whenever the representation does. The body is only serialized
+    when the client's copy is stale.
+    """
+
+    def get_validators(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        parts, last_modified = self.get_validators(request, *args, **kwargs)
+        etag = make_etag(request.get_full_path(), request.user.id, parts)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        patch_vary_headers(response, ['Authorization'])
+        return response
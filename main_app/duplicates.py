@@ -0,0 +1,336 @@
+"""
+Near-duplicate detection for literature.
+
+Two rows count as duplicates when their normalized URLs are equal, or when
+the Jaccard similarity of their title/author shingles reaches
+LITERATURE_DUPLICATE_THRESHOLD.
+
+Comparing a new row against every existing row would be linear in the
+table. Instead, each row gets a MinHash signature of NUM_PERM values, cut
+into BANDS bands of ROWS values. Each band is hashed to one 64-bit bucket
+stored in SimilarityBucket. Rows that share any bucket become candidates:
+pairs with similarity s collide with probability 1 - (1 - s**ROWS)**BANDS
+(about 0.97 at s=0.7, 0.47 at s=0.5 and 0.05 at s=0.3). One indexed
+`bucket IN (...)` query finds the candidates, and exact Jaccard over the
+candidate rows decides.
+
+Buckets are written whenever Literature is saved (see signals.py); bulk
+writers must call similarity_index.index() themselves. Changing NUM_PERM,
+BANDS or the shingling needs `manage.py find_duplicates --reindex`.
+"""
+import hashlib
+import random
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .membership import Through, write_memberships
+from .models import Library, Literature, SimilarityBucket
+
+NUM_PERM = 100
+BANDS = 20
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+NORMALIZED_URL_LENGTH = 255
+
+# Universal hashing modulo the Mersenne prime 2**61 - 1, with fixed
+# coefficients so signatures are the same in every process.
+PRIME = (1 << 61) - 1
+_coefficients = random.Random(1729)
+PERMUTATIONS = tuple(
+    (_coefficients.randrange(1, PRIME), _coefficients.randrange(0, PRIME)) for _ in range(NUM_PERM)
+)
+
+# Permuted hashes per shingle. Trigrams repeat across titles, so most
+# signatures are an element-wise min over cached vectors. An entry takes
+# about 4.5 KB, so the cache stays under 20 MB per process. Tuples are
+# larger than array('Q') but the min over them takes about a third less time.
+SHINGLE_CACHE_SIZE = 4096
+
+# Bounded so the IN list stays under SQLite's host parameter limit.
+BUCKET_QUERY_CHUNK = 900
+
+WORD_RE = re.compile(r'\w+')
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|fbclid|gclid|mc_cid|mc_eid)$')
+DOI_HOSTS = ('doi.org', 'dx.doi.org')
+
+
+def normalize_text(value):
+    """Casefold, strip accents and punctuation, and collapse whitespace."""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(WORD_RE.findall(value.casefold()))
+
+
+def normalize_url(url):
+    """
+    Reduce `url` to a form that is equal for the same resource: no scheme,
+    no `www.`, no fragment, no trailing slash, no tracking parameters, and
+    the remaining query parameters sorted. DOI links become `doi:<doi>`.
+    Values that are not absolute URLs are only trimmed and casefolded.
+    """
+    url = (url or '').strip()
+    parts = urlsplit(url)
+    if not parts.netloc:
+        return url.casefold()[:NORMALIZED_URL_LENGTH]
+    host = (parts.hostname or '').removeprefix('www.')
+    path = parts.path.rstrip('/')
+    if host in DOI_HOSTS:
+        return f'doi:{path.lstrip("/").casefold()}'[:NORMALIZED_URL_LENGTH]
+    port = f':{parts.port}' if parts.port and parts.port not in (80, 443) else ''
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(key)
+    ))
+    return f'{host}{port}{path}{"?" + query if query else ""}'[:NORMALIZED_URL_LENGTH]
+
+
+def shingles(title, authors):
+    """
+    Character trigrams of the title plus one token per author word, so a
+    reordered or abbreviated author list still overlaps.
+    """
+    text = normalize_text(title)
+    grams = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)} or {text}
+    grams.update(f'@{word}' for word in normalize_text(authors).split() if len(word) > 1)
+    return frozenset(grams)
+
+
+@lru_cache(maxsize=SHINGLE_CACHE_SIZE)
+def permuted_hashes(shingle):
+    value = zlib.crc32(shingle.encode())
+    return tuple((a * value + b) % PRIME for a, b in PERMUTATIONS)
+
+
+def signature(shingle_set):
+    return list(map(min, zip(*map(permuted_hashes, shingle_set))))
+
+
+def band_buckets(minhashes):
+    """One signed 64-bit bucket per band; the band number is part of the hash."""
+    buckets = []
+    for band in range(BANDS):
+        rows = minhashes[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(repr((band, rows)).encode(), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'big', signed=True))
+    return buckets
+
+
+def jaccard(left, right):
+    if not left or not right:
+        return 0.0
+    shared = len(left & right)
+    return shared / (len(left) + len(right) - shared)
+
+
+class Fingerprint:
+    __slots__ = ('shingles', 'buckets', 'normalized_url')
+
+    def __init__(self, title, authors, url):
+        self.shingles = shingles(title, authors)
+        self.buckets = band_buckets(signature(self.shingles))
+        self.normalized_url = normalize_url(url)
+
+
+def fingerprint(item):
+    """Fingerprint a Literature instance or a dict of its fields."""
+    if isinstance(item, dict):
+        return Fingerprint(item.get('title', ''), item.get('authors', ''), item.get('url', ''))
+    return Fingerprint(item.title, item.authors, item.url)
+
+
+class SimilarityIndex:
+
+    def index(self, literature_items):
+        """(Re)write the buckets of saved Literature rows."""
+        literature_items = [item for item in literature_items if item.pk is not None]
+        if not literature_items:
+            return
+        with transaction.atomic():
+            SimilarityBucket.objects.filter(literature_id__in=[item.pk for item in literature_items]).delete()
+            SimilarityBucket.objects.bulk_create([
+                SimilarityBucket(literature_id=item.pk, bucket=bucket)
+                for item in literature_items
+                for bucket in fingerprint(item).buckets
+            ])
+
+    def reindex(self, literature_items):
+        """Recompute normalized_url as well, for rows written behind the receivers' back."""
+        for item in literature_items:
+            item.normalized_url = normalize_url(item.url)
+        with transaction.atomic():
+            Literature.objects.bulk_update(literature_items, ['normalized_url'])
+            self.index(literature_items)
+
+    def candidate_ids(self, buckets):
+        """Map each bucket in `buckets` to the ids of the rows that share it."""
+        buckets = list(set(buckets))
+        found = defaultdict(set)
+        for start in range(0, len(buckets), BUCKET_QUERY_CHUNK):
+            rows = SimilarityBucket.objects.filter(
+                bucket__in=buckets[start:start + BUCKET_QUERY_CHUNK]
+            ).values_list('bucket', 'literature_id')
+            for bucket, literature_id in rows:
+                found[bucket].add(literature_id)
+        return found
+
+    def find(self, fingerprints, threshold=None, exclude_ids=(), limit=None):
+        """
+        Return, for each fingerprint, a list of existing rows it duplicates:
+        `{'id', 'title', 'authors', 'url', 'similarity', 'reason'}`, best
+        match first. Runs a constant number of queries for the whole list.
+        """
+        threshold = settings.LITERATURE_DUPLICATE_THRESHOLD if threshold is None else threshold
+        limit = limit or settings.LITERATURE_DUPLICATE_MAX_MATCHES
+        exclude_ids = set(exclude_ids)
+        if not fingerprints:
+            return []
+
+        buckets = self.candidate_ids(bucket for item in fingerprints for bucket in item.buckets)
+        urls = {item.normalized_url for item in fingerprints if item.normalized_url}
+        candidate_ids = set().union(*buckets.values()) - exclude_ids if buckets else set()
+        rows = {}
+        if candidate_ids or urls:
+            queryset = Literature.objects.filter(id__in=candidate_ids)
+            if urls:
+                queryset = queryset | Literature.objects.filter(normalized_url__in=urls)
+            for row in queryset.exclude(id__in=exclude_ids).values('id', 'title', 'authors', 'url', 'normalized_url'):
+                row['shingles'] = shingles(row['title'], row['authors'])
+                rows[row['id']] = row
+
+        by_url = defaultdict(list)
+        for row in rows.values():
+            by_url[row['normalized_url']].append(row['id'])
+
+        results = []
+        for item in fingerprints:
+            matches = {}
+            for literature_id in by_url.get(item.normalized_url, ()) if item.normalized_url else ():
+                matches[literature_id] = (1.0, 'url')
+            for literature_id in set().union(*(buckets.get(bucket, ()) for bucket in item.buckets)):
+                if literature_id in matches or literature_id not in rows:
+                    continue
+                similarity = jaccard(item.shingles, rows[literature_id]['shingles'])
+                if similarity >= threshold:
+                    matches[literature_id] = (similarity, 'similar')
+            ranked = sorted(matches.items(), key=lambda match: (-match[1][0], match[0]))[:limit]
+            results.append([
+                {
+                    'id': literature_id,
+                    'title': rows[literature_id]['title'],
+                    'authors': rows[literature_id]['authors'],
+                    'url': rows[literature_id]['url'],
+                    'similarity': round(similarity, 3),
+                    'reason': reason,
+                }
+                for literature_id, (similarity, reason) in ranked
+            ])
+        return results
+
+    def clusters(self, threshold=None, batch_size=2000):
+        """
+        Group the whole table into clusters of duplicates, each a sorted
+        list of ids. Only rows with the same owner that share a bucket or a
+        normalized URL are ever compared, so a cluster never spans users.
+        """
+        threshold = settings.LITERATURE_DUPLICATE_THRESHOLD if threshold is None else threshold
+        parent = {}
+
+        def find(node):
+            parent.setdefault(node, node)
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        def union(left, right):
+            left, right = find(left), find(right)
+            if left != right:
+                parent[max(left, right)] = min(left, right)
+
+        groups = defaultdict(set)
+        for bucket, literature_id in SimilarityBucket.objects.filter(
+            bucket__in=SimilarityBucket.objects.values('bucket').alias(
+                shared=Count('id')
+            ).filter(shared__gt=1).values('bucket')
+        ).values_list('bucket', 'literature_id').iterator(chunk_size=batch_size):
+            groups[bucket].add(literature_id)
+
+        urls = defaultdict(list)
+        for literature_id, user_id, normalized_url in Literature.objects.exclude(normalized_url='').filter(
+            normalized_url__in=Literature.objects.exclude(normalized_url='').values('normalized_url').alias(
+                shared=Count('id')
+            ).filter(shared__gt=1).values('normalized_url')
+        ).values_list('id', 'user_id', 'normalized_url').iterator(chunk_size=batch_size):
+            urls[user_id, normalized_url].append(literature_id)
+        for ids in urls.values():
+            for literature_id in ids[1:]:
+                union(ids[0], literature_id)
+
+        pairs = {
+            (left, right)
+            for ids in groups.values()
+            for left in ids for right in ids if left < right
+        }
+        wanted = sorted({literature_id for pair in pairs for literature_id in pair})
+        fingerprints = {}
+        owners = {}
+        for start in range(0, len(wanted), batch_size):
+            rows = Literature.objects.filter(id__in=wanted[start:start + batch_size]).values(
+                'id', 'user_id', 'title', 'authors'
+            )
+            for row in rows:
+                fingerprints[row['id']] = shingles(row['title'], row['authors'])
+                owners[row['id']] = row['user_id']
+        for left, right in pairs:
+            if left not in fingerprints or right not in fingerprints or owners[left] != owners[right]:
+                continue
+            if find(left) != find(right) and jaccard(fingerprints[left], fingerprints[right]) >= threshold:
+                union(left, right)
+
+        members = defaultdict(list)
+        for node in list(parent):
+            members[find(node)].append(node)
+        return sorted(sorted(ids) for ids in members.values() if len(ids) > 1)
+
+
+similarity_index = SimilarityIndex()
+
+
+def merge_literature(survivor, duplicates):
+    """
+    Fold `duplicates` into `survivor`: every library holding a duplicate
+    gains the survivor, then the duplicates are deleted. Both steps go
+    through write_memberships() and ordinary deletes, so the signals keep
+    literature_count, caches and the search index in step.
+
+    Raises ValueError if a duplicate belongs to another user than the
+    survivor: merging would delete that user's row.
+    """
+    duplicates = [item for item in duplicates if item.pk != survivor.pk]
+    foreign = sorted(item.pk for item in duplicates if item.user_id != survivor.user_id)
+    if foreign:
+        raise ValueError(
+            f'Literature {", ".join(map(str, foreign))} belongs to another user than literature {survivor.pk}.'
+        )
+    duplicate_ids = sorted({item.pk for item in duplicates})
+    if not duplicate_ids:
+        return {'survivor': survivor.pk, 'merged': [], 'libraries_added': 0}
+    with transaction.atomic():
+        library_ids = set(
+            Through.objects.filter(literature_id__in=duplicate_ids).values_list('library_id', flat=True)
+        ) - set(Through.objects.filter(literature_id=survivor.pk).values_list('library_id', flat=True))
+        if library_ids:
+            write_memberships(
+                Library.objects.in_bulk(library_ids),
+                added=[(survivor.pk, library_id) for library_id in library_ids],
+            )
+        Literature.objects.filter(id__in=duplicate_ids).delete()
+    return {'survivor': survivor.pk, 'merged': duplicate_ids, 'libraries_added': len(library_ids)}
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from .formats import EXPORT_FIELDS, get_writer
+
+
+def export_rows(queryset):
+    """Stream `.values()` dicts in primary-key order, a chunk at a time."""
+    return (
+        queryset.order_by('id')
+        .values(*EXPORT_FIELDS)
+        .iterator(chunk_size=settings.LITERATURE_EXPORT_CHUNK_SIZE)
+    )
+
+
+def streaming_export(queryset, format_name, filename):
+    writer, content_type, extension = get_writer(format_name)
+    response = StreamingHttpResponse(writer(export_rows(queryset)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
@@ -0,0 +1,93 @@
+"""
+Facet counts for literature browsing: per literature_type choice, per
+created_at year and for the most frequent authors.
+
+The counts cover the whole catalogue, one user's literature or one library.
+They take two grouped queries: one GROUP BY (literature_type, year), rolled
+up into both facets, and one GROUP BY author over LiteratureAuthor that
+keeps only the top authors.
+
+Results are kept in the `LITERATURE_CACHE_ALIAS` cache for
+LITERATURE_FACETS_CACHE_TIMEOUT seconds. Every key embeds one global
+version. The receivers in signals.py and the bulk writers bump that version
+whenever literature or a membership changes.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+
+from .cache import new_version, shared_cache
+from .models import Literature, LiteratureAuthor
+
+
+def compute_facets(queryset, top_authors):
+    types, years = Counter(), Counter()
+    for literature_type, year, count in (
+        queryset.values('literature_type', year=ExtractYear('created_at'))
+        .annotate(count=Count('id')).order_by().values_list('literature_type', 'year', 'count')
+    ):
+        types[literature_type] += count
+        years[year] += count
+
+    authors = (
+        LiteratureAuthor.objects.filter(literature__in=queryset)
+        .values('author_id', 'author__name').annotate(count=Count('id'))
+        # Ties go to the name that sorts first, so the cut is stable.
+        .order_by('-count', 'author__normalized_name', 'author_id')[:top_authors]
+    )
+
+    return {
+        'total': sum(types.values()),
+        'literature_type': [
+            {'value': value, 'label': label, 'count': types[value]}
+            for value, label in Literature._meta.get_field('literature_type').choices
+        ],
+        'year': [{'value': year, 'count': years[year]} for year in sorted(years, reverse=True)],
+        'authors': [
+            {'value': row['author_id'], 'label': row['author__name'], 'count': row['count']} for row in authors
+        ],
+    }
+
+
+class FacetCache:
+    version_key = 'facets-version'
+
+    @property
+    def cache(self):
+        return shared_cache(settings.LITERATURE_CACHE_ALIAS)
+
+    def facets_key(self, user_id, library_id, version):
+        return f'facets:{user_id or ""}:{library_id or ""}:{version}'
+
+    def get_version(self):
+        version = self.cache.get(self.version_key)
+        if version is None:
+            version = new_version()
+            self.cache.add(self.version_key, version, timeout=None)
+        return version
+
+    def get_facets(self, user_id=None, library_id=None):
+        """Facets of the literature owned by `user_id` and/or filed in `library_id` (all of it by default)."""
+        key = self.facets_key(user_id, library_id, self.get_version())
+        facets = self.cache.get(key)
+        if facets is None:
+            queryset = Literature.objects.all()
+            if user_id is not None:
+                queryset = queryset.filter(user_id=user_id)
+            if library_id is not None:
+                queryset = queryset.filter(libraries=library_id)
+            facets = compute_facets(queryset, settings.LITERATURE_FACETS_TOP_AUTHORS)
+            self.cache.set(key, facets, settings.LITERATURE_FACETS_CACHE_TIMEOUT)
+        return facets
+
+    def invalidate(self):
+        try:
+            self.cache.incr(self.version_key)
+        except ValueError:
+            # No version stored yet, so nothing is cached under one either.
+            pass
+
+
+facet_cache = FacetCache()
@@ -0,0 +1,101 @@
+"""
+Sparse fieldsets for the literature and library read endpoints.
+
+`?fields=id,title` keeps only the listed fields. `?exclude=description`
+drops fields. The two can be combined. The selection decides which keys
+are serialized and which columns are loaded (.only() or .values()). A
+relation such as `libraries` or `literature` is only queried when it is
+selected.
+"""
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+LITERATURE_FIELDS = (
+    'id', 'libraries', 'user', 'title', 'authors', 'description', 'url', 'literature_type', 'created_at',
+    'updated_at',
+)
+LIBRARY_FIELDS = ('id', 'name', 'user', 'literature_count')
+LIBRARY_DETAIL_FIELDS = ('id', 'name', 'user', 'literature', 'literature_next', 'literature_count')
+
+# Serializer field -> model column; None for relations loaded separately.
+LITERATURE_COLUMN_MAP = {'user': 'user_id', 'libraries': None}
+LIBRARY_COLUMN_MAP = {'user': 'user_id', 'literature': None, 'literature_next': None}
+
+
+def split_names(raw):
+    return [name.strip() for name in raw.split(',') if name.strip()]
+
+
+def parse_fieldset(query_params, available):
+    """
+    Return the selected names from `available`, in their `available` order,
+    or None when the request does not restrict the fields.
+    """
+    raw_fields = query_params.get(FIELDS_PARAM)
+    raw_exclude = query_params.get(EXCLUDE_PARAM)
+    if not raw_fields and not raw_exclude:
+        return None
+
+    requested = split_names(raw_fields) if raw_fields else list(available)
+    excluded = split_names(raw_exclude) if raw_exclude else []
+    for param, names in ((FIELDS_PARAM, requested), (EXCLUDE_PARAM, excluded)):
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise ValidationError({
+                param: f'Unknown field(s): {", ".join(unknown)}. Available: {", ".join(available)}.'
+            })
+
+    selected = tuple(name for name in available if name in requested and name not in excluded)
+    if not selected:
+        raise ValidationError({FIELDS_PARAM: 'Select at least one field.'})
+    return selected
+
+
+def model_columns(fields, column_map, required=('id',)):
+    """Columns to load for `fields`, always including `required`."""
+    columns = list(required)
+    for name in fields:
+        column = column_map.get(name, name)
+        if column is not None and column not in columns:
+            columns.append(column)
+    return columns
+
+
+def select_fields(payload, fields):
+    if fields is None:
+        return payload
+    return {name: payload[name] for name in fields}
+
+
+class SparseFieldsetSerializerMixin:
+    """Accept `fields=(...)` and drop every other field from the serializer."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class SparseFieldsetViewMixin:
+    """
+    For GET requests, parse the fieldset against `sparse_fields` and hand
+    it to the serializer. Views narrow their querysets with
+    get_fieldset().
+    """
+    sparse_fields = ()
+
+    def get_fieldset(self):
+        if self.request.method != 'GET':
+            return None
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = parse_fieldset(self.request.query_params, self.sparse_fields)
+        return self._fieldset
+
+    def get_serializer(self, *args, **kwargs):
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            kwargs.setdefault('fields', fieldset)
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,50 @@
+"""
+Query parameters shared by the literature endpoints, the exports, the
+background jobs and the nested literature of GET /libraries/<id>/.
+"""
+from rest_framework.exceptions import ValidationError
+
+from .models import LiteratureAuthor
+
+
+def parse_id_list(query_params, name):
+    raw = query_params.get(name)
+    if not raw:
+        return None
+    try:
+        return [int(value) for value in raw.split(',') if value]
+    except ValueError:
+        raise ValidationError({name: 'Expected an integer or a comma-separated list of integers.'})
+
+
+# Query parameters read by filter_literature(); background exports keep them.
+LITERATURE_FILTERS = ('literature_type', 'user', 'author')
+
+
+def filter_literature(queryset, query_params):
+    literature_types = parse_id_list(query_params, 'literature_type')
+    if literature_types:
+        queryset = queryset.filter(literature_type__in=literature_types)
+
+    users = parse_id_list(query_params, 'user')
+    if users:
+        queryset = queryset.filter(user__in=users)
+
+    authors = parse_id_list(query_params, 'author')
+    if authors:
+        # A semi-join on literature_author_author_idx, so no duplicates.
+        queryset = queryset.filter(
+            id__in=LiteratureAuthor.objects.filter(author_id__in=authors).values('literature_id')
+        )
+
+    return queryset
+
+
+def parse_id(query_params, name):
+    raw = query_params.get(name)
+    if not raw:
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValidationError({name: 'Expected an integer.'})
@@ -0,0 +1,343 @@
+"""
+Streaming readers and writers for the literature interchange formats.
+
+Every reader takes a text stream and yields `(line_number, row)` pairs one
+record at a time, where `row` is a dict with the LiteratureSerializer field
+names, or a FormatError for a record that could not be parsed. Every
+writer takes an iterable of `.values()` dicts and yields text chunks. Nothing
+is buffered beyond the record being parsed or written.
+"""
+import csv
+import io
+import json
+import re
+
+from .models import Literature
+
+FIELDS = ['title', 'authors', 'description', 'url', 'literature_type']
+# JSON can carry the byline as a list.
+JSONL_FIELDS = FIELDS + ['author_names']
+EXPORT_FIELDS = ['id', 'title', 'authors', 'description', 'url', 'literature_type', 'created_at']
+
+TYPE_BY_LABEL = {
+    label.lower(): value
+    for value, label in Literature._meta.get_field('literature_type').choices
+}
+
+BIBTEX_TYPES = {
+    'book': 1, 'inbook': 1, 'incollection': 1,
+    'article': 2, 'misc': 2, 'online': 2,
+    'periodical': 3,
+    'inproceedings': 4, 'conference': 4, 'proceedings': 4,
+    'phdthesis': 5, 'mastersthesis': 5, 'thesis': 5,
+}
+
+RIS_TYPES = {
+    'BOOK': 1, 'CHAP': 1, 'EBOOK': 1,
+    'JOUR': 2, 'EJOUR': 2, 'MGZN': 2, 'NEWS': 2, 'ELEC': 2, 'GEN': 2,
+    'JFULL': 3,
+    'CONF': 4, 'CPAPER': 4,
+    'THES': 5,
+}
+
+BIBTEX_TYPE_BY_VALUE = {1: 'book', 2: 'article', 3: 'periodical', 4: 'inproceedings', 5: 'phdthesis'}
+
+
+class FormatError(ValueError):
+    pass
+
+
+def normalize_literature_type(value):
+    """Accept either the stored integer or its label ("Conference Paper")."""
+    if isinstance(value, str):
+        value = value.strip()
+        if value.lower() in TYPE_BY_LABEL:
+            return TYPE_BY_LABEL[value.lower()]
+    return value
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            # line_num has not moved past the record that failed.
+            yield reader.line_num + 1, FormatError(f'Invalid CSV: {exc}')
+            continue
+        row = {field: row.get(field) for field in FIELDS if row.get(field) is not None}
+        if any('\x00' in value for value in row.values()):
+            yield reader.line_num, FormatError('Invalid CSV: line contains NUL')
+            continue
+        if 'literature_type' in row:
+            row['literature_type'] = normalize_literature_type(row['literature_type'])
+        yield reader.line_num, row
+
+
+def read_jsonl(stream):
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, FormatError(f'Invalid JSON: {exc}')
+            continue
+        if not isinstance(row, dict):
+            yield line_number, FormatError('Expected a JSON object.')
+            continue
+        row = {field: row[field] for field in JSONL_FIELDS if field in row}
+        if 'literature_type' in row:
+            row['literature_type'] = normalize_literature_type(row['literature_type'])
+        yield line_number, row
+
+
+BIBTEX_ENTRY_RE = re.compile(r'@\s*(\w+)\s*[{(]')
+BIBTEX_LATEX_RE = re.compile(r'[{}]|\\[a-zA-Z]+\s*')
+
+
+def clean_bibtex_value(value):
+    return ' '.join(BIBTEX_LATEX_RE.sub('', value).split())
+
+
+def parse_bibtex_fields(body):
+    """Parse `key, name = {value}, name = "value", ...` into a dict."""
+    fields = {}
+    position = body.find(',')
+    if position < 0:
+        return fields
+    position += 1
+    length = len(body)
+    while position < length:
+        equals = body.find('=', position)
+        if equals < 0:
+            break
+        name = body[position:equals].strip().strip(',').strip().lower()
+        position = equals + 1
+        while position < length and body[position].isspace():
+            position += 1
+        if position >= length:
+            break
+        opener = body[position]
+        if opener == '{':
+            depth, start = 1, position + 1
+            position += 1
+            while position < length and depth:
+                if body[position] == '{':
+                    depth += 1
+                elif body[position] == '}':
+                    depth -= 1
+                position += 1
+            value = body[start:position - 1]
+        elif opener == '"':
+            start = position + 1
+            position = start
+            while position < length and (body[position] != '"' or body[position - 1] == '\\'):
+                position += 1
+            value = body[start:position]
+            position += 1
+        else:
+            start = position
+            while position < length and body[position] != ',':
+                position += 1
+            value = body[start:position]
+        fields[name] = clean_bibtex_value(value)
+        comma = body.find(',', position)
+        if comma < 0:
+            break
+        position = comma + 1
+    return fields
+
+
+def author_fields(names):
+    """
+    `author_names` when there are names, so a long byline is kept whole
+    (see authors.py); an empty `authors` otherwise, which fails validation.
+    """
+    names = [name.strip() for name in names if name.strip()]
+    return {'author_names': names} if names else {'authors': ''}
+
+
+def bibtex_row(entry_type, fields):
+    row = {
+        'title': fields.get('title', ''),
+        **author_fields(fields.get('author', '').split(' and ')),
+        'description': fields.get('abstract') or fields.get('note', ''),
+        'url': fields.get('url') or (f"https://doi.org/{fields['doi']}" if fields.get('doi') else ''),
+    }
+    if entry_type in BIBTEX_TYPES:
+        row['literature_type'] = BIBTEX_TYPES[entry_type]
+    return row
+
+
+def read_bibtex(stream):
+    """
+    Yield one row per `@type{...}` entry. Entries are collected line by line
+    until their braces balance, so only one entry is held in memory.
+    """
+    entry_type = None
+    entry_line = 0
+    opener = closer = None
+    depth = 0
+    body = []
+    for line_number, line in enumerate(stream, start=1):
+        if entry_type is None:
+            match = BIBTEX_ENTRY_RE.search(line)
+            if not match:
+                continue
+            entry_type = match.group(1).lower()
+            entry_line = line_number
+            opener = line[match.end() - 1]
+            closer = '}' if opener == '{' else ')'
+            line = line[match.end():]
+            depth = 1
+            body = []
+        for position, char in enumerate(line):
+            if char == opener:
+                depth += 1
+            elif char == closer:
+                depth -= 1
+                if depth == 0:
+                    body.append(line[:position])
+                    break
+        else:
+            body.append(line)
+            continue
+
+        if entry_type not in ('comment', 'preamble', 'string'):
+            yield entry_line, bibtex_row(entry_type, parse_bibtex_fields(''.join(body)))
+        entry_type = None
+
+    if entry_type is not None:
+        yield entry_line, FormatError('Unterminated BibTeX entry.')
+
+
+RIS_LINE_RE = re.compile(r'^([A-Z][A-Z0-9])  -(?: (.*))?$')
+
+
+def read_ris(stream):
+    record = None
+    record_line = 0
+    for line_number, line in enumerate(stream, start=1):
+        match = RIS_LINE_RE.match(line.rstrip('\r\n'))
+        if not match:
+            continue
+        tag, value = match.group(1), (match.group(2) or '').strip()
+        if tag == 'TY':
+            record = {'type': value, 'authors': [], 'title': '', 'description': '', 'url': ''}
+            record_line = line_number
+        elif record is None:
+            continue
+        elif tag == 'ER':
+            row = {
+                'title': record['title'],
+                **author_fields(record['authors']),
+                'description': record['description'],
+                'url': record['url'],
+            }
+            if record['type'] in RIS_TYPES:
+                row['literature_type'] = RIS_TYPES[record['type']]
+            yield record_line, row
+            record = None
+        elif tag in ('AU', 'A1', 'A2'):
+            record['authors'].append(value)
+        elif tag in ('TI', 'T1') and not record['title']:
+            record['title'] = value
+        elif tag in ('AB', 'N2') and not record['description']:
+            record['description'] = value
+        elif tag == 'UR' and not record['url']:
+            record['url'] = value
+        elif tag == 'DO' and not record['url']:
+            record['url'] = f'https://doi.org/{value}'
+
+    if record is not None:
+        yield record_line, FormatError('RIS record is missing its ER tag.')
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+    'bibtex': read_bibtex,
+    'ris': read_ris,
+}
+
+def write_jsonl(rows):
+    for row in rows:
+        row = dict(row, created_at=row['created_at'].isoformat())
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def write_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writerow(EXPORT_FIELDS)
+    yield flush()
+    for row in rows:
+        writer.writerow([row[field] for field in EXPORT_FIELDS])
+        yield flush()
+
+
+def bibtex_escape(value):
+    return value.replace('{', '\\{').replace('}', '\\}')
+
+
+def write_bibtex(rows):
+    for row in rows:
+        entry_type = BIBTEX_TYPE_BY_VALUE.get(row['literature_type'], 'misc')
+        fields = [
+            ('title', row['title']),
+            ('author', row['authors']),
+            ('abstract', row['description']),
+            ('url', row['url']),
+            ('year', str(row['created_at'].year)),
+        ]
+        lines = [f'@{entry_type}{{lit{row["id"]},']
+        lines.extend(f'  {name} = {{{bibtex_escape(value)}}},' for name, value in fields if value)
+        lines.append('}\n\n')
+        yield '\n'.join(lines)
+
+
+WRITERS = {
+    'csv': (write_csv, 'text/csv', 'csv'),
+    'jsonl': (write_jsonl, 'application/x-ndjson', 'jsonl'),
+    'bibtex': (write_bibtex, 'application/x-bibtex', 'bib'),
+}
+
+EXTENSIONS = {
+    'csv': 'csv',
+    'jsonl': 'jsonl',
+    'ndjson': 'jsonl',
+    'bib': 'bibtex',
+    'bibtex': 'bibtex',
+    'ris': 'ris',
+}
+
+
+def guess_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return EXTENSIONS.get(extension)
+
+
+def get_reader(format_name):
+    try:
+        return READERS[format_name]
+    except KeyError:
+        raise FormatError(f'Unsupported format "{format_name}". Choose one of: {", ".join(READERS)}.')
+
+
+def get_writer(format_name):
+    """Return `(writer, content_type, file_extension)` for an export format."""
+    try:
+        return WRITERS[format_name]
+    except KeyError:
+        raise FormatError(f'Unsupported format "{format_name}". Choose one of: {", ".join(WRITERS)}.')
@@ -0,0 +1,111 @@
+"""
+Admission control for password hashing.
+
+PBKDF2 is deliberately slow. A burst of logins or sign-ups would otherwise
+tie up every request worker hashing and starve cheap reads. LoginView and
+CreateUserView hash inside `hashing_slots.acquire()`, which lets at most
+PASSWORD_HASHING_MAX_CONCURRENT requests hash at once across every worker
+process on the host. A request that finds every slot taken does not wait:
+HashingBusy is raised at once, and DRF turns it into a 503 with a
+Retry-After header.
+
+The slots are files in PASSWORD_HASHING_SLOTS_DIR, each held with flock()
+while a request hashes. The kernel releases the lock when the process
+exits, so a crashed worker never keeps a slot. Hashing outside these views
+(the admin login, createsuperuser, changepassword) takes no slot.
+
+BoundedPBKDF2PasswordHasher, the first entry in PASSWORD_HASHERS, runs
+the PBKDF2 work itself on `hashing_pool`, a per-process executor with
+PASSWORD_HASHING_WORKERS threads. The pool never refuses work; the slots
+above do the shedding.
+"""
+import fcntl
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-in attempts are being processed. Try again shortly.'
+    default_code = 'hashing_busy'
+
+    def __init__(self, wait=None):
+        super().__init__()
+        # Picked up by DRF's exception handler for the Retry-After header.
+        self.wait = wait if wait is not None else settings.PASSWORD_HASHING_RETRY_AFTER
+
+
+class HashingSlots:
+
+    def try_slots(self, directory):
+        """Return an open descriptor holding the lock on a free slot, or None."""
+        for slot in range(settings.PASSWORD_HASHING_MAX_CONCURRENT):
+            fd = os.open(directory / f'slot-{slot}', os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+    @contextmanager
+    def acquire(self):
+        """Hold a hashing slot for the duration of the block, or raise HashingBusy without waiting."""
+        directory = Path(settings.PASSWORD_HASHING_SLOTS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        fd = self.try_slots(directory)
+        if fd is None:
+            raise HashingBusy()
+        try:
+            yield
+        finally:
+            # Closing the descriptor releases the lock.
+            os.close(fd)
+
+
+hashing_slots = HashingSlots()
+
+
+class HashingPool:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pid = None
+
+    def get_executor(self):
+        with self.lock:
+            # A forked worker does not inherit the parent's threads.
+            if self.executor is None or self.pid != os.getpid():
+                self.executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING_WORKERS, thread_name_prefix='password-hashing'
+                )
+                self.pid = os.getpid()
+            return self.executor
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the hashing executor and return its result."""
+        return self.get_executor().submit(fn, *args).result()
+
+
+hashing_pool = HashingPool()
+
+
+class BoundedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2PasswordHasher with the work moved to `hashing_pool`. The algorithm
+    name is unchanged, so existing password hashes keep verifying.
+    verify() and harden_runtime() both go through encode().
+    """
+
+    def encode(self, password, salt, iterations=None):
+        return hashing_pool.run(super().encode, password, salt, iterations)
@@ -0,0 +1,148 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from .authors import split_authors, sync_authors
+from .duplicates import fingerprint, jaccard, normalize_url, similarity_index
+from .facets import facet_cache
+from .formats import FormatError, get_reader
+from .membership import write_memberships
+from .models import Change, Literature
+from .search import get_search_backend
+from .serializers import LiteratureSerializer
+from .sync import literature_changes, record
+
+
+class LiteratureImporter:
+    """
+    Validate rows with LiteratureSerializer and insert them in bulk_create
+    batches, optionally attaching every new row to `library`.
+
+    Rows that fail validation are counted and reported (up to `max_errors`
+    of them) without stopping the run. Each batch commits on its own, so
+    memory stays bounded by the batch size.
+
+    Rows that duplicate existing literature, or an earlier row of the same
+    batch, are reported under `duplicates` (also capped by `max_errors`)
+    and, with `skip_duplicates`, not inserted.
+    """
+
+    def __init__(self, user, library=None, batch_size=None, max_errors=100, skip_duplicates=False):
+        self.user = user
+        self.library = library
+        self.batch_size = batch_size or settings.LITERATURE_IMPORT_BATCH_SIZE
+        self.max_errors = max_errors
+        self.skip_duplicates = skip_duplicates
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.duplicate_count = 0
+        self.skipped = 0
+        self.duplicates = []
+
+    def run(self, stream, format_name, progress=None):
+        """Import every row of `stream`; `progress(rows_read)` is called after each batch."""
+        rows = get_reader(format_name)(stream)
+        read = 0
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+            read += len(batch)
+            if progress is not None:
+                progress(read)
+        return self.report()
+
+    def import_batch(self, batch):
+        literature_items = []
+        for line_number, row in batch:
+            if isinstance(row, FormatError):
+                self.add_error(line_number, {'non_field_errors': [str(row)]})
+                continue
+            serializer = LiteratureSerializer(data=row)
+            if serializer.is_valid():
+                names = serializer.validated_data.pop('author_names', None)
+                item = Literature(user=self.user, **serializer.validated_data)
+                item._author_names = names
+                # bulk_create skips the pre_save receiver that sets this.
+                item.normalized_url = normalize_url(item.url)
+                literature_items.append((line_number, item))
+            else:
+                self.add_error(line_number, serializer.errors)
+
+        if settings.LITERATURE_DUPLICATE_CHECK_ON_IMPORT:
+            literature_items = self.check_duplicates(literature_items)
+        literature_items = [item for _, item in literature_items]
+        if not literature_items:
+            return
+
+        with transaction.atomic():
+            Literature.objects.bulk_create(literature_items)
+            record(literature_changes(Change.CREATED, [item.id for item in literature_items], [self.user.id]))
+            if self.library is not None:
+                write_memberships(
+                    {self.library.id: self.library},
+                    added=[(item.id, self.library.id) for item in literature_items],
+                )
+            get_search_backend().index(literature_items)
+            similarity_index.index(literature_items)
+            sync_authors([
+                (item.id, split_authors(item.authors) if item._author_names is None else item._author_names)
+                for item in literature_items
+            ])
+        facet_cache.invalidate()
+        self.created += len(literature_items)
+
+    def check_duplicates(self, literature_items):
+        """
+        Report (and with skip_duplicates, drop) rows matching existing
+        literature or an earlier row of the batch. Returns the rows to insert.
+        """
+        fingerprints = [fingerprint(item) for _, item in literature_items]
+        existing = similarity_index.find(fingerprints)
+        threshold = settings.LITERATURE_DUPLICATE_THRESHOLD
+        kept = []
+        seen_urls, seen_buckets = {}, {}
+        for (line_number, item), item_fingerprint, matches in zip(literature_items, fingerprints, existing):
+            earlier = seen_urls.get(item.normalized_url) if item.normalized_url else None
+            if earlier is None:
+                for bucket in item_fingerprint.buckets:
+                    other = seen_buckets.get(bucket)
+                    if other and jaccard(item_fingerprint.shingles, other[1].shingles) >= threshold:
+                        earlier = other[0]
+                        break
+            if matches or earlier is not None:
+                self.duplicate_count += 1
+                if len(self.duplicates) < self.max_errors:
+                    self.duplicates.append({
+                        'line': line_number,
+                        'duplicate_of': [match['id'] for match in matches],
+                        'duplicate_of_line': earlier,
+                    })
+                if self.skip_duplicates:
+                    self.skipped += 1
+                    continue
+            kept.append((line_number, item))
+            if item.normalized_url:
+                seen_urls.setdefault(item.normalized_url, line_number)
+            for bucket in item_fingerprint.buckets:
+                seen_buckets.setdefault(bucket, (line_number, item_fingerprint))
+        return kept
+
+    def add_error(self, line_number, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_number, 'errors': errors})
+
+    def report(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'duplicates': self.duplicates,
+            'duplicate_count': self.duplicate_count,
+            'skipped_duplicates': self.skipped,
+        }
@@ -0,0 +1,260 @@
+"""
+Background jobs.
+
+Operations too heavy for a request, such as deleting a large library,
+re-parsing every author string, or big imports and exports, are stored as
+Job rows and run by `manage.py run_jobs`. The endpoints that start them
+answer 202 with the job. GET /jobs/<id>/ reports its status and progress.
+
+A worker claims the oldest queued job. Where the database supports it
+(PostgreSQL), the claim is SELECT ... FOR UPDATE SKIP LOCKED, so workers
+never wait on each other's rows. SQLite has no row locks and serializes
+writers anyway. There the claim is a compare-and-set UPDATE of the status,
+retried when another worker wins.
+
+Handlers are registered with @handler('<kind>'). They are called with a
+JobContext and the job's payload as keyword arguments, report progress
+through the context, and return a JSON-serializable result. A running job
+that has not reported for JOB_STALE_AFTER seconds is marked failed rather
+than rerun, because not every handler is safe to repeat.
+"""
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.http import QueryDict
+from django.utils import timezone
+
+from .authors import ET_AL, split_authors, sync_authors
+from .exporters import export_rows
+from .filters import filter_literature
+from .formats import get_writer
+from .importers import LiteratureImporter
+from .membership import Through, write_memberships
+from .models import Author, Job, Library, Literature, LiteratureAuthor
+from .payloads import format_datetime
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+def enqueue(kind, user=None, **payload):
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind "{kind}".')
+    return Job.objects.create(kind=kind, user=user, payload=payload)
+
+
+def job_payload(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'result': job.result,
+        'error': job.error,
+        'created_at': format_datetime(job.created_at),
+        'started_at': format_datetime(job.started_at),
+        'finished_at': format_datetime(job.finished_at),
+    }
+
+
+def job_file_path(filename):
+    return os.path.join(settings.JOB_FILES_DIR, filename)
+
+
+def save_upload(upload):
+    """Copy an uploaded file into JOB_FILES_DIR for a job; returns its file name."""
+    os.makedirs(settings.JOB_FILES_DIR, exist_ok=True)
+    filename = f'upload-{uuid.uuid4().hex}'
+    with open(job_file_path(filename), 'wb') as stream:
+        for chunk in upload.chunks():
+            stream.write(chunk)
+    return filename
+
+
+class JobContext:
+
+    def __init__(self, job):
+        self.job = job
+
+    def progress(self, done, total=None):
+        fields = {'progress': done, 'updated_at': timezone.now()}
+        if total is not None:
+            fields['total'] = total
+        Job.objects.filter(id=self.job.id).update(**fields)
+
+
+def claim(worker):
+    """Mark the oldest queued job as running for `worker` and return it, or None."""
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    while True:
+        now = timezone.now()
+        queued = Job.objects.filter(status=Job.QUEUED).order_by('id')
+        running = {'status': Job.RUNNING, 'worker': worker, 'started_at': now, 'updated_at': now}
+        if skip_locked:
+            with transaction.atomic():
+                job_id = queued.select_for_update(skip_locked=True).values_list('id', flat=True).first()
+                if job_id is None:
+                    return None
+                Job.objects.filter(id=job_id).update(**running)
+            break
+        job_id = queued.values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        if Job.objects.filter(id=job_id, status=Job.QUEUED).update(**running):
+            break
+    return Job.objects.get(id=job_id)
+
+
+def run_job(job):
+    try:
+        result = HANDLERS[job.kind](JobContext(job), **job.payload)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed', job.id, job.kind)
+        now = timezone.now()
+        Job.objects.filter(id=job.id).update(
+            status=Job.FAILED, error=f'{type(exc).__name__}: {exc}', finished_at=now, updated_at=now
+        )
+    else:
+        now = timezone.now()
+        Job.objects.filter(id=job.id).update(status=Job.SUCCEEDED, result=result, finished_at=now, updated_at=now)
+
+
+def fail_stale_jobs():
+    now = timezone.now()
+    return Job.objects.filter(
+        status=Job.RUNNING, updated_at__lt=now - timedelta(seconds=settings.JOB_STALE_AFTER)
+    ).update(status=Job.FAILED, error='The worker stopped reporting progress.', finished_at=now, updated_at=now)
+
+
+def work(index=0, once=False, poll_interval=1.0):
+    """
+    Run jobs one at a time, polling while the queue is empty. With `once`,
+    return when it is empty. Returns the number of jobs run.
+    """
+    worker = f'{socket.gethostname()}:{os.getpid()}:{index}'
+    ran = 0
+    while True:
+        job = claim(worker)
+        if job is None:
+            fail_stale_jobs()
+            if once:
+                return ran
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        ran += 1
+
+
+@handler('delete_library')
+def delete_library(context, library_id):
+    """
+    Unlink the library's literature a JOB_BATCH_SIZE chunk at a time, each
+    chunk through write_memberships() so the receivers keep counts, caches
+    and related literature in step, then delete the emptied library.
+    """
+    library = Library.objects.filter(id=library_id).first()
+    if library is None:
+        return {'deleted': False, 'unlinked': 0}
+    literature_ids = list(
+        Through.objects.filter(library_id=library_id).order_by('literature_id').values_list('literature_id', flat=True)
+    )
+    batch_size = settings.JOB_BATCH_SIZE
+    context.progress(0, len(literature_ids))
+    for start in range(0, len(literature_ids), batch_size):
+        write_memberships(
+            {library_id: library},
+            removed=[(literature_id, library_id) for literature_id in literature_ids[start:start + batch_size]],
+        )
+        context.progress(min(start + batch_size, len(literature_ids)))
+    library.delete()
+    return {'deleted': True, 'unlinked': len(literature_ids)}
+
+
+@handler('reparse_authors')
+def reparse_authors(context, user_id=None):
+    """
+    Re-sync LiteratureAuthor from every `authors` string, then drop authors
+    left without literature. Strings ending in "et al." were derived from a
+    full `author_names` list, so their rows are kept as they are.
+    """
+    queryset = Literature.objects.all()
+    if user_id is not None:
+        queryset = queryset.filter(user_id=user_id)
+    total = queryset.count()
+    context.progress(0, total)
+    done = last_id = 0
+    while True:
+        batch = list(
+            queryset.filter(id__gt=last_id).order_by('id').values_list('id', 'authors')[:settings.JOB_BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        sync_authors([
+            (literature_id, split_authors(authors)) for literature_id, authors in batch if not authors.endswith(ET_AL)
+        ])
+        done += len(batch)
+        context.progress(done)
+    removed, _ = Author.objects.filter(~Exists(LiteratureAuthor.objects.filter(author=OuterRef('pk')))).delete()
+    return {'literature': done, 'authors_removed': removed}
+
+
+@handler('import_literature')
+def import_literature(context, filename, format_name, library_id=None, batch_size=None, skip_duplicates=False):
+    library = Library.objects.get(id=library_id) if library_id is not None else None
+    importer = LiteratureImporter(
+        context.job.user, library=library, batch_size=batch_size, skip_duplicates=skip_duplicates
+    )
+    try:
+        with open(job_file_path(filename), encoding='utf-8-sig', newline='') as stream:
+            return importer.run(stream, format_name, progress=context.progress)
+    finally:
+        os.remove(job_file_path(filename))
+
+
+@handler('export_literature')
+def export_literature(context, format_name, filters=None, library_id=None, download_name='literature'):
+    """Write the export to JOB_FILES_DIR; GET /jobs/<id>/download/ serves it."""
+    queryset = Literature.objects.all()
+    if library_id is not None:
+        queryset = queryset.filter(libraries=library_id)
+    query_params = QueryDict(mutable=True)
+    query_params.update(filters or {})
+    queryset = filter_literature(queryset, query_params)
+
+    writer, content_type, extension = get_writer(format_name)
+    total = queryset.count()
+    context.progress(0, total)
+
+    def counted(rows):
+        for done, row in enumerate(rows, start=1):
+            if done % settings.JOB_BATCH_SIZE == 0:
+                context.progress(done)
+            yield row
+
+    os.makedirs(settings.JOB_FILES_DIR, exist_ok=True)
+    filename = f'export-{context.job.id}.{extension}'
+    with open(job_file_path(filename), 'w', encoding='utf-8', newline='') as stream:
+        for chunk in writer(counted(export_rows(queryset))):
+            stream.write(chunk)
+    context.progress(total)
+    return {
+        'filename': filename, 'download_name': f'{download_name}.{extension}', 'content_type': content_type,
+        'rows': total,
+    }
@@ -0,0 +1,170 @@
+import json
+import logging
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+
+from main_app import urls
+from main_app.bench import allow_test_clients, auth_headers, summarize
+from main_app.jobs import enqueue
+from main_app.models import Library, Literature
+
+
+class Rollback(Exception):
+    pass
+
+
+def route_requests(fixture, iteration):
+    """
+    Map each URL name to the request that exercises it: (method, path,
+    keyword arguments for the client). Writes are arranged so every
+    iteration leaves the data as it found it, and the whole run is rolled
+    back anyway.
+    """
+    literature, library, outsider = fixture['literature'], fixture['library'], fixture['outsider']
+    csv_file = SimpleUploadedFile(
+        'bench.csv', b'title,authors,description,url,literature_type\nBench,Bench,Bench,https://example.com,1\n'
+    )
+    return {
+        'register': ('post', '/users/register/', {'data': {
+            'username': f'bench-{iteration}-{time.monotonic_ns()}', 'email': 'bench@example.com', 'password': 'bench-password',
+        }, 'content_type': 'application/json'}),
+        'login': ('post', '/users/login/', {'data': {
+            'username': fixture['username'], 'password': fixture['password'],
+        }, 'content_type': 'application/json'}),
+        'token_refresh': ('get', '/users/token/refresh/', {}),
+        'user-cache-stats': ('get', '/users/cache-stats/', {}),
+        # 404 until METRICS_TOKEN is set.
+        'metrics': ('get', '/metrics/', {'headers': {'Authorization': f'Bearer {settings.METRICS_TOKEN}'}}),
+        'literature-list': ('get', '/literatures/', {}),
+        'literature-import': ('post', '/literatures/import/', {'data': {'file': csv_file}}),
+        'literature-export': ('get', '/literatures/export/csv/', {}),
+        'literature-cache-stats': ('get', '/literatures/cache-stats/', {}),
+        'literature-search': ('get', '/literatures/search/?q=learning', {}),
+        'literature-facets': ('get', f'/literatures/facets/?library={library}', {}),
+        'literature-detail': ('get', f'/literatures/{literature}/', {}),
+        'literature-related': ('get', f'/literatures/{literature}/related/', {}),
+        'author-autocomplete': ('get', '/authors/?q=a', {}),
+        'library-list': ('get', '/libraries/', {}),
+        'library-detail': ('get', f'/libraries/{library}/', {}),
+        'library-literature': ('get', f'/libraries/{library}/literature/?ordering=-created_at', {}),
+        'library-export': ('get', f'/libraries/{library}/export/jsonl/', {}),
+        'add-library': ('post', f'/literatures/{outsider}/add-library/{library}/', {}),
+        'remove-library': ('post', f'/literatures/{outsider}/remove-library/{library}/', {}),
+        'author-reparse': ('post', '/authors/reparse/', {}),
+        'job-detail': ('get', f'/jobs/{fixture["job"]}/', {}),
+        'job-download': ('get', f'/jobs/{fixture["job"]}/download/', {}),
+        'sync': ('get', '/sync/?since=0', {}),
+        'library-memberships': ('post', '/libraries/memberships/', {'data': {'operations': [
+            {'action': 'add', 'literature': outsider, 'library': library},
+            {'action': 'remove', 'literature': outsider, 'library': library},
+        ]}, 'content_type': 'application/json'}),
+        'async-literature-list': ('async', '/async/literatures/', {}),
+        'async-literature-detail': ('async', f'/async/literatures/{literature}/', {}),
+        'async-library-list': ('async', '/async/libraries/', {}),
+        'async-library-detail': ('async', f'/async/libraries/{library}/', {}),
+    }
+
+
+def response_size(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every route in main_app/urls.py through the test client and report latency percentiles, '
+        'queries per request and response size as JSON. Writes are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username the requests are made as; should own a library.')
+        parser.add_argument('--password', required=True, help="The user's password, for the login route.")
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed iterations run first.')
+        parser.add_argument('--route', action='append', help='Only run these URL names (repeatable).')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist.')
+        library = Library.objects.filter(user=user).order_by('-literature_count').first()
+        literature = Literature.objects.filter(libraries=library).first() if library else None
+        outsider = Literature.objects.exclude(libraries=library).first() if library else None
+        if literature is None or outsider is None:
+            raise CommandError(f'User "{user.username}" needs a non-empty library; run seed_library first.')
+
+        allow_test_clients()
+        # 4xx answers (e.g. admin-only routes for a non-staff user) are
+        # reported in status_codes rather than logged.
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        fixture = {
+            'username': user.username, 'password': options['password'],
+            'literature': literature.id, 'library': library.id, 'outsider': outsider.id,
+        }
+        names = [pattern.name for pattern in urls.urlpatterns if pattern.name]
+        selected = options['route'] or names
+        headers = auth_headers(user)
+        client, async_client = Client(headers=headers), AsyncClient()
+
+        timings = {name: [] for name in selected}
+        queries = {name: 0 for name in selected}
+        sizes = {name: 0 for name in selected}
+        statuses = {name: set() for name in selected}
+        paths = {}
+        try:
+            with transaction.atomic():
+                # Left queued, so job-download measures the not-ready answer.
+                fixture['job'] = enqueue('export_literature', user=user, format_name='csv').id
+                for iteration in range(max(0, options['warmup']) + max(1, options['iterations'])):
+                    timed = iteration >= options['warmup']
+                    requests = route_requests(fixture, iteration)
+                    for name in selected:
+                        if name not in requests:
+                            continue
+                        method, path, kwargs = requests[name]
+                        with CaptureQueriesContext(connection) as captured:
+                            started = time.perf_counter()
+                            if method == 'async':
+                                response = async_to_sync(async_client.get)(path, headers=headers)
+                            else:
+                                response = getattr(client, method)(path, **kwargs)
+                            size = response_size(response)
+                            elapsed = time.perf_counter() - started
+                        if timed:
+                            timings[name].append(elapsed)
+                            queries[name] += len(captured)
+                            sizes[name] += size
+                            statuses[name].add(response.status_code)
+                            paths[name] = (method if method != 'async' else 'get', path)
+                raise Rollback
+        except Rollback:
+            pass
+
+        report = []
+        for name in selected:
+            if not timings[name]:
+                continue
+            count = len(timings[name])
+            result = summarize(name, timings[name], sum(timings[name]))
+            result.update({
+                'method': paths[name][0].upper(),
+                'path': paths[name][1],
+                'status_codes': sorted(statuses[name]),
+                'queries_per_request': queries[name] / count,
+                'bytes_per_response': sizes[name] // count,
+            })
+            report.append(result)
+        self.stdout.write(json.dumps({
+            'routes': report,
+            'uncovered': [name for name in selected if not timings[name]],
+        }, indent=2))
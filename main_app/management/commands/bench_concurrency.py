@@ -0,0 +1,58 @@
+import json
+from itertools import cycle, islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.bench import allow_test_clients, auth_headers, run_asgi, run_wsgi, summarize_results
+
+ENDPOINTS = {
+    'literature-list': '/literatures/',
+    'literature-detail': '/literatures/{literature}/',
+    'library-list': '/libraries/',
+    'library-detail': '/libraries/{library}/',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent throughput of the sync read endpoints under WSGI '
+        'with their async versions under ASGI, against the configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username whose token is sent with every request.')
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='literature-list')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight under ASGI.')
+        parser.add_argument('--threads', type=int, default=8, help='Worker threads under WSGI.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist.')
+
+        ids = {
+            'literature': list(user.literature_set.values_list('id', flat=True)[:100]),
+            'library': list(user.libraries.values_list('id', flat=True)[:100]),
+        }
+        template = ENDPOINTS[options['endpoint']]
+        for name, values in ids.items():
+            if '{%s}' % name in template and not values:
+                raise CommandError(f'User "{user.username}" has no {name} to request.')
+        paths = [
+            template.format(literature=literature, library=library)
+            for literature, library in islice(
+                zip(cycle(ids['literature'] or [0]), cycle(ids['library'] or [0])),
+                max(1, options['requests']),
+            )
+        ]
+
+        allow_test_clients()
+        headers = auth_headers(user)
+        wsgi = summarize_results('wsgi', *run_wsgi(paths, headers, max(1, options['threads'])))
+        asgi = summarize_results(
+            'asgi', *run_asgi(['/async' + path for path in paths], headers, max(1, options['concurrency']))
+        )
+        self.stdout.write(json.dumps([wsgi, asgi], indent=2))
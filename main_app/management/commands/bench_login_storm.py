@@ -0,0 +1,61 @@
+import json
+import logging
+import threading
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.bench import allow_test_clients, auth_headers, run_wsgi, summarize_results
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure read latency on its own and again while a storm of logins runs, '
+        'to check that password hashing does not starve read traffic.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username used for the reads and the logins.')
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--path', default='/literatures/', help='Read endpoint to measure.')
+        parser.add_argument('--reads', type=int, default=300)
+        parser.add_argument('--read-threads', type=int, default=4)
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--login-threads', type=int, default=32)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist.')
+        if not user.check_password(options['password']):
+            raise CommandError('The password does not match.')
+
+        allow_test_clients()
+        # Shed logins are expected here; do not log a warning for each one.
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        headers = auth_headers(user)
+        reads = [options['path']] * max(1, options['reads'])
+        read_threads = max(1, options['read_threads'])
+
+        baseline = summarize_results('reads', *run_wsgi(reads, headers, read_threads))
+
+        storm = {}
+
+        def login_storm():
+            storm['results'], storm['elapsed'] = run_wsgi(
+                ['/users/login/'] * max(1, options['logins']), {}, max(1, options['login_threads']),
+                data={'username': user.username, 'password': options['password']},
+            )
+
+        thread = threading.Thread(target=login_storm)
+        thread.start()
+        during = summarize_results('reads during login storm', *run_wsgi(reads, headers, read_threads))
+        thread.join()
+
+        logins = summarize_results('logins', storm['results'], storm['elapsed'])
+        status_codes = Counter(str(status_code) for _, status_code in storm['results'])
+        logins['status_codes'] = dict(status_codes)
+        logins['shed'] = status_codes['503']
+        self.stdout.write(json.dumps([baseline, during, logins], indent=2))
@@ -0,0 +1,78 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from main_app.bench import allow_test_clients
+from main_app.models import Library, Literature
+from main_app.payloads import library_detail_payload, library_literature_page, literature_columns, literature_payloads
+from main_app.renderers import FastJSONRenderer, orjson
+from main_app.serializers import LibraryDetailSerializer, LiteratureSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows/sec of the serializer path with the .values() payload path for the literature list '
+        'and a full nested page of the largest library, queries and JSON rendering included.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Literature rows per list page.')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, label, rows, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        return {'path': label, 'rows': rows, 'best_s': round(best, 4), 'rows_per_s': round(rows / best, 1)}
+
+    def handle(self, *args, **options):
+        rows, repeat = max(1, options['rows']), max(1, options['repeat'])
+        library = Library.objects.order_by('-literature_count').first()
+        if library is None or not Literature.objects.exists():
+            raise CommandError('No data to serialize; run seed_library first.')
+
+        def serializer_list():
+            queryset = Literature.objects.with_libraries().order_by('-created_at', '-id')[:rows]
+            return JSONRenderer().render(LiteratureSerializer(queryset, many=True).data)
+
+        def payload_list():
+            queryset = Literature.objects.order_by('-created_at', '-id').values(*literature_columns())[:rows]
+            return FastJSONRenderer().render(literature_payloads(list(queryset)))
+
+        # One full page of the nested literature.
+        allow_test_clients()
+        request = Request(APIRequestFactory().get(
+            f'/libraries/{library.id}/', {'page_size': settings.LIBRARY_LITERATURE_MAX_PAGE_SIZE}
+        ))
+
+        def serializer_library():
+            instance = Library.objects.get(id=library.id)
+            return JSONRenderer().render(LibraryDetailSerializer(instance, context={'request': request}).data)
+
+        def payload_library():
+            instance = Library.objects.get(id=library.id)
+            literature, literature_next = library_literature_page(instance, request.query_params, request)
+            return FastJSONRenderer().render(library_detail_payload(instance, None, literature, literature_next))
+
+        if serializer_list() != payload_list() or serializer_library() != payload_library():
+            raise CommandError('The two paths produced different output.')
+
+        listed = Literature.objects.order_by()[:rows].count()
+        nested = min(library.literature_count, settings.LIBRARY_LITERATURE_MAX_PAGE_SIZE)
+        results = [
+            self.measure('literature-list serializer', listed, serializer_list, repeat),
+            self.measure('literature-list payload', listed, payload_list, repeat),
+            self.measure('library-detail serializer', nested, serializer_library, repeat),
+            self.measure('library-detail payload', nested, payload_library, repeat),
+        ]
+        for slow, fast in ((results[0], results[1]), (results[2], results[3])):
+            fast['speedup'] = round(slow['best_s'] / fast['best_s'], 2)
+        self.stdout.write(json.dumps({'orjson': orjson is not None, 'results': results}, indent=2))
@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.duplicates import merge_literature, similarity_index
+from main_app.models import Literature
+
+
+class Command(BaseCommand):
+    help = (
+        'Find clusters of duplicate literature across the whole table (equal normalized URLs, or '
+        'title/author similarity at or above the threshold) and report them as JSON. '
+        'Rows of different users are never clustered together. '
+        'With --merge, fold each cluster into its oldest row.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, help='Jaccard similarity; defaults to LITERATURE_DUPLICATE_THRESHOLD.')
+        parser.add_argument('--reindex', action='store_true', help='Rebuild normalized URLs and similarity buckets first.')
+        parser.add_argument('--merge', action='store_true', help='Merge every cluster into its lowest id.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        threshold = options['threshold']
+        if threshold is not None and not 0 < threshold <= 1:
+            raise CommandError('--threshold must be in (0, 1].')
+        batch_size = max(1, options['batch_size'])
+
+        if options['reindex']:
+            self.reindex(batch_size)
+
+        clusters = similarity_index.clusters(threshold=threshold, batch_size=batch_size)
+        titles = {}
+        wanted = [literature_id for cluster in clusters for literature_id in cluster]
+        for start in range(0, len(wanted), batch_size):
+            titles.update(Literature.objects.filter(id__in=wanted[start:start + batch_size]).values_list('id', 'title'))
+
+        report = []
+        for cluster in clusters:
+            entry = {'survivor': cluster[0], 'duplicates': cluster[1:], 'titles': [titles.get(i) for i in cluster]}
+            if options['merge']:
+                survivor = Literature.objects.get(id=cluster[0])
+                entry.update(merge_literature(survivor, Literature.objects.filter(id__in=cluster[1:])))
+            report.append(entry)
+        self.stdout.write(json.dumps({
+            'clusters': report,
+            'duplicate_rows': sum(len(cluster) - 1 for cluster in clusters),
+            'merged': options['merge'],
+        }, indent=2))
+
+    def reindex(self, batch_size):
+        last_id = 0
+        while True:
+            batch = list(
+                Literature.objects.filter(id__gt=last_id).order_by('id').only('id', 'title', 'authors', 'url')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            similarity_index.reindex(batch)
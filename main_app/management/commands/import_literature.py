@@ -0,0 +1,48 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.formats import READERS, guess_format
+from main_app.importers import LiteratureImporter
+from main_app.models import Library
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV, JSONL, BibTeX or RIS file into Literature using batched inserts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Username that will own the imported rows.')
+        parser.add_argument('--format', choices=sorted(READERS), help='Defaults to the file extension.')
+        parser.add_argument('--library', type=int, help='Attach every imported row to this library id.')
+        parser.add_argument('--batch-size', type=int, default=settings.LITERATURE_IMPORT_BATCH_SIZE)
+        parser.add_argument('--max-errors', type=int, default=100, help='How many row errors to report.')
+        parser.add_argument('--skip-duplicates', action='store_true', help='Do not insert rows that duplicate existing literature.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist.')
+
+        library = None
+        if options['library'] is not None:
+            try:
+                library = Library.objects.get(id=options['library'], user=user)
+            except Library.DoesNotExist:
+                raise CommandError(f'User "{user.username}" has no library {options["library"]}.')
+
+        format_name = options['format'] or guess_format(options['path'])
+        if not format_name:
+            raise CommandError('Could not tell the format from the file name; pass --format.')
+
+        importer = LiteratureImporter(
+            user, library=library, batch_size=max(1, options['batch_size']), max_errors=options['max_errors'],
+            skip_duplicates=options['skip_duplicates'],
+        )
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            report = importer.run(stream, format_name)
+
+        self.stdout.write(json.dumps(report, indent=2))
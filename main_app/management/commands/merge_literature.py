@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.duplicates import merge_literature
+from main_app.models import Literature
+
+
+class Command(BaseCommand):
+    help = (
+        'Merge duplicate literature rows into a surviving row: libraries holding a duplicate are '
+        'repointed to the survivor, then the duplicates are deleted. All rows must have the same owner.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('survivor', type=int, help='Id of the row to keep.')
+        parser.add_argument('duplicates', type=int, nargs='+', help='Ids of the rows to fold into it.')
+
+    def handle(self, *args, **options):
+        try:
+            survivor = Literature.objects.get(id=options['survivor'])
+        except Literature.DoesNotExist:
+            raise CommandError(f'Literature {options["survivor"]} does not exist.')
+        duplicates = list(Literature.objects.filter(id__in=options['duplicates']))
+        missing = sorted(set(options['duplicates']) - {item.id for item in duplicates})
+        if missing:
+            raise CommandError(f'Literature {", ".join(map(str, missing))} does not exist.')
+        if survivor.id in options['duplicates']:
+            raise CommandError('The survivor cannot also be a duplicate.')
+
+        try:
+            result = merge_literature(survivor, duplicates)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(json.dumps(result, indent=2))
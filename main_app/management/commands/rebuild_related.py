@@ -0,0 +1,22 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from main_app.related import related_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the related-literature table (top-K library co-occurrence neighbours of every item) '
+        'from the membership table, and report what was written as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        report = related_index.rebuild(batch_size=max(1, options['batch_size']))
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        self.stdout.write(json.dumps(report, indent=2))
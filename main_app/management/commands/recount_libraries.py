@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from main_app.models import Library, Literature
+
+
+class Command(BaseCommand):
+    help = 'Recompute Library.literature_count from the membership table and repair drifted counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing.')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        checked = repaired = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Library.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .annotate(actual=Count('literature'))
+                .only('id', 'literature_count')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            checked += len(batch)
+
+            drifted = [library for library in batch if library.literature_count != library.actual]
+            for library in drifted:
+                self.stdout.write(f'library {library.id}: stored {library.literature_count}, actual {library.actual}')
+            if drifted and not options['dry_run']:
+                # Count inside the UPDATE, so an F() adjustment made since the
+                # count above is not overwritten with a stale total.
+                actual = (
+                    Literature.libraries.through.objects.filter(library_id=OuterRef('pk'))
+                    .order_by().values('library_id').annotate(count=Count('*')).values('count')
+                )
+                Library.objects.filter(id__in=[library.id for library in drifted]).update(
+                    literature_count=Coalesce(Subquery(actual), 0)
+                )
+            repaired += len(drifted)
+
+        verb = 'would repair' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} libraries, {verb} {repaired}.'))
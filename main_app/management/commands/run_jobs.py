@@ -0,0 +1,38 @@
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from main_app.jobs import work
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background jobs (large library deletes, imports, exports, author re-parsing) '
+        'in a pool of worker processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.JOB_WORKERS, help='Worker processes.')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_POLL_INTERVAL)
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        if workers > 1 and not connection.features.has_select_for_update_skip_locked:
+            # SQLite takes one writer at a time; parallel handlers would
+            # only fail each other with "database is locked".
+            self.stderr.write(f'{connection.vendor} runs one writer at a time; using a single worker.')
+            workers = 1
+        if workers == 1:
+            ran = work(0, options['once'], options['poll_interval'])
+        else:
+            # Forked workers must open their own database connections.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                futures = [pool.submit(work, index, options['once'], options['poll_interval']) for index in range(workers)]
+                ran = sum(future.result() for future in futures)
+        self.stdout.write(json.dumps({'jobs': ran}))
@@ -0,0 +1,168 @@
+import random
+from collections import Counter
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from main_app.authors import display_authors, sync_authors
+from main_app.duplicates import normalize_url, similarity_index
+from main_app.facets import facet_cache
+from main_app.models import Library, Literature
+from main_app.related import related_index
+from main_app.search import get_search_backend
+
+WORDS = (
+    'adaptive analysis approach bayesian boundary causal classical cognitive comparative computational '
+    'data deep design digital distributed dynamics economic efficient empirical evolution framework '
+    'generative graph history human inference information language learning linear local market '
+    'memory methods model modern network neural open optimal policy practical probabilistic quantum '
+    'random reasoning robust scalable semantic social sparse spatial statistical structure study '
+    'survey systems theory towards understanding urban visual'
+).split()
+FIRST_NAMES = 'Ada Alan Barbara Claude Donald Edsger Frances Grace John Katherine Leslie Margaret Niklaus Radia Tim'.split()
+LAST_NAMES = 'Hopper Knuth Liskov Lovelace Perlman Shannon Turing Dijkstra Allen Johnson Lamport Hamilton Wirth Berners-Lee'.split()
+LIBRARY_NAMES = 'Reading list,Thesis,To review,Favourites,Course notes,Archive,Project,References,Later,Background'.split(',')
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with synthetic users, libraries, literature and library memberships, '
+        'with long-tailed ownership and membership, using bulk inserts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--libraries', type=int, default=500)
+        parser.add_argument('--literature', type=int, default=20000)
+        parser.add_argument('--memberships', type=int, default=2, help='Average libraries per literature row.')
+        parser.add_argument('--days', type=int, default=730, help='Spread created_at over this many past days.')
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent for ownership and membership.')
+        parser.add_argument('--prefix', default='seed', help='Usernames are <prefix>-<n>.')
+        parser.add_argument('--password', default='seed-password')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable data sets.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = max(1, options['batch_size'])
+        counts = {name: max(1, options[name]) for name in ('users', 'libraries', 'literature')}
+
+        if User.objects.filter(username__startswith=f'{options["prefix"]}-').exists():
+            raise CommandError(f'Users named "{options["prefix"]}-*" already exist; pick another --prefix.')
+
+        with transaction.atomic():
+            users = self.create_users(counts['users'], options['prefix'], options['password'])
+            libraries = self.create_libraries(counts['libraries'], users, options['skew'])
+            literature_ids = self.create_literature(counts['literature'], users, options['skew'])
+            links = self.create_memberships(literature_ids, libraries, max(0, options['memberships']), options['skew'])
+            self.spread_created_at(literature_ids, max(1, options['days']))
+            # The through rows went in without m2m_changed.
+            related_index.rebuild(batch_size=self.batch_size)
+        facet_cache.invalidate()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users, {len(libraries)} libraries, '
+            f'{len(literature_ids)} literature rows and {links} memberships.'
+        ))
+
+    def zipf_weights(self, count, skew):
+        weights = [1 / (rank ** skew) for rank in range(1, count + 1)]
+        self.random.shuffle(weights)
+        return weights
+
+    def batches(self, items):
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def create_users(self, count, prefix, password):
+        # One hash for everyone; hashing per user would dominate the run.
+        password = make_password(password)
+        users = [
+            User(username=f'{prefix}-{n}', email=f'{prefix}-{n}@example.com', password=password)
+            for n in range(count)
+        ]
+        for batch in self.batches(users):
+            User.objects.bulk_create(batch)
+        return list(User.objects.filter(username__startswith=f'{prefix}-').order_by('id'))
+
+    def create_libraries(self, count, users, skew):
+        owners = self.random.choices(users, weights=self.zipf_weights(len(users), skew), k=count)
+        libraries = [
+            Library(name=f'{self.random.choice(LIBRARY_NAMES)} {n}', user=owner)
+            for n, owner in enumerate(owners)
+        ]
+        for batch in self.batches(libraries):
+            Library.objects.bulk_create(batch)
+        return libraries
+
+    def make_literature(self, owner):
+        words = self.random.sample(WORDS, self.random.randint(3, 7))
+        names = [
+            f'{self.random.choice(FIRST_NAMES)} {self.random.choice(LAST_NAMES)}'
+            for _ in range(self.random.randint(1, 3))
+        ]
+        url = f'https://example.com/{"-".join(words)}'
+        literature = Literature(
+            title=' '.join(words).capitalize()[:100],
+            authors=display_authors(names),
+            description=' '.join(self.random.choices(WORDS, k=self.random.randint(10, 60)))[:500],
+            url=url,
+            normalized_url=normalize_url(url),
+            literature_type=self.random.choices([1, 2, 3, 4, 5], weights=[30, 40, 15, 10, 5])[0],
+            user=owner,
+        )
+        literature._author_names = names
+        return literature
+
+    def create_literature(self, count, users, skew):
+        weights = self.zipf_weights(len(users), skew)
+        search = get_search_backend()
+        literature_ids = []
+        for start in range(0, count, self.batch_size):
+            owners = self.random.choices(users, weights=weights, k=min(self.batch_size, count - start))
+            batch = Literature.objects.bulk_create([self.make_literature(owner) for owner in owners])
+            # bulk_create skips the receivers that keep search, the
+            # similarity buckets and the authors in sync.
+            search.index(batch)
+            similarity_index.index(batch)
+            sync_authors([(item.id, item._author_names) for item in batch])
+            literature_ids.extend(item.id for item in batch)
+        return literature_ids
+
+    def create_memberships(self, literature_ids, libraries, average, skew):
+        """
+        Link each literature row to 0..2*average libraries, picked with
+        Zipf weights so a few libraries get most of the rows. The through
+        rows are inserted directly and the stored counts set once at the end.
+        """
+        Through = Literature.libraries.through
+        weights = self.zipf_weights(len(libraries), skew)
+        counts = Counter()
+        rows = []
+        for literature_id in literature_ids:
+            wanted = min(self.random.randint(0, 2 * average), len(libraries))
+            chosen = {library.id for library in self.random.choices(libraries, weights=weights, k=wanted)}
+            counts.update(chosen)
+            rows.extend(Through(literature_id=literature_id, library_id=library_id) for library_id in chosen)
+            if len(rows) >= self.batch_size:
+                Through.objects.bulk_create(rows)
+                rows = []
+        Through.objects.bulk_create(rows)
+
+        for library in libraries:
+            library.literature_count = counts[library.id]
+        Library.objects.bulk_update(libraries, ['literature_count'], batch_size=self.batch_size)
+        return sum(counts.values())
+
+    def spread_created_at(self, literature_ids, days):
+        """Backdate created_at so lower ids are older, with one UPDATE per day."""
+        today = timezone.now().date()
+        per_day = max(1, len(literature_ids) // days)
+        for offset, start in enumerate(range(0, len(literature_ids), per_day)):
+            chunk = literature_ids[start:start + per_day]
+            created_at = today - timedelta(days=max(0, days - 1 - offset))
+            Literature.objects.filter(id__gte=chunk[0], id__lte=chunk[-1]).update(created_at=created_at)
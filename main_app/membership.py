@@ -0,0 +1,132 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+
+from .models import Library, Literature
+
+Through = Literature.libraries.through
+
+
+def existing_memberships(literature_ids, library_ids):
+    """Map every existing (literature_id, library_id) pair among the ids to its through-row id."""
+    rows = Through.objects.filter(
+        literature_id__in=literature_ids, library_id__in=library_ids
+    ).values_list('id', 'literature_id', 'library_id')
+    return {(literature_id, library_id): pk for pk, literature_id, library_id in rows}
+
+
+def send_membership_signals(action, libraries, pairs):
+    """
+    Send m2m_changed the way `library.literature_set.<action>(...)` would, one
+    signal per library, so receivers see bulk writes like ordinary ones.
+    """
+    by_library = defaultdict(set)
+    for literature_id, library_id in pairs:
+        by_library[library_id].add(literature_id)
+    for library_id, pk_set in by_library.items():
+        m2m_changed.send(
+            sender=Through, instance=libraries[library_id], action=action,
+            reverse=True, model=Literature, pk_set=pk_set, using=Through.objects.db,
+        )
+
+
+def lock_libraries(library_ids):
+    """
+    Lock the libraries' rows until the transaction ends and map their ids to
+    them. Locking in id order keeps two batches from deadlocking.
+    """
+    return {
+        library.id: library
+        for library in Library.objects.select_for_update().filter(id__in=library_ids).order_by('id')
+    }
+
+
+def write_memberships(libraries, added=(), removed=()):
+    """
+    Insert the `added` and delete the `removed` (literature_id, library_id)
+    pairs with one bulk statement each, inside a single transaction, and
+    return the (added, removed) pairs that really changed.
+
+    `libraries` maps library ids to Library instances for the signals. Their
+    rows are locked first and the pairs checked against the table under that
+    lock, so a pair another batch has just written is skipped and the signals
+    only report rows this call inserted or deleted.
+    """
+    added, removed = set(added), set(removed)
+    with transaction.atomic():
+        lock_libraries(libraries)
+        existing = existing_memberships(
+            {literature_id for literature_id, _ in added | removed},
+            {library_id for _, library_id in added | removed},
+        )
+        added -= set(existing)
+        removed &= set(existing)
+        if removed:
+            send_membership_signals('pre_remove', libraries, removed)
+            Through.objects.filter(id__in=[existing[pair] for pair in removed]).delete()
+            send_membership_signals('post_remove', libraries, removed)
+        if added:
+            send_membership_signals('pre_add', libraries, added)
+            Through.objects.bulk_create([
+                Through(literature_id=literature_id, library_id=library_id)
+                for literature_id, library_id in added
+            ])
+            send_membership_signals('post_add', libraries, added)
+    return added, removed
+
+
+def set_libraries(literature, libraries):
+    """Make `libraries` exactly the libraries holding `literature`, through write_memberships()."""
+    wanted = {library.id for library in libraries}
+    current = set(Through.objects.filter(literature_id=literature.pk).values_list('library_id', flat=True))
+    write_memberships(
+        Library.objects.in_bulk(wanted | current),
+        added=[(literature.pk, library_id) for library_id in wanted - current],
+        removed=[(literature.pk, library_id) for library_id in current - wanted],
+    )
+
+
+def apply_membership_operations(user, operations):
+    """
+    Apply a list of `{'action': 'add'|'remove', 'literature': id, 'library': id}`
+    operations for `user` and return one result dict per operation.
+
+    Ownership, existence and current membership are each checked with one
+    query for the whole batch, with the libraries locked so a concurrent
+    batch cannot change them in between. Operations on the same pair are
+    applied in order, and only the net difference is written.
+    """
+    literature_ids = {operation['literature'] for operation in operations}
+    library_ids = {operation['library'] for operation in operations}
+
+    with transaction.atomic():
+        libraries = lock_libraries(library_ids)
+        found_literature = set(
+            Literature.objects.filter(id__in=literature_ids).values_list('id', flat=True)
+        )
+        existing = existing_memberships(found_literature, [
+            library_id for library_id, library in libraries.items() if library.user_id == user.id
+        ])
+
+        members = set(existing)
+        results = []
+        for operation in operations:
+            pair = (operation['literature'], operation['library'])
+            library = libraries.get(operation['library'])
+            if library is None:
+                outcome = 'library_not_found'
+            elif library.user_id != user.id:
+                outcome = 'forbidden'
+            elif operation['literature'] not in found_literature:
+                outcome = 'literature_not_found'
+            elif operation['action'] == 'add':
+                outcome = 'already_present' if pair in members else 'added'
+                members.add(pair)
+            else:
+                outcome = 'removed' if pair in members else 'not_present'
+                members.discard(pair)
+            results.append(dict(operation, status=outcome))
+
+        write_memberships(libraries, added=members - set(existing), removed=set(existing) - members)
+    return results
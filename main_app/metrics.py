@@ -0,0 +1,294 @@
+"""
+Request timings aggregated per view and exported in Prometheus text format.
+
+PerformanceMiddleware (middleware.py) fills a Measurement for each sampled
+request: DB query count and time, serialization time and total time. It
+then adds the measurement to `registry`.
+
+Each process keeps its own registry. With METRICS_DIR set, every process
+also writes a snapshot to its own file in that directory, at most every
+METRICS_FLUSH_INTERVAL seconds. The metrics endpoint merges all of the
+files, so one scrape covers every gunicorn worker.
+
+As in prometheus_client's multiprocess mode, METRICS_DIR must be local to
+the host and cleared when the server starts. A scrape holds an flock() on
+the directory's lock file while it folds the files of workers that have
+exited into `metrics-aggregate.json` and deletes them, which keeps the
+counters monotonic without one file per worker ever started. Temporary
+files older than STALE_TEMPORARY_SECONDS, left by a worker killed
+mid-flush, are deleted too.
+"""
+import contextvars
+import fcntl
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+HISTOGRAMS = {
+    'request_duration_seconds': 'Total time spent in the view, middleware included.',
+    'db_duration_seconds': 'Time spent executing database queries.',
+    'serialization_duration_seconds': 'Time spent in serializers and renderers.',
+}
+COUNTERS = {
+    'db_queries_total': 'Database queries executed.',
+}
+PREFIX = 'mydigitallibrary_'
+
+AGGREGATE_FILENAME = 'metrics-aggregate.json'
+WORKER_FILENAME = re.compile(r'metrics-(\d+)-[^-]+\.json')
+LOCK_FILENAME = 'metrics.lock'
+STALE_TEMPORARY_SECONDS = 60
+
+current_measurement = contextvars.ContextVar('current_measurement', default=None)
+
+
+class Measurement:
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self.serializing = False
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+@contextmanager
+def timed_serialization():
+    """Add the time spent in the block to the current measurement, if any."""
+    measurement = current_measurement.get()
+    if measurement is None or measurement.serializing:
+        yield
+        return
+    measurement.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        measurement.serialization_time += time.perf_counter() - started
+        measurement.serializing = False
+
+
+class TimedSerializerMixin:
+    """
+    Add the time spent in to_representation() to the current measurement.
+    Only the outermost serializer is timed, so nested serializers are not
+    counted twice. This is free when the request is not sampled.
+    """
+
+    def to_representation(self, instance):
+        measurement = current_measurement.get()
+        if measurement is None or measurement.serializing:
+            return super().to_representation(instance)
+        measurement.serializing = True
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            measurement.serialization_time += time.perf_counter() - started
+            measurement.serializing = False
+
+
+class Registry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        # A random suffix keeps a recycled pid from overwriting a dead
+        # worker's file.
+        self.filename = f'metrics-{self.pid}-{uuid.uuid4().hex[:8]}.json'
+        self.histograms = {name: {} for name in HISTOGRAMS}
+        self.counters = {name: {} for name in COUNTERS}
+        self.last_flush = 0.0
+
+    def observe(self, name, view, value):
+        series = self.histograms[name].get(view)
+        if series is None:
+            # One count per bucket, then the sum and the total count.
+            series = self.histograms[name][view] = [0] * len(BUCKETS) + [0.0, 0]
+        series[bisect_left(BUCKETS, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def record(self, view, measurement, total):
+        with self.lock:
+            if self.pid != os.getpid():
+                # Forked after data was recorded (e.g. gunicorn --preload).
+                self.reset()
+            self.observe('request_duration_seconds', view, total)
+            self.observe('db_duration_seconds', view, measurement.db_time)
+            self.observe('serialization_duration_seconds', view, measurement.serialization_time)
+            counters = self.counters['db_queries_total']
+            counters[view] = counters.get(view, 0) + measurement.queries
+            flush = settings.METRICS_DIR and time.monotonic() - self.last_flush >= settings.METRICS_FLUSH_INTERVAL
+        if flush:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps({'histograms': self.histograms, 'counters': self.counters}))
+
+    def flush(self):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        data = self.snapshot()
+        with self.lock:
+            self.last_flush = time.monotonic()
+        write_snapshot(directory, self.filename, data)
+
+    def collect(self):
+        """Return this process's snapshot merged with every worker's file."""
+        if not settings.METRICS_DIR:
+            return self.snapshot()
+        self.flush()
+        with directory_lock(settings.METRICS_DIR):
+            compact(settings.METRICS_DIR)
+            merged = empty_snapshot()
+            for entry in os.scandir(settings.METRICS_DIR):
+                if entry.name.startswith('metrics-') and entry.name.endswith('.json'):
+                    merge(merged, read_snapshot(entry.path))
+        return merged
+
+
+registry = Registry()
+
+
+def empty_snapshot():
+    return {'histograms': {name: {} for name in HISTOGRAMS}, 'counters': {name: {} for name in COUNTERS}}
+
+
+def read_snapshot(path):
+    """The snapshot stored at `path`, or None if it cannot be read."""
+    try:
+        with open(path) as stream:
+            return json.load(stream)
+    except (OSError, ValueError):
+        return None
+
+
+def merge(merged, data):
+    if data is None:
+        return
+    for name, views in data['histograms'].items():
+        histogram = merged['histograms'].setdefault(name, {})
+        for view, series in views.items():
+            histogram[view] = [a + b for a, b in zip(histogram.get(view, [0] * len(series)), series)]
+    for name, views in data['counters'].items():
+        counter = merged['counters'].setdefault(name, {})
+        for view, value in views.items():
+            counter[view] = counter.get(view, 0) + value
+
+
+@contextmanager
+def directory_lock(directory):
+    fd = os.open(os.path.join(directory, LOCK_FILENAME), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the descriptor releases the lock.
+        os.close(fd)
+
+
+def process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running under another user.
+        pass
+    return True
+
+
+def dead_worker_files(directory):
+    """Paths of the metrics-<pid>-<suffix>.json files whose process has exited."""
+    paths = []
+    for entry in os.scandir(directory):
+        match = WORKER_FILENAME.fullmatch(entry.name)
+        if match is None:
+            continue
+        pid = int(match.group(1))
+        if pid != os.getpid() and not process_exists(pid):
+            paths.append(entry.path)
+    return paths
+
+
+def write_snapshot(directory, filename, data):
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'w') as stream:
+        json.dump(data, stream)
+    os.replace(temporary, os.path.join(directory, filename))
+
+
+def compact(directory):
+    """
+    Fold the files of exited workers into the aggregate file and delete
+    them, then delete stale temporary files. Call with directory_lock() held.
+    """
+    dead = dead_worker_files(directory)
+    if dead:
+        aggregate_path = os.path.join(directory, AGGREGATE_FILENAME)
+        aggregate = read_snapshot(aggregate_path) or empty_snapshot()
+        for path in dead:
+            merge(aggregate, read_snapshot(path))
+        write_snapshot(directory, AGGREGATE_FILENAME, aggregate)
+        for path in dead:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+    cutoff = time.time() - STALE_TEMPORARY_SECONDS
+    for entry in os.scandir(directory):
+        if not entry.name.endswith('.tmp'):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+
+def label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(data):
+    lines = []
+    for name, help_text in HISTOGRAMS.items():
+        lines += [f'# HELP {PREFIX}{name} {help_text}', f'# TYPE {PREFIX}{name} histogram']
+        for view, series in sorted(data['histograms'][name].items()):
+            view = label(view)
+            cumulative = 0
+            for bound, count in zip(BUCKETS, series):
+                cumulative += count
+                le = '+Inf' if bound == math.inf else repr(bound)
+                lines.append(f'{PREFIX}{name}_bucket{{view="{view}",le="{le}"}} {cumulative}')
+            lines.append(f'{PREFIX}{name}_sum{{view="{view}"}} {series[-2]}')
+            lines.append(f'{PREFIX}{name}_count{{view="{view}"}} {series[-1]}')
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {PREFIX}{name} {help_text}', f'# TYPE {PREFIX}{name} counter']
+        for view, value in sorted(data['counters'][name].items()):
+            lines.append(f'{PREFIX}{name}{{view="{label(view)}"}} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,153 @@
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .metrics import Measurement, current_measurement, registry
+from .routing import PIN_COOKIE, PIN_HEADER, RequestRouting, current_routing, is_pinned, pin_token
+
+
+class PerformanceMiddleware:
+    """
+    For a METRICS_SAMPLE_RATE fraction of requests, time the request, its
+    database queries and its serialization. Add them to the per-view
+    metrics and send them back in a Server-Timing header. Requests that are
+    not sampled pay for a single random() call.
+
+    Rendering happens after process_template_response(), so a post-render
+    callback closes its timer. Streaming responses are timed until the
+    view returns, not until the last chunk is sent.
+
+    Under ASGI the middleware stays async, so the /async/ views are not run
+    in a thread. Their queries run in the request's thread-sensitive worker
+    thread, so the query timers are installed on that thread's connections.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        measurement = Measurement()
+        token = current_measurement.set(measurement)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                self.time_queries(stack, measurement)
+                response = self.get_response(request)
+        finally:
+            current_measurement.reset(token)
+        return self.finish(request, response, measurement, started)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        measurement = Measurement()
+        token = current_measurement.set(measurement)
+        started = time.perf_counter()
+        try:
+            stack = ExitStack()
+            await sync_to_async(self.time_queries)(stack, measurement)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            current_measurement.reset(token)
+        return self.finish(request, response, measurement, started)
+
+    def time_queries(self, stack, measurement):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(measurement.execute_wrapper))
+
+    def finish(self, request, response, measurement, started):
+        total = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        registry.record(view, measurement, total)
+        response['Server-Timing'] = ', '.join([
+            f'db;desc="{measurement.queries} queries";dur={measurement.db_time * 1000:.2f}',
+            f'serialize;dur={measurement.serialization_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+        return response
+
+    def process_template_response(self, request, response):
+        measurement = current_measurement.get()
+        if measurement is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                measurement.serialization_time += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let PrimaryReplicaRouter send this request's reads to a replica, unless
+    it writes or comes from a client that wrote recently (see routing.py).
+    The routing lives in a context variable, so it also reaches the threads
+    that async views run their queries in.
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        routing = self.start(request)
+        token = current_routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.finish(routing, response)
+
+    async def __acall__(self, request):
+        routing = self.start(request)
+        token = current_routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.finish(routing, response)
+
+    def start(self, request):
+        return RequestRouting(
+            pinned=(
+                request.method not in self.safe_methods
+                or is_pinned(request.headers.get(PIN_HEADER))
+                or is_pinned(request.COOKIES.get(PIN_COOKIE))
+            )
+        )
+
+    def finish(self, routing, response):
+        if routing.wrote and settings.DATABASE_REPLICAS:
+            token = pin_token()
+            response[PIN_HEADER] = token
+            response.set_cookie(
+                PIN_COOKIE, token, max_age=settings.DATABASE_REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
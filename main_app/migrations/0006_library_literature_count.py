@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:50
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_literature_count(apps, schema_editor):
+    Library = apps.get_model('main_app', 'Library')
+    Literature = apps.get_model('main_app', 'Literature')
+    counts = (
+        Literature.libraries.through.objects
+        .filter(library_id=OuterRef('pk'))
+        .order_by()
+        .values('library_id')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Library.objects.update(literature_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0005_library_updated_at_literature_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='library',
+            name='literature_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_literature_count, migrations.RunPython.noop),
+    ]
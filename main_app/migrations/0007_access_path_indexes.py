@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0006_library_literature_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='library',
+            index=models.Index(fields=['user', 'name', 'id'], name='library_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='literature',
+            index=models.Index(fields=['created_at', 'id'], name='literature_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='literature',
+            index=models.Index(fields=['literature_type', 'created_at', 'id'], name='literature_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='literature',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='literature_user_created_idx'),
+        ),
+        # The auto-created through table only has (literature_id, library_id)
+        # unique plus single-column FK indexes; "literature in a library"
+        # needs the reverse composite to be index-only.
+        migrations.RunSQL(
+            'CREATE INDEX main_app_literature_libraries_library_literature_idx '
+            'ON main_app_literature_libraries (library_id, literature_id)',
+            'DROP INDEX main_app_literature_libraries_library_literature_idx',
+        ),
+    ]
@@ -0,0 +1,130 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:05
+
+import hashlib
+import random
+import re
+import unicodedata
+import zlib
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+# Frozen copies of main_app.duplicates as of this migration, so later
+# changes there cannot alter what this migration writes.
+NUM_PERM = 100
+BANDS = 20
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+NORMALIZED_URL_LENGTH = 255
+PRIME = (1 << 61) - 1
+_coefficients = random.Random(1729)
+PERMUTATIONS = tuple(
+    (_coefficients.randrange(1, PRIME), _coefficients.randrange(0, PRIME)) for _ in range(NUM_PERM)
+)
+WORD_RE = re.compile(r'\w+')
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|fbclid|gclid|mc_cid|mc_eid)$')
+DOI_HOSTS = ('doi.org', 'dx.doi.org')
+
+
+def normalize_text(value):
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(WORD_RE.findall(value.casefold()))
+
+
+def normalize_url(url):
+    url = (url or '').strip()
+    parts = urlsplit(url)
+    if not parts.netloc:
+        return url.casefold()[:NORMALIZED_URL_LENGTH]
+    host = (parts.hostname or '').removeprefix('www.')
+    path = parts.path.rstrip('/')
+    if host in DOI_HOSTS:
+        return f'doi:{path.lstrip("/").casefold()}'[:NORMALIZED_URL_LENGTH]
+    port = f':{parts.port}' if parts.port and parts.port not in (80, 443) else ''
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(key)
+    ))
+    return f'{host}{port}{path}{"?" + query if query else ""}'[:NORMALIZED_URL_LENGTH]
+
+
+def shingles(title, authors):
+    text = normalize_text(title)
+    grams = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)} or {text}
+    grams.update(f'@{word}' for word in normalize_text(authors).split() if len(word) > 1)
+    return frozenset(grams)
+
+
+@lru_cache(maxsize=4096)
+def permuted_hashes(shingle):
+    value = zlib.crc32(shingle.encode())
+    return tuple((a * value + b) % PRIME for a, b in PERMUTATIONS)
+
+
+def band_buckets(shingle_set):
+    minhashes = list(map(min, zip(*map(permuted_hashes, shingle_set))))
+    buckets = []
+    for band in range(BANDS):
+        rows = minhashes[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(repr((band, rows)).encode(), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'big', signed=True))
+    return buckets
+
+
+def index_existing_literature(apps, schema_editor):
+    # Plain executemany: bulk_update's CASE statements and 20 model
+    # instances per row dominate the run on large tables.
+    Literature = apps.get_model('main_app', 'Literature')
+    literature_table = schema_editor.quote_name(Literature._meta.db_table)
+    bucket_table = schema_editor.quote_name(apps.get_model('main_app', 'SimilarityBucket')._meta.db_table)
+    last_id = 0
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            batch = list(
+                Literature.objects.filter(id__gt=last_id).order_by('id').values('id', 'title', 'authors', 'url')[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]['id']
+            urls, buckets = [], []
+            for row in batch:
+                urls.append((normalize_url(row['url']), row['id']))
+                buckets.extend((row['id'], bucket) for bucket in band_buckets(shingles(row['title'], row['authors'])))
+            cursor.executemany(f'UPDATE {literature_table} SET normalized_url = %s WHERE id = %s', urls)
+            cursor.executemany(f'INSERT INTO {bucket_table} (literature_id, bucket) VALUES (%s, %s)', buckets)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0007_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='literature',
+            name='normalized_url',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='literature',
+            index=models.Index(fields=['normalized_url'], name='literature_norm_url_idx'),
+        ),
+        migrations.CreateModel(
+            name='SimilarityBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField()),
+                ('literature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_buckets', to='main_app.literature')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='similarity_bucket_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_literature, migrations.RunPython.noop),
+    ]
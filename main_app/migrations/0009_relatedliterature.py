@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0008_literature_duplicates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedLiterature',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('shared', models.PositiveIntegerField()),
+                ('literature', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='main_app.literature')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main_app.literature')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['literature', '-score', 'related'], name='related_literature_score_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+# Frozen copies of main_app.authors as of this migration, so later changes
+# there cannot alter what this migration writes.
+ET_AL = 'et al.'
+NAME_MAX_LENGTH = 255
+
+
+def clean_name(name):
+    return ' '.join(name.split())[:NAME_MAX_LENGTH]
+
+
+def normalize_name(name):
+    return clean_name(name).casefold()
+
+
+def split_authors(authors):
+    authors = authors.strip()
+    if authors.endswith(ET_AL):
+        authors = authors[:-len(ET_AL)]
+    seen = set()
+    result = []
+    for name in map(clean_name, authors.split(',')):
+        key = name.casefold()
+        if key and key not in seen:
+            seen.add(key)
+            result.append(name)
+    return result
+
+
+def link_existing_authors(apps, schema_editor):
+    # Parses the authors strings a batch at a time. Author ids are kept in
+    # memory across batches, and the through rows go in with executemany.
+    Author = apps.get_model('main_app', 'Author')
+    Literature = apps.get_model('main_app', 'Literature')
+    through_table = schema_editor.quote_name(apps.get_model('main_app', 'LiteratureAuthor')._meta.db_table)
+    ids = {}
+    last_id = 0
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            batch = list(Literature.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'authors')[:BATCH_SIZE])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            parsed = [(literature_id, split_authors(authors)) for literature_id, authors in batch]
+            new = {}
+            for _, names in parsed:
+                for name in names:
+                    key = normalize_name(name)
+                    if key not in ids:
+                        new.setdefault(key, name)
+            for author in Author.objects.bulk_create(
+                [Author(name=name, normalized_name=key) for key, name in new.items()], batch_size=BATCH_SIZE
+            ):
+                ids[author.normalized_name] = author.id
+            cursor.executemany(
+                f'INSERT INTO {through_table} (literature_id, author_id, position) VALUES (%s, %s, %s)',
+                [
+                    (literature_id, ids[normalize_name(name)], position)
+                    for literature_id, names in parsed
+                    for position, name in enumerate(names)
+                ],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0009_relatedliterature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Author',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('normalized_name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LiteratureAuthor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='authorships', to='main_app.author')),
+                ('literature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='authorships', to='main_app.literature')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['author', 'literature'], name='literature_author_author_idx')],
+                'constraints': [models.UniqueConstraint(fields=('literature', 'author'), name='literature_author_unique')],
+            },
+        ),
+        migrations.RunPython(link_existing_authors, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,41 @@
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+
+class LibraryQuerySet(models.QuerySet):
+    def touch(self):
+        return self.update(updated_at=timezone.now())
+
+    def adjust_literature_count(self, delta):
+        return self.update(literature_count=F('literature_count') + delta, updated_at=timezone.now())
+
+
+class LiteratureQuerySet(models.QuerySet):
+    def with_libraries(self):
+        # Ordered so the nested list matches payloads.literature_payloads().
+        return self.prefetch_related(models.Prefetch('libraries', queryset=Library.objects.order_by('id')))
+
+    def touch(self):
+        return self.update(updated_at=timezone.now())
+
+
 class Library(models.Model):
     name = models.CharField(max_length=100)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='libraries')  
+    # Also bumped when literature is added to or removed from the library.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by the m2m_changed / delete receivers in signals.py;
+    # `manage.py recount_libraries` repairs any drift.
+    literature_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = LibraryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name', 'id'], name='library_user_name_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} (by {self.user.username})"
@@ -29,8 +61,158 @@ class Literature(models.Model):
     )
     
     created_at = models.DateField(auto_now_add=True)  
+    # Also bumped when the literature joins or leaves a library.
+    updated_at = models.DateTimeField(auto_now=True)
     libraries = models.ManyToManyField('Library')  
     user = models.ForeignKey(User, on_delete=models.CASCADE,null=True)
+    # Set from `url` by a pre_save receiver; bulk writers fill it themselves
+    # with duplicates.normalize_url().
+    normalized_url = models.CharField(max_length=255, blank=True, default='', editable=False)
+
+    objects = LiteratureQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the post_save receiver skip syncing authors that did not change.
+        instance._loaded_authors = instance.__dict__.get('authors')
+        return instance
+
+    class Meta:
+        # Keyset pagination walks (created_at, id), optionally within one
+        # type or one user.
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='literature_created_idx'),
+            models.Index(fields=['literature_type', 'created_at', 'id'], name='literature_type_created_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='literature_user_created_idx'),
+            models.Index(fields=['normalized_url'], name='literature_norm_url_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class Author(models.Model):
+    """One person named in Literature.authors; see authors.py."""
+    name = models.CharField(max_length=255)
+    # authors.normalize_name(name). On PostgreSQL, Django gives the unique
+    # column a second, varchar_pattern_ops index for prefix lookups.
+    normalized_name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class LiteratureAuthor(models.Model):
+    """The authors of a literature row, in byline order."""
+    literature = models.ForeignKey(Literature, on_delete=models.CASCADE, related_name='authorships')
+    author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='authorships')
+    position = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['literature', 'author'], name='literature_author_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['author', 'literature'], name='literature_author_author_idx'),
+        ]
+
+
+class SimilarityBucket(models.Model):
+    """One MinHash LSH band of a literature row; see duplicates.py."""
+    literature = models.ForeignKey(Literature, on_delete=models.CASCADE, related_name='similarity_buckets')
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bucket'], name='similarity_bucket_idx'),
+        ]
+
+
+class RelatedLiterature(models.Model):
+    """One of the top-K co-occurrence neighbours of a literature row; see related.py."""
+    # The composite index below covers lookups by literature.
+    literature = models.ForeignKey(Literature, on_delete=models.CASCADE, related_name='related_entries', db_index=False)
+    related = models.ForeignKey(Literature, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    shared = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['literature', '-score', 'related'], name='related_literature_score_idx'),
+        ]
+
+
+class Job(models.Model):
+    """A unit of background work run by `manage.py run_jobs`; see jobs.py."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10, default=QUEUED,
+        choices=[(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')],
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name='jobs')
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True)
+    result = models.JSONField(null=True)
+    error = models.TextField(blank=True, default='')
+    worker = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    # Bumped with every progress report; a running job that stops bumping
+    # it is failed after JOB_STALE_AFTER seconds.
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        # Workers claim the oldest queued job.
+        indexes = [
+            models.Index(fields=['status', 'id'], name='job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk} ({self.status})'
+
+
+class Change(models.Model):
+    """One entry of a user's delta-sync log; see sync.py."""
+    LITERATURE = 'literature'
+    LIBRARY = 'library'
+    MEMBERSHIP = 'membership'
+
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ADDED = 'added'
+    REMOVED = 'removed'
+
+    # Append-only and written per affected user, so it can outgrow a 32-bit id.
+    id = models.BigAutoField(primary_key=True)
+    # The composite index below covers lookups by user.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False)
+    kind = models.CharField(
+        max_length=10, choices=[(LITERATURE, 'Literature'), (LIBRARY, 'Library'), (MEMBERSHIP, 'Membership')],
+    )
+    action = models.CharField(
+        max_length=10,
+        choices=[(CREATED, 'Created'), (UPDATED, 'Updated'), (DELETED, 'Deleted'), (ADDED, 'Added'), (REMOVED, 'Removed')],
+    )
+    # Plain ids rather than foreign keys: the log outlives deleted rows.
+    literature_id = models.IntegerField(null=True)
+    library_id = models.IntegerField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='change_user_idx'),
+            # Finds the entries still inside SYNC_SETTLE_SECONDS.
+            models.Index(fields=['created_at'], name='change_created_idx'),
+        ]
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return f'{self.kind} {self.action} #{self.pk}'
@@ -0,0 +1,187 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a strict (ordering_field, id) keyset.
+
+    Every page is fetched with a `WHERE (field, id) < (value, pk)` style
+    filter, so deep pages cost the same as the first one. The cursor is an
+    opaque base64 token holding the position and the direction.
+    """
+    ordering_field = 'created_at'
+    descending = True
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_default_page_size(self):
+        return settings.LITERATURE_PAGE_SIZE
+
+    def get_max_page_size(self):
+        return settings.LITERATURE_MAX_PAGE_SIZE
+
+    def get_page_size(self, query_params):
+        page_size = self.get_default_page_size()
+        raw = query_params.get(self.page_size_query_param)
+        if raw:
+            try:
+                page_size = int(raw)
+            except ValueError:
+                pass
+        return max(1, min(page_size, self.get_max_page_size()))
+
+    def encode_cursor(self, obj, reverse):
+        """`obj` is a model instance or a .values() dict holding the keyset columns."""
+        if isinstance(obj, dict):
+            value, pk = obj[self.ordering_field], obj['id']
+        else:
+            value, pk = getattr(obj, self.ordering_field), obj.pk
+        value = '' if value is None else value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        token = json.dumps([value, pk, int(reverse)], separators=(',', ':'))
+        return b64encode(token.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, query_params, model):
+        encoded = query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            value, pk, reverse = json.loads(b64decode(encoded.encode('ascii')).decode('ascii'))
+            value = model._meta.get_field(self.ordering_field).to_python(value)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeError, DjangoValidationError):
+            raise ValidationError({self.cursor_query_param: self.invalid_cursor_message})
+        # Out-of-range integers would fail in the database instead.
+        if any(isinstance(number, int) and not -2 ** 63 <= number < 2 ** 63 for number in (value, pk)):
+            raise ValidationError({self.cursor_query_param: self.invalid_cursor_message})
+        return (value, pk), bool(reverse)
+
+    def get_ordering(self, reverse):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return (prefix + self.ordering_field, prefix + 'id')
+
+    def filter_after(self, queryset, position, reverse):
+        value, pk = position
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        # The leading `field <= value` bound is redundant logically but lets
+        # the (field, id) index seek straight to the cursor instead of
+        # scanning every row before it.
+        return queryset.filter(**{f'{self.ordering_field}__{lookup}e': value}).filter(
+            Q(**{f'{self.ordering_field}__{lookup}': value}) |
+            Q(**{f'id__{lookup}': pk})
+        )
+
+    def get_page_queryset(self, queryset, query_params):
+        """
+        Return the sliced queryset for the requested page. It fetches one row
+        more than the page size so finish_page() can tell if there is more.
+        """
+        self.page_size = self.get_page_size(query_params)
+        self.position, self.reverse = self.decode_cursor(query_params, queryset.model)
+
+        queryset = queryset.order_by(*self.get_ordering(self.reverse))
+        if self.position is not None:
+            queryset = self.filter_after(queryset, self.position, self.reverse)
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        self.next_cursor = self.encode_cursor(rows[-1], False) if rows and self.has_next else None
+        self.previous_cursor = self.encode_cursor(rows[0], True) if rows and self.has_previous else None
+        return rows
+
+    def paginate_rows(self, queryset, query_params):
+        """
+        Return one page of `queryset` without touching request state, so the
+        same keyset logic can be reused outside of a DRF view.
+        """
+        return self.finish_page(list(self.get_page_queryset(queryset, query_params)))
+
+    async def apaginate_rows(self, queryset, query_params):
+        page = self.get_page_queryset(queryset, query_params)
+        return self.finish_page([row async for row in page])
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        return self.paginate_rows(queryset, request.query_params)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.get_link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self.get_link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class LiteratureCursorPagination(KeysetPagination):
+    ordering_field = 'created_at'
+    descending = True
+
+
+class LibraryLiteraturePagination(KeysetPagination):
+    """
+    Pages of one library's literature: the page nested in GET
+    /libraries/<id>/ and the ones after it at /libraries/<id>/literature/.
+    ?ordering= picks the keyset; the page links carry it along.
+    """
+    ordering_query_param = 'ordering'
+    orderings = ('id', '-id', 'created_at', '-created_at', 'title', '-title')
+    ordering_field = 'id'
+    descending = False
+
+    def get_default_page_size(self):
+        return settings.LIBRARY_LITERATURE_PAGE_SIZE
+
+    def get_max_page_size(self):
+        return settings.LIBRARY_LITERATURE_MAX_PAGE_SIZE
+
+    def get_page_queryset(self, queryset, query_params):
+        ordering = query_params.get(self.ordering_query_param) or self.orderings[0]
+        if ordering not in self.orderings:
+            raise ValidationError({self.ordering_query_param: f'Expected one of: {", ".join(self.orderings)}.'})
+        self.descending = ordering.startswith('-')
+        self.ordering_field = ordering.lstrip('-')
+        return super().get_page_queryset(queryset, query_params)
+
@@ -0,0 +1,188 @@
+"""
+Read-only payloads built straight from .values() rows.
+
+These return exactly what LiteratureSerializer and LibraryDetailSerializer
+return for the same rows (see the parity tests). They skip DRF's per-field
+to_representation() calls, which dominate the CPU time of the list
+endpoints. The serializers are still the reference, and they remain the
+only way to write.
+"""
+from datetime import timezone as dt_timezone
+from operator import itemgetter
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from .fieldsets import (
+    LIBRARY_COLUMN_MAP, LIBRARY_DETAIL_FIELDS, LITERATURE_COLUMN_MAP, LITERATURE_FIELDS, model_columns,
+)
+from .filters import LITERATURE_FILTERS, filter_literature
+from .metrics import timed_serialization
+from .models import Literature
+from .pagination import LibraryLiteraturePagination
+
+SIMPLE_LITERATURE_COLUMNS = ('id', 'title', 'authors', 'description', 'literature_type', 'url', 'created_at')
+
+# Query parameters of a library's literature pages; the page links keep them.
+LIBRARY_LITERATURE_PARAMS = ('page_size', 'ordering') + LITERATURE_FILTERS
+
+Through = Literature.libraries.through
+
+
+def format_date(value):
+    return value.isoformat() if value else None
+
+
+def format_datetime(value):
+    """Same output as rest_framework.fields.DateTimeField with ISO_8601."""
+    if not value:
+        return None
+    if settings.USE_TZ:
+        current = timezone.get_current_timezone()
+        value = value.astimezone(current) if timezone.is_aware(value) else timezone.make_aware(value, current)
+    elif timezone.is_aware(value):
+        value = timezone.make_naive(value, dt_timezone.utc)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def library_rows(literature_ids):
+    return (
+        Through.objects.filter(literature_id__in=literature_ids)
+        .order_by('library_id')
+        .values_list('literature_id', 'library_id', 'library__name', 'library__user_id', 'library__literature_count')
+    )
+
+
+def group_libraries(literature_ids, rows):
+    libraries = {pk: [] for pk in literature_ids}
+    for literature_id, library_id, name, user_id, literature_count in rows:
+        libraries[literature_id].append(
+            {'id': library_id, 'name': name, 'user': user_id, 'literature_count': literature_count}
+        )
+    return libraries
+
+
+def libraries_by_literature(literature_ids):
+    """Map literature ids to their LibrarySerializer dicts, ordered by library id."""
+    return group_libraries(literature_ids, library_rows(literature_ids))
+
+
+async def alibraries_by_literature(literature_ids):
+    return group_libraries(literature_ids, [row async for row in library_rows(literature_ids)])
+
+
+def column_getters(fields, formatters):
+    """(name, getter) pairs for `fields`; plain columns are read as they are."""
+    return [
+        (name, formatters.get(name) or itemgetter(LITERATURE_COLUMN_MAP.get(name) or name))
+        for name in fields
+    ]
+
+
+LITERATURE_FORMATTERS = {
+    'created_at': lambda row: format_date(row['created_at']),
+    'updated_at': lambda row: format_datetime(row['updated_at']),
+}
+
+
+def build_literature_payloads(rows, fields, libraries):
+    formatters = dict(LITERATURE_FORMATTERS)
+    if libraries is not None:
+        formatters['libraries'] = lambda row: libraries[row['id']]
+    getters = column_getters(fields, formatters)
+    return [{name: get(row) for name, get in getters} for row in rows]
+
+
+def literature_payloads(rows, fields=None):
+    """
+    LiteratureSerializer output for `rows`, .values() dicts holding
+    literature_columns(fields). Restricted to `fields` when given; the
+    nested libraries cost one query, and only when selected.
+    """
+    fields = fields or LITERATURE_FIELDS
+    with timed_serialization():
+        libraries = None
+        if 'libraries' in fields:
+            libraries = libraries_by_literature([row['id'] for row in rows])
+        return build_literature_payloads(rows, fields, libraries)
+
+
+async def aliterature_payloads(rows, fields=None):
+    """literature_payloads() for async views; the libraries query runs on the async ORM."""
+    fields = fields or LITERATURE_FIELDS
+    libraries = None
+    if 'libraries' in fields:
+        libraries = await alibraries_by_literature([row['id'] for row in rows])
+    with timed_serialization():
+        return build_literature_payloads(rows, fields, libraries)
+
+
+def literature_columns(fields=None):
+    """The .values() columns literature_payloads(rows, fields) needs, keyset columns included."""
+    return model_columns(fields or LITERATURE_FIELDS, LITERATURE_COLUMN_MAP, required=('id', 'created_at'))
+
+
+def simple_literature_payloads(rows):
+    """SimpleLiteratureSerializer output for `rows`, dicts with SIMPLE_LITERATURE_COLUMNS."""
+    with timed_serialization():
+        getters = column_getters(SIMPLE_LITERATURE_COLUMNS, LITERATURE_FORMATTERS)
+        return [{name: get(row) for name, get in getters} for row in rows]
+
+
+def library_literature(library, query_params):
+    """`library`'s literature as SIMPLE_LITERATURE_COLUMNS rows, narrowed by the filter_literature() parameters."""
+    queryset = filter_literature(Literature.objects.filter(libraries=library), query_params)
+    return queryset.values(*SIMPLE_LITERATURE_COLUMNS)
+
+
+def library_literature_params(query_params):
+    """The LIBRARY_LITERATURE_PARAMS of a detail request. A ?cursor= is dropped: the nested page is the first."""
+    return {name: query_params[name] for name in LIBRARY_LITERATURE_PARAMS if query_params.get(name)}
+
+
+def library_literature_url(library_id, params, request=None):
+    """GET /libraries/<id>/literature/ with `params`, the base of the page links; absolute given `request`."""
+    url = reverse('library-literature', args=[library_id])
+    if params:
+        url = f'{url}?{urlencode(params)}'
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def library_literature_page(library, query_params, request=None):
+    """The first page of `library`'s literature as rows for library_detail_payload(), and the link to the next one."""
+    params = library_literature_params(query_params)
+    paginator = LibraryLiteraturePagination()
+    paginator.base_url = library_literature_url(library.id, params, request)
+    rows = paginator.paginate_rows(library_literature(library, params), params)
+    return rows, paginator.get_next_link()
+
+
+async def alibrary_literature_page(library, query_params, request=None):
+    params = library_literature_params(query_params)
+    paginator = LibraryLiteraturePagination()
+    paginator.base_url = library_literature_url(library.id, params, request)
+    rows = await paginator.apaginate_rows(library_literature(library, params), params)
+    return rows, paginator.get_next_link()
+
+
+def library_detail_payload(library, fields=None, literature=(), literature_next=None):
+    """
+    LibraryDetailSerializer output for `library`, restricted to `fields`
+    when given. `literature` and `literature_next` come from
+    library_literature_page(), so the body is the library row plus one
+    page query whatever the library's size.
+    """
+    payload = {}
+    for name in fields or LIBRARY_DETAIL_FIELDS:
+        if name == 'literature':
+            payload[name] = simple_literature_payloads(literature)
+        elif name == 'literature_next':
+            payload[name] = literature_next
+        else:
+            payload[name] = getattr(library, LIBRARY_COLUMN_MAP.get(name) or name)
+    return payload
@@ -0,0 +1,295 @@
+"""
+"Related literature" from library co-occurrence.
+
+Each literature item is a sparse 0/1 vector over libraries. Two items are
+related by the cosine of their vectors: shared libraries divided by
+sqrt(libraries of one * libraries of the other). The RELATED_LITERATURE_TOP_K
+best neighbours of every item are stored in RelatedLiterature, so a lookup
+is one read on the (literature, -score) index.
+
+Libraries with more than RELATED_LITERATURE_MAX_LIBRARY_SIZE items are left
+out. A catch-all list relates everything to everything, and its n**2 pairs
+would dominate the work.
+
+`manage.py rebuild_related` computes the whole table, one row of the
+item-item product at a time. When memberships change, the receivers in
+signals.py schedule refresh() for the affected items after the change
+commits. That recomputes their rows and merges the new pair scores into
+their neighbours' rows. When a library crosses the size limit, the rows
+of its other members stay as they were until the next rebuild.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from operator import mul, neg
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min
+
+from .membership import Through
+from .models import Library, RelatedLiterature
+from .payloads import SIMPLE_LITERATURE_COLUMNS, format_date
+
+# Bounded so IN lists stay under SQLite's host parameter limit.
+QUERY_CHUNK = 900
+
+
+def chunks(items, size=QUERY_CHUNK):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def rank(entry):
+    """Sort key for a (related_id, (score, shared)) entry: score, then lower id."""
+    related_id, (value, shared) = entry
+    return value, -related_id
+
+
+def inverse_roots(degrees):
+    return {literature_id: 1 / math.sqrt(degree) for literature_id, degree in degrees.items() if degree}
+
+
+def pair_score(shared, row_root, related_root):
+    return shared * related_root * row_root
+
+
+def top_neighbours(literature_id, shared_counts, roots, top_k):
+    """
+    The top_k (score, shared, related_id) of one row, best first, ties by
+    id. The per-pair work runs in map/zip and heapq rather than Python
+    bytecode; this loop is the bulk of a rebuild.
+    """
+    shared_counts.pop(literature_id, None)
+    if not shared_counts:
+        return []
+    ids = list(shared_counts)
+    weights = map(mul, shared_counts.values(), map(roots.__getitem__, ids))
+    row_root = roots[literature_id]
+    return [
+        (weight * row_root, shared_counts[-negated], -negated)
+        for weight, negated in heapq.nlargest(top_k, zip(weights, map(neg, ids)))
+    ]
+
+
+def insert_pairs(cursor, rows):
+    """
+    Insert (literature_id, related_id, score, shared) tuples. A plain
+    executemany: building a model instance per pair costs more than
+    computing the pairs.
+    """
+    if rows:
+        cursor.executemany(
+            f'INSERT INTO {connection.ops.quote_name(RelatedLiterature._meta.db_table)} '
+            '(literature_id, related_id, score, shared) VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+
+
+class RelatedIndex:
+
+    @property
+    def top_k(self):
+        return settings.RELATED_LITERATURE_TOP_K
+
+    @property
+    def max_library_size(self):
+        return settings.RELATED_LITERATURE_MAX_LIBRARY_SIZE
+
+    def rebuild(self, batch_size=2000):
+        """Recompute every row from the membership table. Returns counters."""
+        members = defaultdict(list)
+        for library_id, literature_id in Through.objects.values_list('library_id', 'literature_id').iterator(
+            chunk_size=batch_size
+        ):
+            members[library_id].append(literature_id)
+        members = {library_id: items for library_id, items in members.items() if len(items) <= self.max_library_size}
+        libraries_of = defaultdict(list)
+        for library_id, items in members.items():
+            for literature_id in items:
+                libraries_of[literature_id].append(library_id)
+        roots = inverse_roots({literature_id: len(libraries) for literature_id, libraries in libraries_of.items()})
+
+        pairs = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            RelatedLiterature.objects.all().delete()
+            rows = []
+            for literature_id in sorted(libraries_of):
+                shared_counts = Counter()
+                for library_id in libraries_of[literature_id]:
+                    shared_counts.update(members[library_id])
+                rows.extend(
+                    (literature_id, related_id, value, shared)
+                    for value, shared, related_id in top_neighbours(literature_id, shared_counts, roots, self.top_k)
+                )
+                if len(rows) >= batch_size:
+                    insert_pairs(cursor, rows)
+                    pairs += len(rows)
+                    rows = []
+            insert_pairs(cursor, rows)
+            pairs += len(rows)
+        return {'literature': len(libraries_of), 'libraries': len(members), 'pairs': pairs}
+
+    def shared_counts(self, literature_ids):
+        """
+        Exact co-occurrence rows of `literature_ids` (related id -> shared
+        libraries), and the inverse roots of every item that appears in them.
+        """
+        libraries_of = defaultdict(list)
+        for chunk in chunks(literature_ids):
+            for literature_id, library_id in Through.objects.filter(
+                literature_id__in=chunk, library__literature_count__lte=self.max_library_size
+            ).values_list('literature_id', 'library_id'):
+                libraries_of[literature_id].append(library_id)
+
+        members = defaultdict(list)
+        for chunk in chunks({library_id for libraries in libraries_of.values() for library_id in libraries}):
+            for library_id, literature_id in Through.objects.filter(library_id__in=chunk).values_list(
+                'library_id', 'literature_id'
+            ):
+                members[library_id].append(literature_id)
+
+        rows = {}
+        for literature_id in literature_ids:
+            counts = Counter()
+            for library_id in libraries_of.get(literature_id, ()):
+                counts.update(members[library_id])
+            counts.pop(literature_id, None)
+            rows[literature_id] = counts
+
+        degrees = {}
+        for chunk in chunks(set(literature_ids).union(*rows.values())):
+            degrees.update(
+                Through.objects.filter(literature_id__in=chunk, library__literature_count__lte=self.max_library_size)
+                .values('literature_id').annotate(total=Count('id')).values_list('literature_id', 'total')
+            )
+        return rows, inverse_roots(degrees)
+
+    def counts_towards(self, library_ids, delta):
+        """
+        Whether a change of `delta` rows in these libraries, already applied
+        to literature_count, can move any score. Libraries over the size
+        limit before and after it are left out of every score.
+        """
+        return Library.objects.filter(
+            id__in=library_ids, literature_count__lte=self.max_library_size + max(delta, 0)
+        ).exists()
+
+    def schedule_refresh(self, literature_ids):
+        """
+        Refresh once the membership change commits. The rows are derived
+        data, and recomputing them inside the write would hold its locks
+        for the whole recomputation.
+        """
+        literature_ids = list(literature_ids)
+        transaction.on_commit(lambda: self.refresh(literature_ids))
+
+    def refresh(self, literature_ids):
+        """
+        Recompute the rows of `literature_ids` after their memberships
+        changed, and fold the new scores into the rows of every item they
+        share (or used to share) a library with. Full rows that lose ground
+        are recomputed exactly, since the pairs that should replace an entry
+        are not stored anywhere.
+        """
+        changed = set(literature_ids)
+        if not changed:
+            return
+
+        rows, roots = self.shared_counts(changed)
+        neighbours = set().union(*rows.values())
+
+        # Neighbours, and items that listed a changed item but no longer
+        # share a library with it. Only rows that can change are read in
+        # full: rows listing a changed item, rows that are not full, and
+        # rows where a new score reaches the current last entry.
+        listing = set()
+        for chunk in chunks(changed):
+            listing.update(RelatedLiterature.objects.filter(related_id__in=chunk).values_list('literature_id', flat=True))
+        listing -= changed
+        floors = {}
+        for chunk in chunks(neighbours - changed - listing):
+            floors.update(
+                (literature_id, (total, floor)) for literature_id, total, floor in
+                RelatedLiterature.objects.filter(literature_id__in=chunk).values('literature_id')
+                .annotate(total=Count('id'), floor=Min('score')).values_list('literature_id', 'total', 'floor')
+            )
+        others = set(listing)
+        for other_id in neighbours - changed - listing:
+            total, floor = floors.get(other_id, (0, 0.0))
+            if total < self.top_k or any(
+                pair_score(counts[other_id], roots[other_id], roots[literature_id]) >= floor
+                for literature_id, counts in rows.items() if counts.get(other_id)
+            ):
+                others.add(other_id)
+        stored = defaultdict(dict)
+        for chunk in chunks(others):
+            for literature_id, related_id, value, shared in RelatedLiterature.objects.filter(
+                literature_id__in=chunk
+            ).values_list('literature_id', 'related_id', 'score', 'shared'):
+                stored[literature_id][related_id] = (value, shared)
+
+        updated = {
+            literature_id: {
+                related_id: (value, shared)
+                for value, shared, related_id in top_neighbours(literature_id, counts, roots, self.top_k)
+            }
+            for literature_id, counts in rows.items()
+        }
+        short = set()
+        for other_id in others:
+            current = stored.get(other_id, {})
+            entries = dict(current)
+            for literature_id, counts in rows.items():
+                shared = counts.get(other_id, 0)
+                if not shared:
+                    entries.pop(literature_id, None)
+                    continue
+                entries[literature_id] = (pair_score(shared, roots[other_id], roots[literature_id]), shared)
+            best = dict(heapq.nlargest(self.top_k, entries.items(), key=rank))
+            # A full row only listed pairs ranked above its last entry. If
+            # an entry dropped out or fell below that, a pair that was never
+            # stored may now belong in the row.
+            if len(current) >= self.top_k and (
+                len(best) < self.top_k or min(map(rank, best.items())) < min(map(rank, current.items()))
+            ):
+                short.add(other_id)
+            elif best != current:
+                updated[other_id] = best
+
+        if short:
+            short_rows, short_roots = self.shared_counts(short)
+            for literature_id, counts in short_rows.items():
+                updated[literature_id] = {
+                    related_id: (value, shared)
+                    for value, shared, related_id in top_neighbours(literature_id, counts, short_roots, self.top_k)
+                }
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for chunk in chunks(updated):
+                RelatedLiterature.objects.filter(literature_id__in=chunk).delete()
+            insert_pairs(cursor, [
+                (literature_id, related_id, value, shared)
+                for literature_id, entries in updated.items()
+                for related_id, (value, shared) in entries.items()
+            ])
+
+    def related(self, literature_id, limit=None):
+        """The stored neighbours of one item as SimpleLiteratureSerializer dicts plus score and shared libraries."""
+        rows = (
+            RelatedLiterature.objects.filter(literature_id=literature_id)
+            .order_by('-score', 'related_id')
+            .values_list('score', 'shared', *[f'related__{column}' for column in SIMPLE_LITERATURE_COLUMNS])
+        )
+        results = []
+        for value, shared, *columns in rows[:limit or self.top_k]:
+            item = dict(zip(SIMPLE_LITERATURE_COLUMNS, columns))
+            item['created_at'] = format_date(item['created_at'])
+            item['score'] = round(value, 4)
+            item['shared_libraries'] = shared
+            results.append(item)
+        return results
+
+
+related_index = RelatedIndex()
@@ -0,0 +1,39 @@
+"""
+JSONRenderer that encodes with orjson when it is installed.
+
+orjson is an optional dependency. Without it, or for output orjson cannot
+produce (indented output, ASCII-only output, integers over 64 bits),
+FastJSONRenderer falls back to DRF's stdlib-json renderer.
+
+Both encoders produce the same JSON values, but not always the same bytes:
+orjson writes some floats in a different notation (1e-05 as 0.00001, 1e+16
+as 1e16), and it writes NaN and Infinity as null where JSONRenderer raises.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+    if orjson else 0
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            # Datetimes, decimals, lazy strings etc. go through DRF's encoder
+            # so they come out exactly as JSONRenderer writes them.
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
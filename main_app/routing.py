@@ -0,0 +1,87 @@
+"""
+Primary/replica database routing.
+
+Writes always go to 'default', the primary. Within a request handled by
+ReplicaRoutingMiddleware (middleware.py), reads go to one of the
+DATABASE_REPLICAS aliases. The replica is picked once per request, so a
+request never mixes replicas that lag by different amounts.
+
+A request is pinned to the primary, for reads included, from its first
+write onwards. Requests that are not GET, HEAD or OPTIONS are pinned from
+the start, so their validation reads see the rows they are about to write.
+select_for_update() is routed as a write. Together these keep
+read-your-writes within a request.
+
+The response to a write also carries a pin token that pins the client's
+next DATABASE_REPLICA_PIN_SECONDS of requests, which covers replication
+lag. It is sent twice: as the PIN_HEADER response header, which the
+cross-origin SPA echoes back on its requests (CORS credentials are off, so
+it never sends cookies), and as the PIN_COOKIE cookie for same-origin
+clients. The token is signed with its issue time, so a client can neither
+forge one nor extend it.
+
+Reads outside a request, such as management commands or tests that do not
+go through the middleware, stay on the primary.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'db_pinned'
+PIN_HEADER = 'X-DB-Pin'
+PIN_SALT = 'main_app.routing.pin'
+
+current_routing = contextvars.ContextVar('current_routing', default=None)
+
+
+class RequestRouting:
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        replicas = settings.DATABASE_REPLICAS
+        self.replica = random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+
+def pin_token():
+    return signing.TimestampSigner(salt=PIN_SALT).sign('1')
+
+
+def is_pinned(token):
+    """True if `token` came from pin_token() less than DATABASE_REPLICA_PIN_SECONDS ago."""
+    if not token:
+        return False
+    try:
+        signing.TimestampSigner(salt=PIN_SALT).unsign(token, max_age=settings.DATABASE_REPLICA_PIN_SECONDS)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def pin_to_primary():
+    """Send the rest of the current request's reads to the primary."""
+    routing = current_routing.get()
+    if routing is not None:
+        routing.pinned = True
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        routing = current_routing.get()
+        if routing is None or routing.pinned:
+            return DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = current_routing.get()
+        if routing is not None:
+            routing.pinned = routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary.
+        return True
@@ -0,0 +1,114 @@
+import re
+
+from django.db import connection
+
+from .models import Literature
+
+SEARCH_TABLE = 'main_app_literature_fts'
+MAX_SEARCH_TERMS = 8
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def search_terms(query):
+    """Split a free-text query into at most MAX_SEARCH_TERMS lowercase words."""
+    return TOKEN_RE.findall(query.lower())[:MAX_SEARCH_TERMS]
+
+
+class PostgresSearchBackend:
+    """
+    Ranked search over the generated `search_vector` column.
+
+    The column and its GIN index are created by migration 0004 and maintained
+    by PostgreSQL itself, so there is nothing to do on writes.
+    """
+
+    def search(self, terms, literature_types=None, limit=25):
+        query = ' & '.join(f'{term}:*' for term in terms)
+        sql = [
+            "SELECT id FROM main_app_literature, to_tsquery('simple', %s) query",
+            "WHERE search_vector @@ query",
+        ]
+        params = [query]
+        if literature_types:
+            sql.append('AND literature_type = ANY(%s)')
+            params.append(list(literature_types))
+        sql.append('ORDER BY ts_rank_cd(search_vector, query) DESC, id DESC LIMIT %s')
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(' '.join(sql), params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def index(self, literature_items):
+        pass
+
+    def remove(self, literature_ids):
+        pass
+
+
+class SQLiteSearchBackend:
+    """
+    Ranked search over the FTS5 table created by migration 0004.
+
+    Rows are written here whenever Literature is saved or deleted (see
+    signals.py); bulk writers must call index() themselves.
+    """
+    # bm25 column weights for title, authors, description
+    weights = (10.0, 5.0, 1.0)
+
+    def search(self, terms, literature_types=None, limit=25):
+        query = ' '.join(f'"{term}"*' for term in terms)
+        sql = [
+            f'SELECT l.id FROM {SEARCH_TABLE} f',
+            'JOIN main_app_literature l ON l.id = f.rowid',
+            f'WHERE {SEARCH_TABLE} MATCH %s',
+        ]
+        params = [query]
+        if literature_types:
+            sql.append('AND l.literature_type IN (%s)' % ', '.join(['%s'] * len(literature_types)))
+            params.extend(literature_types)
+        weights = ', '.join(str(weight) for weight in self.weights)
+        sql.append(f'ORDER BY bm25({SEARCH_TABLE}, {weights}), l.id DESC LIMIT %s')
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(' '.join(sql), params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def index(self, literature_items):
+        rows = [(item.id, item.title, item.authors, item.description) for item in literature_items]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, title, authors, description) VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+
+    def remove(self, literature_ids):
+        if not literature_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(pk,) for pk in literature_ids])
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_search_backend():
+    return BACKENDS[connection.vendor]()
+
+
+def search_literature(query, literature_types=None, limit=25, queryset=None):
+    """Return the Literature rows matching `query`, best match first."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    ids = get_search_backend().search(terms, literature_types, limit)
+    if queryset is None:
+        queryset = Literature.objects.all()
+    found = queryset.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
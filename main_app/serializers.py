@@ -1,47 +1,88 @@
+from django.conf import settings
 from rest_framework import serializers
+from .authors import NAME_MAX_LENGTH, display_authors, unique_names
+from .fieldsets import SparseFieldsetSerializerMixin
+from .filters import filter_literature
+from .metrics import TimedSerializerMixin
 from .models import Literature, Library
+from .pagination import LibraryLiteraturePagination
+from .payloads import library_literature_params, library_literature_url
 from django.contrib.auth.models import User
 
 
-class LibrarySerializer(serializers.ModelSerializer):
+class LibrarySerializer(SparseFieldsetSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
-    literature_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Library
         fields = ['id', 'name', 'user', 'literature_count']
-    
-    def get_literature_count(self, obj):
-        return obj.literature_set.count()
 
-class LibraryDetailSerializer(serializers.ModelSerializer):
+class LibraryDetailSerializer(SparseFieldsetSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     literature = serializers.SerializerMethodField()
-    literature_count = serializers.SerializerMethodField()
+    literature_next = serializers.SerializerMethodField()
     
     class Meta:
         model = Library
-        fields = ['id', 'name', 'user', 'literature', 'literature_count']
+        fields = ['id', 'name', 'user', 'literature', 'literature_next', 'literature_count']
     
     def get_literature(self, obj):
-        literature = obj.literature_set.all()
-        return SimpleLiteratureSerializer(literature, many=True).data
-    
-    def get_literature_count(self, obj):
-        return obj.literature_set.count()
+        return SimpleLiteratureSerializer(self.get_literature_page(obj)[0], many=True).data
+
+    def get_literature_next(self, obj):
+        return self.get_literature_page(obj)[1]
 
-class SimpleLiteratureSerializer(serializers.ModelSerializer):
+    def get_literature_page(self, obj):
+        """The first page of the library's literature and the next link; both fields share the query."""
+        pages = self.__dict__.setdefault('_literature_pages', {})
+        if obj.pk not in pages:
+            request = self.context.get('request')
+            params = library_literature_params(request.query_params if request is not None else {})
+            paginator = LibraryLiteraturePagination()
+            paginator.base_url = library_literature_url(obj.pk, params, request)
+            rows = paginator.paginate_rows(filter_literature(obj.literature_set.all(), params), params)
+            pages[obj.pk] = (rows, paginator.get_next_link())
+        return pages[obj.pk]
+
+class SimpleLiteratureSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Literature
         fields = ['id', 'title', 'authors', 'description', 'literature_type', 'url', 'created_at']
 
-class LiteratureSerializer(serializers.ModelSerializer):
+class LiteratureSerializer(SparseFieldsetSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     libraries = LibrarySerializer(many=True, read_only=True)
     user = serializers.PrimaryKeyRelatedField(read_only=True)
+    # The full byline; `authors` is derived from it (see authors.py).
+    author_names = serializers.ListField(
+        child=serializers.CharField(max_length=NAME_MAX_LENGTH), allow_empty=False, write_only=True, required=False
+    )
     
     class Meta:
         model = Literature
-        fields = '__all__'
+        # normalized_url is internal to duplicate detection.
+        exclude = ['normalized_url']
+        extra_kwargs = {'authors': {'required': False}}
+
+    def validate(self, attrs):
+        if 'author_names' in attrs:
+            attrs['author_names'] = unique_names(attrs['author_names'])
+            if not attrs['author_names']:
+                raise serializers.ValidationError({'author_names': 'List at least one name.'})
+            attrs['authors'] = display_authors(attrs['author_names'])
+        elif self.instance is None and 'authors' not in attrs:
+            raise serializers.ValidationError({'authors': 'This field is required.'})
+        return attrs
+
+    def create(self, validated_data):
+        names = validated_data.pop('author_names', None)
+        instance = Literature(**validated_data)
+        instance._author_names = names
+        instance.save()
+        return instance
+
+    def update(self, instance, validated_data):
+        instance._author_names = validated_data.pop('author_names', None)
+        return super().update(instance, validated_data)
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -56,4 +97,15 @@ class UserSerializer(serializers.ModelSerializer):
             email=validated_data['email'],
             password=validated_data['password']
         )
-        return user
\ No newline at end of file
+        return user
+
+class MembershipOperationSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['add', 'remove'])
+    literature = serializers.IntegerField()
+    library = serializers.IntegerField()
+
+
+class MembershipBatchSerializer(serializers.Serializer):
+    operations = MembershipOperationSerializer(
+        many=True, allow_empty=False, max_length=settings.LIBRARY_MEMBERSHIP_BATCH_LIMIT
+    )
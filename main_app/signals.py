@@ -0,0 +1,196 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import user_cache
+from .authors import split_authors, sync_authors
+from .cache import literature_cache
+from .duplicates import normalize_url, similarity_index
+from .facets import facet_cache
+from .models import Change, Library, Literature
+from .related import related_index
+from .search import get_search_backend
+from .sync import library_changes, literature_changes, membership_changes, record
+
+
+@receiver(post_save, sender=Literature)
+def index_literature(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_search_backend().index([instance])
+
+
+@receiver(pre_save, sender=Literature)
+def set_normalized_url(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance.normalized_url = normalize_url(instance.url)
+
+
+@receiver(post_save, sender=Literature)
+def sync_literature_authors(sender, instance, created, raw=False, **kwargs):
+    # LiteratureSerializer leaves the full list in _author_names when
+    # `authors` was derived from it.
+    names = instance.__dict__.pop('_author_names', None)
+    if raw or (names is None and not created and instance.authors == getattr(instance, '_loaded_authors', None)):
+        return
+    sync_authors([(instance.pk, split_authors(instance.authors) if names is None else names)])
+    instance._loaded_authors = instance.authors
+
+
+@receiver(post_save, sender=Literature)
+def index_literature_similarity(sender, instance, raw=False, **kwargs):
+    # Rows go with their literature through the foreign key cascade.
+    if not raw:
+        similarity_index.index([instance])
+
+
+@receiver(post_save, sender=Literature)
+def log_saved_literature(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    owners = [instance.user_id]
+    if not created:
+        # The owners of the libraries holding it keep a copy too.
+        owners.extend(Library.objects.filter(literature=instance).values_list('user_id', flat=True))
+    record(literature_changes(Change.CREATED if created else Change.UPDATED, [instance.pk], owners))
+
+
+@receiver(post_delete, sender=Literature)
+def unindex_literature(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Literature)
+def invalidate_saved_literature(sender, instance, **kwargs):
+    literature_cache.invalidate_literature([instance.pk])
+    facet_cache.invalidate()
+
+
+@receiver(pre_delete, sender=Literature)
+def remember_literature_libraries(sender, instance, **kwargs):
+    # The through rows are gone by post_delete, so collect them now.
+    instance._deleted_from_libraries = list(Library.objects.filter(literature=instance))
+
+
+@receiver(post_delete, sender=Literature)
+def invalidate_deleted_literature(sender, instance, **kwargs):
+    libraries = getattr(instance, '_deleted_from_libraries', [])
+    Library.objects.filter(id__in=[library.id for library in libraries]).adjust_literature_count(-1)
+    literature_cache.invalidate_literature([instance.pk])
+    literature_cache.invalidate_libraries(libraries)
+    facet_cache.invalidate()
+
+
+@receiver(post_delete, sender=Literature)
+def log_deleted_literature(sender, instance, **kwargs):
+    libraries = getattr(instance, '_deleted_from_libraries', [])
+    owners = [instance.user_id] + [library.user_id for library in libraries]
+    record(
+        literature_changes(Change.DELETED, [instance.pk], owners)
+        + membership_changes(Change.REMOVED, libraries, [instance.pk])
+    )
+
+
+@receiver(m2m_changed, sender=Literature.libraries.through)
+def remember_removed_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    # remove() reports every requested pk, member or not, and clear() reports
+    # none, so record which rows are really about to go.
+    if action == 'pre_remove':
+        if reverse:
+            instance._removed_literature = list(
+                sender.objects.filter(library_id=instance.pk, literature_id__in=pk_set)
+                .values_list('literature_id', flat=True)
+            )
+        else:
+            instance._removed_libraries = list(Library.objects.filter(literature=instance, id__in=pk_set))
+    elif action == 'pre_clear':
+        if reverse:
+            instance._removed_literature = list(instance.literature_set.values_list('id', flat=True))
+        else:
+            instance._removed_libraries = list(instance.libraries.all())
+
+
+def changed_membership(instance, action, reverse, pk_set):
+    """Return (libraries, literature_ids) whose membership really changed."""
+    if action == 'post_add':
+        if reverse:
+            return [instance], list(pk_set)
+        return list(Library.objects.filter(id__in=pk_set)), [instance.pk]
+    if reverse:
+        return [instance], getattr(instance, '_removed_literature', [])
+    return getattr(instance, '_removed_libraries', []), [instance.pk]
+
+
+@receiver(m2m_changed, sender=Literature.libraries.through)
+def membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    libraries, literature_ids = changed_membership(instance, action, reverse, pk_set)
+    if not libraries or not literature_ids:
+        return
+
+    # Seen from a library, every changed literature item is one row; seen
+    # from a literature item, each changed library gains or loses one row.
+    delta = len(literature_ids) if reverse else 1
+    if action != 'post_add':
+        delta = -delta
+    Library.objects.filter(id__in=[library.id for library in libraries]).adjust_literature_count(delta)
+    Literature.objects.filter(id__in=literature_ids).touch()
+    record(membership_changes(Change.ADDED if action == 'post_add' else Change.REMOVED, libraries, literature_ids))
+
+    literature_cache.invalidate_literature(literature_ids)
+    literature_cache.invalidate_libraries(libraries)
+    facet_cache.invalidate()
+
+
+@receiver(m2m_changed, sender=Literature.libraries.through)
+def refresh_related_literature(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    libraries, literature_ids = changed_membership(instance, action, reverse, pk_set)
+    if not libraries or not literature_ids:
+        return
+    # Same delta as membership_changed, which has already applied it.
+    delta = len(literature_ids) if reverse else 1
+    if action != 'post_add':
+        delta = -delta
+    if related_index.counts_towards([library.id for library in libraries], delta):
+        related_index.schedule_refresh(literature_ids)
+
+
+@receiver(post_save, sender=Library)
+def invalidate_saved_library(sender, instance, **kwargs):
+    literature_cache.invalidate_libraries([instance])
+
+
+@receiver(post_save, sender=Library)
+def log_saved_library(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        record(library_changes(Change.CREATED if created else Change.UPDATED, [instance]))
+
+
+@receiver(pre_delete, sender=Library)
+def remember_library_literature(sender, instance, **kwargs):
+    instance._deleted_literature = list(instance.literature_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Library)
+def invalidate_deleted_library(sender, instance, **kwargs):
+    literature_ids = getattr(instance, '_deleted_literature', [])
+    Literature.objects.filter(id__in=literature_ids).touch()
+    if instance.literature_count <= related_index.max_library_size:
+        related_index.schedule_refresh(literature_ids)
+    literature_cache.invalidate_literature(literature_ids)
+    literature_cache.invalidate_users([instance.user_id])
+    facet_cache.invalidate()
+
+
+@receiver(post_delete, sender=Library)
+def log_deleted_library(sender, instance, **kwargs):
+    # Its memberships go with it; clients drop them along with the library.
+    record(library_changes(Change.DELETED, [instance]))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
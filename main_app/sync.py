@@ -0,0 +1,198 @@
+"""
+Delta sync.
+
+A client keeps a copy of its user's data: their libraries, the memberships
+of those libraries, and the literature they own or have filed. Instead of
+re-fetching all of it, the client calls GET /sync/?since=<token> and applies
+what changed since its last token.
+
+Every create, update and delete of Literature and Library, and every
+membership change, appends Change rows. There is one row per user whose copy
+it touches: the owner, plus the owners of the libraries holding the
+literature. The receivers in signals.py write them, and bulk writers call
+record() themselves. A sync then reads one range of the (user, id) index.
+
+The rows are written once the change commits, in a short transaction of
+their own. Ids are handed out before the commit, so an entry can become
+visible after one with a higher id. To cover that, a sync stops short of
+every entry younger than SYNC_SETTLE_SECONDS, and a token never moves past
+an entry that could still appear below it. Syncs read from the primary: a
+replica that lags would age entries past the settle window, and its rows
+would be older than the log that points at them.
+
+A batch is compacted. The last entry per literature item, library and
+membership wins, and changed rows are sent as they are now, not as a list
+of events. A batch holds at most SYNC_BATCH_SIZE entries, and `more` tells
+the client to call again straight away.
+
+The log keeps roughly the newest SYNC_LOG_MAX_ROWS entries. A token older
+than the oldest kept entry has expired. For those, the endpoint answers 410
+with a fresh token; the client fetches everything again and syncs from
+there.
+"""
+from datetime import timedelta
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .fieldsets import LITERATURE_FIELDS
+from .models import Change, Library, Literature
+from .payloads import literature_columns, literature_payloads
+
+# Bounded so IN lists stay under SQLite's host parameter limit.
+QUERY_CHUNK = 900
+
+# Memberships are sent on their own, so literature payloads leave them out.
+SYNC_LITERATURE_FIELDS = tuple(name for name in LITERATURE_FIELDS if name != 'libraries')
+
+
+def literature_changes(action, literature_ids, user_ids):
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    return [
+        Change(user_id=user_id, kind=Change.LITERATURE, action=action, literature_id=literature_id)
+        for literature_id in literature_ids for user_id in user_ids
+    ]
+
+
+def library_changes(action, libraries):
+    return [
+        Change(user_id=library.user_id, kind=Change.LIBRARY, action=action, library_id=library.id)
+        for library in libraries
+    ]
+
+
+def membership_changes(action, libraries, literature_ids):
+    return [
+        Change(
+            user_id=library.user_id, kind=Change.MEMBERSHIP, action=action,
+            literature_id=literature_id, library_id=library.id,
+        )
+        for library in libraries for literature_id in literature_ids
+    ]
+
+
+def record(changes):
+    """Append `changes`, unsaved Change rows, once the current transaction commits."""
+    changes = list(changes)
+    if changes:
+        transaction.on_commit(lambda: append(changes))
+
+
+def append(changes):
+    Change.objects.bulk_create(changes)
+    last_id = max((change.id for change in changes if change.id), default=None)
+    if last_id is None:
+        last_id = Change.objects.aggregate(last=Max('id'))['last']
+    # Trim the log each time the ids cross a multiple of the interval.
+    interval = settings.SYNC_LOG_PRUNE_INTERVAL
+    if last_id // interval != (last_id - len(changes)) // interval:
+        Change.objects.filter(id__lte=last_id - settings.SYNC_LOG_MAX_ROWS).delete()
+
+
+def settled_id():
+    """
+    The id a sync may read up to: just below the oldest entry still inside
+    SYNC_SETTLE_SECONDS, or the newest entry when there is none.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    unsettled = Change.objects.filter(created_at__gt=cutoff).aggregate(first=Min('id'))['first']
+    if unsettled is not None:
+        return unsettled - 1
+    return Change.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+def is_expired(since):
+    """Whether entries after `since` may have been pruned, or `since` was never handed out."""
+    # Two aggregates so each is one index probe.
+    first = Change.objects.aggregate(first=Min('id'))['first']
+    last = Change.objects.aggregate(last=Max('id'))['last']
+    if last is None:
+        return since > 0
+    return since < first - 1 or since > last
+
+
+def changes_since(user, since, limit=None):
+    """A compacted batch of the changes to `user`'s data after `since`; None when the token has expired."""
+    limit = limit or settings.SYNC_BATCH_SIZE
+    if is_expired(since):
+        return None
+    settled = settled_id()
+    entries = list(
+        Change.objects.filter(user=user, id__gt=since, id__lte=settled).order_by('id')
+        .values_list('id', 'kind', 'action', 'literature_id', 'library_id')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+    token = entries[-1][0] if more else max(since, settled)
+    return {'token': str(token), 'more': more, 'reset': False, **compact(user, entries)}
+
+
+def compact(user, entries):
+    literature, libraries, memberships = {}, {}, {}
+    for _, kind, action, literature_id, library_id in entries:
+        if kind == Change.LITERATURE:
+            literature[literature_id] = action
+        elif kind == Change.LIBRARY:
+            libraries[library_id] = action
+        else:
+            memberships[literature_id, library_id] = action
+
+    deleted_literature = {key for key, action in literature.items() if action == Change.DELETED}
+    deleted_libraries = {key for key, action in libraries.items() if action == Change.DELETED}
+    # Membership changes move literature_count.
+    library_ids = {key for key, action in libraries.items() if action != Change.DELETED}
+    library_ids.update(library_id for _, library_id in memberships)
+    library_ids -= deleted_libraries
+    # A deleted library or literature item takes its memberships with it.
+    memberships = {
+        (literature_id, library_id): action for (literature_id, library_id), action in memberships.items()
+        if literature_id not in deleted_literature and library_id not in deleted_libraries
+    }
+    # Newly filed literature may not be in the client's copy yet.
+    literature_ids = {key for key, action in literature.items() if action != Change.DELETED}
+    literature_ids.update(literature_id for (literature_id, _), action in memberships.items() if action == Change.ADDED)
+
+    # Rows deleted after the settled id are left out; their entries come
+    # in a later batch.
+    columns = literature_columns(SYNC_LITERATURE_FIELDS)
+    literature_rows, library_rows = [], []
+    literature_ids, library_ids = sorted(literature_ids), sorted(library_ids)
+    for start in range(0, len(literature_ids), QUERY_CHUNK):
+        literature_rows.extend(
+            Literature.objects.filter(id__in=literature_ids[start:start + QUERY_CHUNK]).order_by('id').values(*columns)
+        )
+    for start in range(0, len(library_ids), QUERY_CHUNK):
+        library_rows.extend(
+            Library.objects.filter(user=user, id__in=library_ids[start:start + QUERY_CHUNK]).order_by('id')
+            .values_list('id', 'name', 'user_id', 'literature_count')
+        )
+
+    return {
+        'libraries': {
+            'changed': [
+                {'id': library_id, 'name': name, 'user': user_id, 'literature_count': literature_count}
+                for library_id, name, user_id, literature_count in library_rows
+            ],
+            'deleted': sorted(deleted_libraries),
+        },
+        'literature': {
+            'changed': literature_payloads(literature_rows, SYNC_LITERATURE_FIELDS),
+            'deleted': sorted(deleted_literature),
+        },
+        'memberships': {
+            action: [
+                {'literature': literature_id, 'library': library_id}
+                for literature_id, library_id in sorted(memberships, key=itemgetter(1, 0))
+                if memberships[literature_id, library_id] == action
+            ]
+            for action in (Change.ADDED, Change.REMOVED)
+        },
+    }
+
+
+def reset_payload():
+    """The answer to a first sync or an expired token: fetch everything, then sync from `token`."""
+    return {'token': str(settled_id()), 'more': False, 'reset': True}
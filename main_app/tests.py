@@ -1,3 +1,1784 @@
-from django.test import TestCase
+import json
+import math
+import os
+import tempfile
+import time
+from base64 import b64encode
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Prefetch
+from django.http import HttpResponse, QueryDict
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.fields import DateTimeField
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import user_cache
+from .authors import display_authors, split_authors
+from .cache import literature_cache
+from .duplicates import normalize_url
+from .hashers import hashing_pool, hashing_slots
+from . import jobs
+from . import membership
+from . import metrics
+from . import renderers
+from .metrics import registry
+from .middleware import PerformanceMiddleware
+from .models import Author, Change, Job, Literature, LiteratureAuthor, Library, RelatedLiterature
+from .pagination import LiteratureCursorPagination
+from .payloads import format_datetime
+from .routing import RequestRouting, current_routing
+from .serializers import LibraryDetailSerializer, LiteratureSerializer
+from .views import filter_literature
+
+
+def make_literature(count, user=None, libraries=(), **kwargs):
+    items = []
+    for i in range(count):
+        fields = {
+            'title': f'Title {i}',
+            'authors': f'Author {i}',
+            'description': 'Description',
+            'url': f'https://example.com/{i}',
+            'literature_type': 1 + i % 5,
+            'user': user,
+        }
+        fields.update(kwargs)
+        literature = Literature.objects.create(**fields)
+        if libraries:
+            literature.libraries.add(*libraries)
+        items.append(literature)
+    return items
+
+
+class QueryCountTests(TestCase):
+    """
+    Each endpoint must run a constant number of queries however many rows it
+    returns. The counts are asserted for a small and a larger data set so an
+    N+1 shows up as a mismatch.
+    """
+
+    def setUp(self):
+        caches['literature'].clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_libraries(self, count, user=None):
+        return [
+            Library.objects.create(name=f'Library {i}', user=user or self.user)
+            for i in range(count)
+        ]
+
+    def assert_constant_queries(self, expected, build, request):
+        for size in (1, 10):
+            build(size)
+            with self.assertNumQueries(expected):
+                response = request()
+            self.assertEqual(response.status_code, 200)
+
+    def test_literature_list(self):
+        libraries = self.make_libraries(3)
+
+        def build(size):
+            make_literature(size, user=self.user, libraries=libraries)
+
+        # validators (page timestamps, library timestamps), literature page,
+        # prefetched libraries with counts
+        self.assert_constant_queries(4, build, lambda: self.client.get('/literatures/?page_size=100'))
+
+    def test_literature_detail(self):
+        libraries = self.make_libraries(3)
+        self.make_libraries(2, user=self.other)
+        literature = make_literature(1, user=self.user)[0]
+
+        def build(size):
+            literature.libraries.add(*self.make_libraries(size))
+            make_literature(size, libraries=libraries)
+
+        # validators, literature, its libraries, the user's remaining libraries
+        self.assert_constant_queries(4, build, lambda: self.client.get(f'/literatures/{literature.id}/'))
+
+    def test_literature_detail_anonymous(self):
+        literature = make_literature(1, user=self.user)[0]
+        client = APIClient()
+
+        def build(size):
+            literature.libraries.add(*self.make_libraries(size))
+
+        self.assert_constant_queries(3, build, lambda: client.get(f'/literatures/{literature.id}/'))
+
+    def test_library_list(self):
+        def build(size):
+            make_literature(size, libraries=self.make_libraries(size))
+
+        self.assert_constant_queries(2, build, lambda: self.client.get('/libraries/'))
+
+    def test_library_detail(self):
+        library = self.make_libraries(1)[0]
+
+        def build(size):
+            make_literature(size, libraries=[library])
+
+        # validators, library with count, prefetched literature
+        self.assert_constant_queries(3, build, lambda: self.client.get(f'/libraries/{library.id}/'))
+
+    def test_literature_count_is_reported(self):
+        library = self.make_libraries(1)[0]
+        make_literature(4, libraries=[library])
+        response = self.client.get(f'/libraries/{library.id}/')
+        self.assertEqual(response.data['literature_count'], 4)
+        self.assertEqual(len(response.data['literature']), 4)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        caches['literature'].clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.literature = make_literature(7, user=self.user)
+        # Tie every created_at so only the id orders the pages.
+        Literature.objects.update(created_at=datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+
+    def walk(self, url, direction='next'):
+        pages, link = [], url
+        while link:
+            body = self.client.get(link).json()
+            pages.append([item['id'] for item in body['results']])
+            link = body[direction]
+        return pages
+
+    def test_pages_cover_tied_rows_once_in_both_directions(self):
+        pages = self.walk('/literatures/?page_size=3')
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        expected = sorted((item.id for item in self.literature), reverse=True)
+        self.assertEqual(sum(pages, []), expected)
+
+        last = self.client.get('/literatures/?page_size=3').json()['next']
+        last = self.client.get(last).json()['next']
+        back = self.walk(self.client.get(last).json()['previous'], 'previous')
+        self.assertEqual(back, [expected[3:6], expected[:3]])
+
+    def test_filters_carry_across_cursors(self):
+        Literature.objects.filter(id__in=[item.id for item in self.literature[:2]]).update(literature_type=1)
+        pages = self.walk('/literatures/?literature_type=1&page_size=1')
+        expected = sorted(
+            (item.id for item in Literature.objects.filter(literature_type=1)), reverse=True
+        )
+        self.assertEqual(sum(pages, []), expected)
+        self.assertTrue(all(len(page) == 1 for page in pages))
+
+    @override_settings(LITERATURE_PAGE_SIZE=2, LITERATURE_MAX_PAGE_SIZE=4)
+    def test_page_size_is_clamped(self):
+        for page_size, expected in (('', 2), ('abc', 2), ('0', 1), ('-5', 1), ('3', 3), ('1000', 4)):
+            body = self.client.get(f'/literatures/?page_size={page_size}').json()
+            self.assertEqual(len(body['results']), expected, page_size)
+
+    def test_invalid_and_tampered_cursors_are_rejected(self):
+        def encode(position):
+            return b64encode(json.dumps(position).encode()).decode()
+
+        for cursor in (
+            'not base64!', 'bm90IGpzb24=', encode({'a': 1}), encode([1, 2]),
+            encode(['yesterday', 1, 0]), encode(['2024-01-01T00:00:00+00:00', 'x', 0]),
+            encode(['2024-01-01T00:00:00+00:00', 10 ** 30, 0]),
+        ):
+            response = self.client.get('/literatures/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertIn('cursor', response.json())
+
+
+class LiteratureSearchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.sicp = Literature.objects.create(
+            title='Structure and Interpretation of Computer Programs', authors='Abelson, Sussman',
+            description='Programming fundamentals', url='https://example.com/sicp',
+            literature_type=1, user=self.user,
+        )
+        self.paper = Literature.objects.create(
+            title='Lambda papers', authors='Sussman, Steele',
+            description='Notes on computer programs and Scheme', url='https://example.com/lambda',
+            literature_type=2, user=self.user,
+        )
+
+    def search(self, query):
+        response = self.client.get('/literatures/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search('computer programs'), [self.sicp.id, self.paper.id])
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.search('susm'), [])
+        self.assertCountEqual(self.search('suss'), [self.sicp.id, self.paper.id])
+
+    def test_type_filter(self):
+        response = self.client.get('/literatures/search/', {'q': 'sussman', 'literature_type': '2'})
+        self.assertEqual([item['id'] for item in response.data['results']], [self.paper.id])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get('/literatures/search/').status_code, 400)
+
+    def test_index_follows_updates_and_deletes(self):
+        response = self.client.patch(f'/literatures/{self.paper.id}/', {'title': 'Rabbit compiler'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search('rabbit'), [self.paper.id])
+        self.assertEqual(self.search('lambda'), [])
+
+        self.client.delete(f'/literatures/{self.paper.id}/')
+        self.assertEqual(self.search('rabbit'), [])
+
+
+class LiteratureImportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.library = Library.objects.create(name='Reading list', user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, content, **data):
+        data['file'] = SimpleUploadedFile(name, content.encode('utf-8'))
+        return self.client.post('/literatures/import/', data, format='multipart')
+
+    def test_csv_import_reports_invalid_rows(self):
+        content = (
+            'title,authors,description,url,literature_type\n'
+            'Dune,Frank Herbert,Desert planet,https://example.com/dune,Book\n'
+            ',Nobody,Missing title,https://example.com/x,1\n'
+            'Neuromancer,William Gibson,Cyberspace,https://example.com/n,1\n'
+        )
+        response = self.upload('books.csv', content, library=self.library.id, batch_size=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 1)
+        self.assertEqual(response.data['errors'][0]['line'], 3)
+        self.assertIn('title', response.data['errors'][0]['errors'])
+        self.assertEqual(self.library.literature_set.count(), 2)
+        self.assertEqual(Literature.objects.filter(user=self.user).count(), 2)
+
+    def test_malformed_csv_records_are_reported_per_row(self):
+        content = (
+            'title,authors,description,url,literature_type\n'
+            f'Huge,Someone,{"x" * 200000},https://example.com/h,1\n'
+            'Nul,Some\x00one,Desc,https://example.com/z,1\n'
+            'Dune,Frank Herbert,Desert planet,https://example.com/dune,Book\n'
+        )
+        response = self.upload('books.csv', content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 2))
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3])
+
+    def test_bibtex_and_ris_import(self):
+        bibtex = """
+@inproceedings{lamport78,
+  title = {Time, Clocks, and the {Ordering} of Events},
+  author = {Leslie Lamport and Someone Else},
+  abstract = "Distributed systems",
+  url = {https://example.com/clocks}
+}
+"""
+        ris = "TY  - THES\nTI  - A thesis\nAU  - Doe, Jane\nAB  - Research\nUR  - https://example.com/t\nER  -\n"
+        self.assertEqual(self.upload('refs.bib', bibtex).data['created'], 1)
+        self.assertEqual(self.upload('refs.ris', ris).data['created'], 1)
+
+        paper = Literature.objects.get(literature_type=4)
+        self.assertEqual(paper.title, 'Time, Clocks, and the Ordering of Events')
+        self.assertEqual(paper.authors, 'Leslie Lamport, Someone Else')
+        self.assertEqual(Literature.objects.get(literature_type=5).authors, 'Doe, Jane')
+
+    def test_jsonl_bad_line_does_not_abort(self):
+        content = (
+            '{"title": "A", "authors": "B", "description": "C", "url": "D", "literature_type": 2}\n'
+            'not json\n'
+            '{"title": "E", "authors": "F", "description": "G", "url": "H", "literature_type": 3}\n'
+        )
+        response = self.upload('rows.jsonl', content)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 1))
+
+    def test_library_must_be_owned(self):
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        library = Library.objects.create(name='Theirs', user=other)
+        response = self.upload('rows.jsonl', '', library=library.id)
+        self.assertEqual(response.status_code, 403)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.library = Library.objects.create(name='Reading list', user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.in_library = make_literature(3, user=self.user, libraries=[self.library])
+        make_literature(2, user=self.user)
+
+    def content(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_library_jsonl_export_streams_only_its_rows(self):
+        response = self.client.get(f'/libraries/{self.library.id}/export/jsonl/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self.content(response).splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [item.id for item in self.in_library])
+
+    def test_catalogue_csv_export(self):
+        lines = self.content(self.client.get('/literatures/export/csv/?literature_type=1')).splitlines()
+        self.assertEqual(lines[0], 'id,title,authors,description,url,literature_type,created_at')
+        self.assertEqual(len(lines), 1 + Literature.objects.filter(literature_type=1).count())
+
+    def test_bibtex_export_round_trips_through_import(self):
+        bibtex = self.content(self.client.get(f'/libraries/{self.library.id}/export/bibtex/'))
+        response = self.client.post('/literatures/import/', {
+            'file': SimpleUploadedFile('export.bib', bibtex.encode('utf-8')),
+        }, format='multipart')
+        self.assertEqual(response.data['created'], 3)
+
+    def test_unknown_format_and_foreign_library(self):
+        self.assertEqual(self.client.get('/literatures/export/xml/').status_code, 400)
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        library = Library.objects.create(name='Theirs', user=other)
+        self.assertEqual(self.client.get(f'/libraries/{library.id}/export/csv/').status_code, 404)
+
+
+class LibraryMembershipBatchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.library = Library.objects.create(name='Mine', user=self.user)
+        self.second = Library.objects.create(name='Also mine', user=self.user)
+        self.foreign = Library.objects.create(name='Theirs', user=self.other)
+        self.literature = make_literature(4)
+
+    def post(self, operations):
+        return self.client.post('/libraries/memberships/', {'operations': operations}, format='json')
+
+    def test_per_pair_results(self):
+        first, second = self.literature[:2]
+        first.libraries.add(self.second)
+        response = self.post([
+            {'action': 'add', 'literature': first.id, 'library': self.library.id},
+            {'action': 'add', 'literature': first.id, 'library': self.library.id},
+            {'action': 'remove', 'literature': first.id, 'library': self.second.id},
+            {'action': 'remove', 'literature': second.id, 'library': self.library.id},
+            {'action': 'add', 'literature': second.id, 'library': self.foreign.id},
+            {'action': 'add', 'literature': 999999, 'library': self.library.id},
+            {'action': 'add', 'literature': second.id, 'library': 999999},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['results']], [
+            'added', 'already_present', 'removed', 'not_present',
+            'forbidden', 'literature_not_found', 'library_not_found',
+        ])
+        self.assertEqual(list(first.libraries.all()), [self.library])
+        self.assertFalse(self.foreign.literature_set.exists())
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def run(items):
+            operations = [
+                {'action': 'add', 'literature': item.id, 'library': library.id}
+                for item in items for library in (self.library, self.second)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.post(operations).status_code, 200)
+            return len(queries)
+
+        self.assertEqual(run(self.literature[:1]), run(self.literature[1:]))
+
+    def test_pairs_written_by_a_concurrent_batch_are_not_counted_twice(self):
+        first, second = self.literature[:2]
+        second.libraries.add(self.library)
+        # The batch checks against a stale view: another writer adds and
+        # removes the same pairs before it writes.
+        stale = {(second.id, self.library.id): 0}
+        reads = [lambda *args: stale, membership.existing_memberships]
+        Change.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch.object(
+                membership, 'existing_memberships', side_effect=lambda *args: reads.pop(0)(*args)
+            ) as existing:
+                first.libraries.add(self.library)
+                second.libraries.remove(self.library)
+                response = self.post([
+                    {'action': 'add', 'literature': first.id, 'library': self.library.id},
+                    {'action': 'remove', 'literature': second.id, 'library': self.library.id},
+                ])
+        self.assertEqual(existing.call_count, 2)
+        self.assertEqual([result['status'] for result in response.data['results']], ['added', 'removed'])
+        self.library.refresh_from_db()
+        self.assertEqual(self.library.literature_count, 1)
+        self.assertEqual(list(self.library.literature_set.all()), [first])
+        # One entry each from the concurrent writes; none from the batch.
+        self.assertEqual(Change.objects.filter(kind=Change.MEMBERSHIP).count(), 2)
+
+    def test_single_pair_views_take_the_library_lock(self):
+        item = self.literature[0]
+        add = f'/literatures/{item.id}/add-library/{self.library.id}/'
+        remove = f'/literatures/{item.id}/remove-library/{self.library.id}/'
+        with mock.patch.object(membership, 'lock_libraries', wraps=membership.lock_libraries) as lock:
+            self.assertEqual(self.client.post(add).data['library']['literature_count'], 1)
+            self.assertEqual(self.client.post(add).data['library']['literature_count'], 1)
+            self.assertEqual(self.client.post(remove).status_code, 200)
+            self.assertEqual(self.client.post(remove).status_code, 200)
+        self.assertEqual(lock.call_count, 4)
+        self.library.refresh_from_db()
+        self.assertEqual(self.library.literature_count, 0)
+        self.assertEqual(self.client.post(f'/literatures/{item.id}/add-library/{self.foreign.id}/').status_code, 403)
+
+    def test_admin_form_saves_memberships_under_the_lock(self):
+        item = self.literature[0]
+        item.libraries.add(self.second)
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin_user)
+        with mock.patch.object(membership, 'lock_libraries', wraps=membership.lock_libraries) as lock:
+            response = client.post(f'/admin/main_app/literature/{item.id}/change/', {
+                'title': item.title, 'authors': item.authors, 'description': item.description,
+                'url': item.url, 'literature_type': item.literature_type,
+                'user': self.user.id, 'libraries': [self.library.id],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(lock.call_count, 1)
+        self.assertEqual(list(item.libraries.all()), [self.library])
+        self.library.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.library.literature_count, self.second.literature_count), (1, 0))
+
+    def test_rejects_malformed_operations(self):
+        response = self.post([{'action': 'move', 'literature': 1, 'library': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+
+
+class LiteratureDetailCacheTests(TestCase):
+
+    def setUp(self):
+        caches['literature'].clear()
+        literature_cache.stats.reset()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.library = Library.objects.create(name='Mine', user=self.user)
+        self.literature, self.neighbour = make_literature(2, user=self.user, libraries=[self.library])
+        self.url = f'/literatures/{self.literature.id}/'
+
+    def test_repeat_hits_only_run_the_validator_query(self):
+        first = self.client.get(self.url).data
+        with self.assertNumQueries(1):
+            second = self.client.get(self.url).data
+        with self.assertNumQueries(1):
+            APIClient().get(self.url)
+        self.assertEqual(first, second)
+        stats = literature_cache.stats.snapshot()
+        self.assertEqual(stats['literature'], {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3})
+        self.assertEqual(stats['membership']['hits'], 1)
+
+    def test_save_invalidates_payload(self):
+        self.client.get(self.url)
+        self.client.patch(self.url, {'title': 'Renamed'})
+        self.assertEqual(self.client.get(self.url).data['literature']['title'], 'Renamed')
+
+    def test_membership_change_invalidates_neighbours_and_owner(self):
+        self.client.get(self.url)
+        other_library = Library.objects.create(name='Second', user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual([lib['id'] for lib in response.data['libraries_not_associated']], [other_library.id])
+
+        self.neighbour.libraries.remove(self.library)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['literature']['libraries'][0]['literature_count'], 1)
+        self.assertEqual(response.data['user_associated_libraries'][0]['literature_count'], 1)
+
+        self.library.literature_set.clear()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['literature']['libraries'], [])
+        self.assertEqual(len(response.data['libraries_not_associated']), 2)
+
+    def test_library_rename_and_delete_invalidate(self):
+        self.client.get(self.url)
+        self.library.name = 'Renamed'
+        self.library.save()
+        self.assertEqual(self.client.get(self.url).data['literature']['libraries'][0]['name'], 'Renamed')
+
+        self.library.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['literature']['libraries'], [])
+        self.assertEqual(response.data['user_associated_libraries'], [])
+
+    def test_library_changes_bump_versions_without_queries(self):
+        self.client.get(self.url)
+        self.client.get(f'/literatures/{self.neighbour.id}/')
+        with self.assertNumQueries(0):
+            literature_cache.invalidate_libraries([self.library])
+        self.assertIsNone(literature_cache.get_literature(self.literature.id))
+        self.assertIsNone(literature_cache.get_literature(self.neighbour.id))
+
+        # An evicted version key must not bring back payloads cached under it.
+        self.client.get(self.url)
+        caches['literature'].delete(literature_cache.library_version_key(self.library.id))
+        self.assertIsNone(literature_cache.get_literature(self.literature.id))
+
+    @override_settings(LITERATURE_CACHE_ALLOW_LOCAL=False)
+    def test_process_local_backend_is_not_used(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+        self.assertEqual(literature_cache.stats.snapshot()['literature']['hits'], 0)
+
+    def test_deleted_literature_is_not_served(self):
+        self.client.get(self.url)
+        self.client.delete(self.url)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        caches['literature'].clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.library = Library.objects.create(name='Mine', user=self.user)
+        self.literature = make_literature(3, user=self.user, libraries=[self.library])
+
+    def assert_revalidates(self, url, change):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1 if url != '/literatures/' else 2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_literature_list(self):
+        other = Library.objects.create(name='Other', user=self.user)
+        self.assert_revalidates('/literatures/', lambda: self.literature[0].libraries.add(other))
+
+    def test_literature_detail_sees_neighbour_membership(self):
+        item, neighbour = self.literature[:2]
+        self.assert_revalidates(
+            f'/literatures/{item.id}/', lambda: neighbour.libraries.remove(self.library)
+        )
+
+    def test_literature_detail_sees_new_user_library(self):
+        self.assert_revalidates(
+            f'/literatures/{self.literature[0].id}/',
+            lambda: Library.objects.create(name='New', user=self.user),
+        )
+
+    def test_library_list(self):
+        self.assert_revalidates('/libraries/', lambda: self.literature[0].libraries.remove(self.library))
+
+    def test_library_detail_sees_literature_edits(self):
+        def change():
+            self.client.patch(f'/literatures/{self.literature[0].id}/', {'title': 'Edited'})
+
+        self.assert_revalidates(f'/libraries/{self.library.id}/', change)
+
+    def test_missing_objects_are_404(self):
+        self.assertEqual(self.client.get('/literatures/999999/').status_code, 404)
+        self.assertEqual(self.client.get('/libraries/999999/').status_code, 404)
+
+
+class LiteratureCountTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.library = Library.objects.create(name='Mine', user=self.user)
+        self.second = Library.objects.create(name='Second', user=self.user)
+        self.literature = make_literature(4)
+
+    def assert_counts(self, first, second):
+        self.library.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.library.literature_count, self.second.literature_count), (first, second))
+
+    def test_counter_follows_membership_changes(self):
+        a, b, c, d = self.literature
+        a.libraries.add(self.library, self.second)
+        self.library.literature_set.add(b, c, a)
+        self.assert_counts(3, 1)
+
+        # removing non-members must not decrement
+        self.library.literature_set.remove(d, c)
+        a.libraries.remove(self.second, self.second)
+        self.assert_counts(2, 0)
+
+        b.libraries.add(self.second)
+        b.delete()
+        self.assert_counts(1, 0)
+
+        self.library.literature_set.clear()
+        c.libraries.add(self.library, self.second)
+        c.libraries.clear()
+        self.assert_counts(0, 0)
+
+    def test_bulk_paths_update_counter(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.post('/libraries/memberships/', {'operations': [
+            {'action': 'add', 'literature': item.id, 'library': self.library.id}
+            for item in self.literature
+        ]}, format='json')
+        content = '{"title": "A", "authors": "B", "description": "C", "url": "D", "literature_type": 2}\n'
+        client.post('/literatures/import/', {
+            'file': SimpleUploadedFile('rows.jsonl', content.encode('utf-8')), 'library': self.second.id,
+        }, format='multipart')
+        self.assert_counts(4, 1)
+
+    def test_recount_repairs_drift(self):
+        self.library.literature_set.add(*self.literature)
+        Library.objects.filter(id=self.library.id).update(literature_count=42)
+        Library.objects.filter(id=self.second.id).update(literature_count=3)
+
+        out = StringIO()
+        call_command('recount_libraries', '--dry-run', stdout=out)
+        self.assertIn('would repair 2', out.getvalue())
+        self.assert_counts(42, 3)
+
+        call_command('recount_libraries', '--batch-size', '1', stdout=StringIO())
+        self.assert_counts(4, 0)
+
+    def test_recount_keeps_adjustments_made_while_it_runs(self):
+        self.library.literature_set.add(*self.literature)
+        Library.objects.filter(id=self.library.id).update(literature_count=42)
+        late = make_literature(1)[0]
+
+        class Output(StringIO):
+            def write(output, text):
+                # Runs between the recount's COUNT and its UPDATE.
+                if late.libraries.count() == 0:
+                    late.libraries.add(self.library)
+                return super().write(text)
+
+        call_command('recount_libraries', stdout=Output())
+        self.assert_counts(5, 0)
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN the querysets behind the main views on a seeded table and fail
+    if any of them falls back to a full table scan or an explicit sort.
+    """
+    literature_rows = 5000
+    library_rows = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create([User(username=f'user{i}') for i in range(20)])
+        libraries = Library.objects.bulk_create([
+            Library(name=f'Library {i}', user=users[i % len(users)]) for i in range(cls.library_rows)
+        ])
+        literature = Literature.objects.bulk_create([
+            Literature(
+                title=f'Title {i}', authors='Author', description='Description', url='url',
+                literature_type=1 + i % 5, user=users[i % len(users)],
+            )
+            for i in range(cls.literature_rows)
+        ])
+        Through = Literature.libraries.through
+        Through.objects.bulk_create([
+            Through(literature_id=item.id, library_id=libraries[(i * 7) % len(libraries)].id)
+            for i, item in enumerate(literature)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.user = users[0]
+        cls.library = libraries[0]
+        cls.literature = literature
+
+    def assert_uses_indexes(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+        else:
+            self.assertNotRegex(plan, r'(?m)SCAN main_app_\w+$')
+            self.assertNotIn('TEMP B-TREE', plan)
+        return plan
+
+    def page_queryset(self, query=''):
+        params = QueryDict(query)
+        queryset = filter_literature(Literature.objects.all(), params)
+        return LiteratureCursorPagination().get_page_queryset(queryset, params)
+
+    def test_literature_list_pages(self):
+        middle = self.literature[len(self.literature) // 2]
+        cursor = LiteratureCursorPagination().encode_cursor(middle, False)
+        self.assert_uses_indexes(self.page_queryset())
+        self.assert_uses_indexes(self.page_queryset(f'cursor={cursor}'))
+        self.assert_uses_indexes(self.page_queryset('literature_type=3'))
+        self.assert_uses_indexes(self.page_queryset(f'user={self.user.id}'))
+
+    def test_deep_page_seeks_instead_of_scanning(self):
+        middle = self.literature[len(self.literature) // 2]
+        cursor = LiteratureCursorPagination().encode_cursor(middle, False)
+        plan = self.assert_uses_indexes(self.page_queryset(f'cursor={cursor}'))
+        if connection.vendor == 'sqlite':
+            self.assertIn('SEARCH main_app_literature USING INDEX literature_created_idx', plan)
+
+    def test_library_list(self):
+        self.assert_uses_indexes(Library.objects.filter(user=self.user).order_by('name', 'id'))
+
+    def test_library_literature_uses_reverse_through_index(self):
+        plan = self.assert_uses_indexes(Literature.objects.filter(libraries=self.library))
+        self.assertIn('library_literature_idx', plan)
+
+    def test_literature_libraries_prefetch(self):
+        ids = [item.id for item in self.literature[:25]]
+        self.assert_uses_indexes(Library.objects.filter(literature__in=ids))
+
+
+class AsyncViewParityTests(TestCase):
+    """The /async/ endpoints must return exactly what the DRF views return."""
+
+    def setUp(self):
+        caches['literature'].clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.library = Library.objects.create(name='Mine', user=self.user)
+        Library.objects.create(name='Spare', user=self.user)
+        Library.objects.create(name='Theirs', user=other)
+        self.literature = make_literature(30, user=self.user, libraries=[self.library])
+        make_literature(3, user=other)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def async_get(self, path, headers=None):
+        return async_to_sync(AsyncClient().get)('/async' + path, headers=headers or self.headers)
+
+    def assert_same(self, path, client=None):
+        expected = (client or self.client).get(path)
+        actual = self.async_get(path)
+        self.assertEqual(actual.status_code, expected.status_code)
+        # Page links point back at whichever route served the page.
+        content = actual.content.replace(b'testserver/async/', b'testserver/')
+        self.assertEqual(json.loads(content), json.loads(expected.content))
+
+    def test_literature_list(self):
+        self.assert_same('/literatures/')
+        self.assert_same('/literatures/?page_size=5&literature_type=2')
+        first = self.client.get('/literatures/?page_size=10').json()
+        self.assert_same(first['next'].replace('http://testserver', ''))
+
+    def test_literature_detail(self):
+        path = f'/literatures/{self.literature[0].id}/'
+        self.assert_same(path)
+        # The second read is served from the cache on both sides.
+        self.assert_same(path)
+        caches['literature'].clear()
+        self.async_get(path)
+        self.assert_same(path)
+        self.assert_same('/literatures/999999/')
+
+    def test_anonymous_literature_detail(self):
+        self.headers = {}
+        self.assert_same(f'/literatures/{self.literature[0].id}/', APIClient())
+
+    def test_library_endpoints(self):
+        self.assert_same('/libraries/')
+        self.assert_same(f'/libraries/{self.library.id}/')
+        self.assert_same('/libraries/999999/')
+
+    def test_sparse_fieldsets(self):
+        detail = f'/literatures/{self.literature[0].id}/'
+        for path in (
+            '/literatures/?fields=id,title', '/literatures/?exclude=libraries,description&page_size=5',
+            '/literatures/?fields=libraries', '/literatures/?fields=nonsense',
+            f'{detail}?fields=title,user', f'{detail}?exclude=libraries', f'{detail}?fields=nonsense',
+            '/libraries/?fields=name', f'/libraries/{self.library.id}/?fields=name,literature_count',
+            f'/libraries/{self.library.id}/?exclude=literature',
+        ):
+            with self.subTest(path=path):
+                self.assert_same(path)
+        # A cached full payload is narrowed the same way.
+        self.assert_same(f'{detail}?fields=id')
+
+    @override_settings(DEBUG=True)
+    def test_middleware_stays_async(self):
+        # With DEBUG on, Django logs every handler it has to adapt.
+        adapted = []
+
+        def debug(message, *args, **kwargs):
+            adapted.append(message % args)
+
+        with mock.patch('django.core.handlers.base.logger.debug', side_effect=debug):
+            self.assertEqual(self.async_get('/libraries/').status_code, 200)
+        self.assertEqual(adapted, [])
+
+    def test_libraries_require_a_token(self):
+        self.headers = {}
+        self.assert_same('/libraries/', APIClient())
+        response = self.async_get('/libraries/', headers={'Authorization': 'Bearer nonsense'})
+        self.assertEqual(response.status_code, 401)
+
+
+class CachedAuthenticationTests(TestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        user_cache.reset_stats()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.library = Library.objects.create(name='Mine', user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_user_row_is_loaded_once(self):
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(self.client.get('/libraries/').status_code, 200)
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.client.get('/libraries/').status_code, 200)
+        self.assertEqual(len(first) - len(second), 1)
+        self.assertFalse(any('auth_user' in query['sql'] for query in second))
+
+        stats = user_cache.snapshot()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertIsNotNone(stats['estimated_saved_ms'])
+
+    def test_verify_user_does_not_refetch(self):
+        self.client.get('/libraries/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/users/token/refresh/')
+        self.assertEqual(response.data['user']['username'], 'reader')
+
+    def test_changes_to_the_user_invalidate(self):
+        self.client.get('/libraries/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/libraries/').status_code, 401)
+
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.client.get('/libraries/').status_code, 200)
+        self.user.delete()
+        self.assertEqual(self.client.get('/libraries/').status_code, 401)
+
+    def test_cache_is_bounded(self):
+        with self.settings(AUTH_USER_CACHE_MAX_ENTRIES=2):
+            for i in range(3):
+                user_cache.set(User.objects.create_user(f'user{i}'))
+            self.assertEqual(user_cache.snapshot()['entries'], 2)
+            self.assertEqual(user_cache.snapshot()['evictions'], 1)
+
+    def test_entries_expire(self):
+        with self.settings(AUTH_USER_CACHE_TTL=0):
+            user_cache.set(self.user)
+            self.assertIsNone(user_cache.get(self.user.id))
+
+
+class HashingAdmissionTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+
+    def login(self):
+        return self.client.post('/users/login/', {'username': 'reader', 'password': 'password'}, format='json')
+
+    def test_login_hashes_on_the_pool(self):
+        with mock.patch.object(hashing_pool, 'run', wraps=hashing_pool.run) as run:
+            response = self.login()
+        run.assert_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.data)
+        self.assertEqual(self.client.post(
+            '/users/login/', {'username': 'reader', 'password': 'wrong'}, format='json'
+        ).status_code, 401)
+
+    def test_full_slots_shed_with_retry_after(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(
+            PASSWORD_HASHING_SLOTS_DIR=directory, PASSWORD_HASHING_MAX_CONCURRENT=1,
+            PASSWORD_HASHING_RETRY_AFTER=3,
+        ):
+            # Stands in for another worker process hashing.
+            with hashing_slots.acquire():
+                started = time.perf_counter()
+                with mock.patch('main_app.hashers.hashing_pool.run') as run:
+                    response = self.login()
+                # Shed without waiting for a slot and without hashing.
+                self.assertLess(time.perf_counter() - started, 0.2)
+                run.assert_not_called()
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response['Retry-After'], '3')
+
+                response = self.client.post('/users/register/', {
+                    'username': 'newcomer', 'email': 'new@example.com', 'password': 'password',
+                }, format='json')
+                self.assertEqual(response.status_code, 503)
+                self.assertFalse(User.objects.filter(username='newcomer').exists())
+
+                # Hashing outside the DRF views is never refused.
+                self.assertTrue(User.objects.get(username='reader').check_password('password'))
+
+            self.assertEqual(self.login().status_code, 200)
+
+
+class SeedAndBenchCommandTests(TestCase):
+
+    def seed(self):
+        call_command(
+            'seed_library', users=5, libraries=10, literature=200, batch_size=50, days=10, stdout=StringIO()
+        )
+
+    def test_seed_library(self):
+        self.seed()
+        self.assertEqual(User.objects.filter(username__startswith='seed-').count(), 5)
+        self.assertEqual(Literature.objects.count(), 200)
+        self.assertEqual(Literature.objects.values('created_at').distinct().count(), 10)
+
+        out = StringIO()
+        call_command('recount_libraries', dry_run=True, stdout=out)
+        self.assertIn('would repair 0', out.getvalue())
+
+    def test_bench_api_reports_every_route(self):
+        self.seed()
+        owner = Library.objects.order_by('-literature_count').first().user
+        out = StringIO()
+        call_command(
+            'bench_api', user=owner.username, password='seed-password', iterations=1, warmup=0, stdout=out
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['uncovered'], [])
+        routes = {route['label']: route for route in report['routes']}
+        self.assertEqual(routes['literature-list']['status_codes'], [200])
+        self.assertGreater(routes['library-detail']['bytes_per_response'], 0)
+        self.assertIn('queries_per_request', routes['literature-detail'])
+        self.assertEqual(Literature.objects.count(), 200)
+
+
+class PerformanceMetricsTests(TestCase):
+
+    def setUp(self):
+        caches['literature'].clear()
+        registry.reset()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.library = Library.objects.create(name='Mine', user=self.user)
+        self.literature = make_literature(3, user=self.user, libraries=[self.library])
+
+    def test_server_timing_matches_the_queries_run(self):
+        with self.settings(METRICS_SAMPLE_RATE=1):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f'/libraries/{self.library.id}/')
+        timing = response['Server-Timing']
+        self.assertIn(f'db;desc="{len(queries)} queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+        with self.settings(METRICS_SAMPLE_RATE=0):
+            self.assertNotIn('Server-Timing', self.client.get(f'/libraries/{self.library.id}/'))
+
+    def scrape(self):
+        return APIClient().get('/metrics/', HTTP_AUTHORIZATION='Bearer secret').content.decode()
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint(self):
+        with self.settings(METRICS_SAMPLE_RATE=1):
+            self.client.get(f'/literatures/{self.literature[0].id}/')
+            self.client.get(f'/literatures/{self.literature[0].id}/')
+            body = self.scrape()
+        self.assertIn('mydigitallibrary_request_duration_seconds_count{view="literature-detail"} 2', body)
+        self.assertIn('mydigitallibrary_request_duration_seconds_bucket{view="literature-detail",le="+Inf"} 2', body)
+        self.assertIn('mydigitallibrary_db_queries_total{view="literature-detail"}', body)
+
+        self.assertEqual(APIClient().get('/metrics/').status_code, 403)
+        with self.settings(METRICS_TOKEN=None):
+            self.assertEqual(APIClient().get('/metrics/', HTTP_AUTHORIZATION='Bearer secret').status_code, 404)
+
+    def test_async_requests_are_timed(self):
+        token = str(RefreshToken.for_user(self.user).access_token)
+        with self.settings(METRICS_SAMPLE_RATE=1):
+            response = async_to_sync(AsyncClient().get)(
+                f'/async/libraries/{self.library.id}/', headers={'Authorization': f'Bearer {token}'}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'db;desc="[1-9]\d* queries"')
+        queries = int(response['Server-Timing'].split('"')[1].split()[0])
+        self.assertEqual(registry.snapshot()['counters']['db_queries_total']['async-library-detail'], queries)
+
+        async def get_response(request):
+            return HttpResponse()
+
+        # An async handler is not wrapped in a thread.
+        self.assertTrue(iscoroutinefunction(PerformanceMiddleware(get_response)))
+
+    def test_worker_files_are_merged(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_SAMPLE_RATE=1, METRICS_DIR=directory):
+            self.client.get('/libraries/')
+            # Another worker's snapshot
+            other = registry.snapshot()
+            with open(os.path.join(directory, 'metrics-1-other.json'), 'w') as stream:
+                json.dump(other, stream)
+            with self.settings(METRICS_TOKEN='secret'):
+                body = self.scrape()
+        self.assertIn('mydigitallibrary_request_duration_seconds_count{view="library-list"} 2', body)
+
+    def test_dead_worker_files_are_compacted(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(
+            METRICS_SAMPLE_RATE=1, METRICS_DIR=directory, METRICS_TOKEN='secret',
+        ):
+            self.client.get('/libraries/')
+            snapshot = registry.snapshot()
+            # Two workers that have exited; no process has a pid this large.
+            for name in ('metrics-99999999-aaaa.json', 'metrics-99999998-bbbb.json'):
+                with open(os.path.join(directory, name), 'w') as stream:
+                    json.dump(snapshot, stream)
+            abandoned = os.path.join(directory, 'abandoned.tmp')
+            fresh = os.path.join(directory, 'fresh.tmp')
+            for path in (abandoned, fresh):
+                open(path, 'w').close()
+            stale = time.time() - metrics.STALE_TEMPORARY_SECONDS - 1
+            os.utime(abandoned, (stale, stale))
+
+            expected = 'mydigitallibrary_request_duration_seconds_count{view="library-list"} 3'
+            self.assertIn(expected, self.scrape())
+            self.assertEqual(sorted(os.listdir(directory)), sorted([
+                metrics.AGGREGATE_FILENAME, metrics.LOCK_FILENAME, registry.filename, 'fresh.tmp',
+            ]))
+            # The folded counts are not lost or counted twice.
+            self.assertIn(expected, self.scrape())
+
+
+class FastPayloadParityTests(TestCase):
+    """The .values()-based payloads must match the serializers exactly."""
+
+    def setUp(self):
+        caches['literature'].clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.library = Library.objects.create(name='Mine', user=self.user)
+        theirs = Library.objects.create(name='Theirs', user=other)
+        make_literature(5, user=self.user, libraries=[theirs, self.library])
+        make_literature(5, user=None, libraries=[self.library], title='Ünïcode \u2028 title')
+        make_literature(5, user=other)
+
+    def rendered(self, data):
+        return json.loads(JSONRenderer().render(data))
+
+    def test_literature_list(self):
+        expected = LiteratureSerializer(
+            Literature.objects.with_libraries().order_by('-created_at', '-id'), many=True
+        ).data
+        response = self.client.get('/literatures/?page_size=100')
+        self.assertEqual(response.json()['results'], self.rendered(expected))
+
+        page = self.client.get('/literatures/?page_size=4').json()
+        rest = self.client.get(page['next']).json()
+        self.assertEqual(page['results'] + rest['results'][:4], self.rendered(expected)[:8])
+
+    def test_library_detail(self):
+        library = Library.objects.prefetch_related(
+            Prefetch('literature_set', queryset=Literature.objects.order_by('id'))
+        ).get(id=self.library.id)
+        response = self.client.get(f'/libraries/{self.library.id}/')
+        self.assertEqual(response.json(), self.rendered(LibraryDetailSerializer(library).data))
+
+    def test_datetimes_in_other_time_zones(self):
+        value = datetime(2026, 3, 29, 0, 30, 15, 123456, tzinfo=dt_timezone.utc)
+        for zone in ('UTC', 'Europe/Athens', 'America/New_York'):
+            with timezone.override(zone):
+                self.assertEqual(format_datetime(value), DateTimeField().to_representation(value))
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'text': 'line\u2028separator \u00e9 \U0001f600',
+            'when': timezone.now(),
+            'amount': Decimal('1.50'),
+            'nested': [{'id': 1, 'ratio': 2 / 3, 'none': None}],
+        }
+        expected = JSONRenderer().render(data)
+        self.assertEqual(renderers.FastJSONRenderer().render(data), expected)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.FastJSONRenderer().render(data), expected)
+
+    def test_renderer_differences_from_json_renderer(self):
+        data = {'floats': [1e-05, 1e16, 2 / 3, 0.1, -0.0, 1.5e300], 'text': '\u00e9\u4e2d \U0001f600 "\\'}
+        fast, expected = renderers.FastJSONRenderer().render(data), JSONRenderer().render(data)
+        self.assertEqual(json.loads(fast), json.loads(expected))
+        if renderers.orjson is not None:
+            # Same values, different notation.
+            self.assertIn(b'0.00001', fast)
+            self.assertIn(b'1e-05', expected)
+
+            # JSONRenderer refuses NaN and Infinity; orjson writes null.
+            self.assertEqual(json.loads(renderers.FastJSONRenderer().render([math.nan, math.inf])), [None, None])
+        with self.assertRaises(ValueError):
+            JSONRenderer().render([math.nan])
+
+
+class SparseFieldsetTests(TestCase):
+
+    def setUp(self):
+        caches['literature'].clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.library = Library.objects.create(name='Mine', user=self.user)
+        self.literature = make_literature(3, user=self.user, libraries=[self.library], title='Graph theory')
+
+    def get(self, url):
+        """Return the body and the SQL of each query run for it."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query['sql'] for query in queries]
+
+    def test_literature_list(self):
+        body, sql = self.get('/literatures/?fields=id,title,authors')
+        self.assertEqual(list(body['results'][0]), ['id', 'title', 'authors'])
+        # Two validator queries and the page; no libraries query.
+        self.assertEqual(len(sql), 3)
+        self.assertNotIn('"description"', sql[-1])
+
+        body, _ = self.get('/literatures/?exclude=description,libraries,url')
+        self.assertEqual(
+            list(body['results'][0]),
+            ['id', 'user', 'title', 'authors', 'literature_type', 'created_at', 'updated_at'],
+        )
+
+    def test_paging_works_without_keyset_fields(self):
+        first, _ = self.get('/literatures/?fields=title&page_size=2')
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(first['results']) + len(second['results']), 3)
+        self.assertEqual(list(second['results'][0]), ['title'])
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/literatures/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['fields'])
+        self.assertEqual(self.client.get('/libraries/?exclude=id,name,user,literature_count').status_code, 400)
+
+    def test_literature_detail_and_search(self):
+        body, _ = self.get(f'/literatures/{self.literature[0].id}/?fields=id,title')
+        self.assertEqual(body['literature'], {'id': self.literature[0].id, 'title': 'Graph theory'})
+        self.assertIn('libraries_not_associated', body)
+        # The cache keeps the full payload for the next caller.
+        body, _ = self.get(f'/literatures/{self.literature[0].id}/')
+        self.assertIn('libraries', body['literature'])
+
+        body, sql = self.get('/literatures/search/?q=graph&fields=id,title')
+        self.assertEqual(list(body['results'][0]), ['id', 'title'])
+        self.assertFalse(any('main_app_library' in query for query in sql))
+
+    def test_library_endpoints(self):
+        body, sql = self.get('/libraries/?fields=id,name')
+        self.assertEqual(body, [{'id': self.library.id, 'name': 'Mine'}])
+        self.assertNotIn('"literature_count"', sql[-1])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/libraries/{self.library.id}/?fields=name,literature_count')
+        self.assertEqual(response.json(), {'name': 'Mine', 'literature_count': 3})
+
+
+class DuplicateDetectionTests(TestCase):
+
+    def setUp(self):
+        caches['literature'].clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.original = Literature.objects.create(
+            title='Attention Is All You Need', authors='Ashish Vaswani, Noam Shazeer',
+            description='Transformers', url='https://arxiv.org/abs/1706.03762', literature_type=2, user=self.user,
+        )
+
+    def create(self, query='', **fields):
+        data = {
+            'title': 'Attention is all you need.', 'authors': 'Vaswani Ashish, Shazeer Noam',
+            'description': 'Again', 'url': 'https://example.com/other', 'literature_type': 2,
+        }
+        data.update(fields)
+        return self.client.post(f'/literatures/{query}', data, format='json')
+
+    def test_normalize_url(self):
+        self.assertEqual(
+            normalize_url('HTTP://www.Example.com/paper/?b=2&utm_source=x&a=1#top'),
+            normalize_url('https://example.com/paper?a=1&b=2'),
+        )
+        self.assertEqual(normalize_url('https://dx.doi.org/10.1000/ABC'), normalize_url('https://doi.org/10.1000/abc'))
+        self.assertNotEqual(normalize_url('https://example.com/a'), normalize_url('https://example.com/b'))
+
+    def test_create_accepts_near_duplicate_by_default(self):
+        self.assertEqual(self.create().status_code, 201)
+        self.assertEqual(Literature.objects.count(), 2)
+
+    @override_settings(LITERATURE_DUPLICATE_CHECK_ON_CREATE=True)
+    def test_create_rejects_near_duplicate(self):
+        response = self.create()
+        self.assertEqual(response.status_code, 409)
+        match = response.json()['duplicates'][0]
+        self.assertEqual((match['id'], match['reason']), (self.original.id, 'similar'))
+        self.assertGreaterEqual(match['similarity'], 0.8)
+
+        response = self.create(title='Unrelated', authors='Someone', url='http://www.arxiv.org/abs/1706.03762/')
+        self.assertEqual(response.json()['duplicates'][0]['reason'], 'url')
+
+        self.assertEqual(self.create(title='Deep residual learning', authors='Kaiming He').status_code, 201)
+        self.assertEqual(self.create('?allow_duplicate=true').status_code, 201)
+        self.assertEqual(Literature.objects.count(), 3)
+
+    def test_import_reports_and_skips_duplicates(self):
+        content = (
+            '{"title": "Attention is all you need", "authors": "A. Vaswani, N. Shazeer", "description": "x", "url": "u1", "literature_type": 2}\n'
+            '{"title": "Mastering the game of Go", "authors": "David Silver", "description": "x", "url": "u2", "literature_type": 2}\n'
+            '{"title": "Mastering the game of Go!", "authors": "Silver, David", "description": "x", "url": "u3", "literature_type": 2}\n'
+        )
+        response = self.client.post('/literatures/import/', {
+            'file': SimpleUploadedFile('rows.jsonl', content.encode('utf-8')), 'skip_duplicates': 'true',
+        }, format='multipart')
+        self.assertEqual((response.data['created'], response.data['skipped_duplicates']), (1, 2))
+        self.assertEqual(response.data['duplicates'], [
+            {'line': 1, 'duplicate_of': [self.original.id], 'duplicate_of_line': None},
+            {'line': 3, 'duplicate_of': [], 'duplicate_of_line': 2},
+        ])
+
+    def test_find_and_merge_duplicates(self):
+        first, second = Library.objects.create(name='A', user=self.user), Library.objects.create(name='B', user=self.user)
+        self.original.libraries.add(first)
+        copy = Literature.objects.create(
+            title='Attention is all you need', authors='Vaswani, Shazeer', description='', url='x',
+            literature_type=2, user=self.user,
+        )
+        copy.libraries.add(first, second)
+        make_literature(3)
+
+        out = StringIO()
+        call_command('find_duplicates', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['clusters'][0]['duplicates'], [copy.id])
+
+        call_command('merge_literature', self.original.id, copy.id, stdout=StringIO())
+        self.assertFalse(Literature.objects.filter(id=copy.id).exists())
+        self.assertEqual(set(self.original.libraries.values_list('id', flat=True)), {first.id, second.id})
+        self.assertEqual(
+            list(Library.objects.order_by('id').values_list('literature_count', flat=True)), [1, 1]
+        )
+        out = StringIO()
+        call_command('find_duplicates', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['clusters'], [])
+
+
+    def test_duplicates_are_not_merged_across_owners(self):
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        theirs = Literature.objects.create(
+            title=self.original.title, authors=self.original.authors, description='',
+            url=self.original.url, literature_type=2, user=other,
+        )
+        copy = Literature.objects.create(
+            title=self.original.title, authors=self.original.authors, description='',
+            url=self.original.url, literature_type=2, user=self.user,
+        )
+
+        out = StringIO()
+        call_command('find_duplicates', '--merge', stdout=out)
+        clusters = json.loads(out.getvalue())['clusters']
+        self.assertEqual(
+            [(entry['survivor'], entry['duplicates']) for entry in clusters], [(self.original.id, [copy.id])]
+        )
+        self.assertTrue(Literature.objects.filter(id=theirs.id).exists())
+        self.assertFalse(Literature.objects.filter(id=copy.id).exists())
+
+        with self.assertRaisesMessage(CommandError, 'belongs to another user'):
+            call_command('merge_literature', self.original.id, theirs.id, stdout=StringIO())
+        self.assertTrue(Literature.objects.filter(id=theirs.id).exists())
+
+
+class RelatedLiteratureTests(TestCase):
+
+    def setUp(self):
+        caches['literature'].clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.literature = make_literature(6, user=self.user)
+        self.libraries = [Library.objects.create(name=f'Library {i}', user=self.user) for i in range(3)]
+
+    def rows(self):
+        return set(RelatedLiterature.objects.values_list('literature_id', 'related_id', 'score', 'shared'))
+
+    def test_related_endpoint_ranks_by_cosine(self):
+        a, b, c, d = self.literature[:4]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libraries[0].literature_set.add(a, b, c)
+            self.libraries[1].literature_set.add(a, b)
+            self.libraries[2].literature_set.add(d)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/literatures/{a.id}/related/')
+        results = response.json()['results']
+        self.assertEqual([item['id'] for item in results], [b.id, c.id])
+        self.assertEqual((results[0]['score'], results[0]['shared_libraries']), (1.0, 2))
+        self.assertEqual(results[1]['score'], round(1 / 2 ** 0.5, 4))
+        self.assertEqual(results[0]['title'], b.title)
+
+        self.assertEqual(self.client.get(f'/literatures/{d.id}/related/').json()['results'], [])
+        self.assertEqual(self.client.get('/literatures/999999/related/').status_code, 404)
+
+    def test_incremental_updates_match_rebuild(self):
+        first, second, third = self.libraries
+        with self.captureOnCommitCallbacks(execute=True):
+            first.literature_set.add(*self.literature[:4])
+            second.literature_set.add(*self.literature[2:])
+            self.literature[0].libraries.add(third)
+            third.literature_set.add(self.literature[5])
+            first.literature_set.remove(self.literature[1])
+            self.client.post('/libraries/memberships/', {'operations': [
+                {'action': 'add', 'literature': self.literature[1].id, 'library': third.id},
+                {'action': 'remove', 'literature': self.literature[3].id, 'library': second.id},
+            ]}, format='json')
+            second.delete()
+        incremental = self.rows()
+
+        call_command('rebuild_related', stdout=StringIO())
+        self.assertEqual(incremental, self.rows())
+        self.assertTrue(incremental)
+
+    @override_settings(RELATED_LITERATURE_TOP_K=2, RELATED_LITERATURE_MAX_LIBRARY_SIZE=3)
+    def test_top_k_and_oversized_libraries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libraries[0].literature_set.add(*self.literature)
+            self.libraries[1].literature_set.add(*self.literature[:3])
+        self.assertEqual(
+            {(literature_id, related_id) for literature_id, related_id, _, _ in self.rows()},
+            {(a.id, b.id) for a in self.literature[:3] for b in self.literature[:3] if a != b},
+        )
+        self.assertEqual(len(self.client.get(f'/literatures/{self.literature[0].id}/related/?limit=5').json()['results']), 2)
+
+
+class LiteratureFacetTests(TestCase):
+
+    def setUp(self):
+        caches['literature'].clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.library = Library.objects.create(name='Reading list', user=self.user)
+        self.literature = make_literature(5, user=self.user, authors='Abelson, Sussman')
+        make_literature(2, user=self.other, authors='Sussman')
+        Literature.objects.filter(id=self.literature[0].id).update(created_at='2020-05-01')
+
+    def test_counts_in_two_grouped_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/literatures/facets/')
+        data = response.json()
+        self.assertEqual(data['total'], 7)
+        self.assertEqual(
+            [(item['label'], item['count']) for item in data['literature_type']],
+            [('Book', 2), ('Article', 2), ('Journal', 1), ('Conference Paper', 1), ('Thesis', 1)],
+        )
+        self.assertEqual(data['year'], [{'value': timezone.now().year, 'count': 6}, {'value': 2020, 'count': 1}])
+        self.assertEqual(
+            [(item['label'], item['count']) for item in data['authors']], [('Sussman', 7), ('Abelson', 5)]
+        )
+
+        with self.assertNumQueries(0):
+            self.client.get('/literatures/facets/')
+        self.assertEqual(self.client.get(f'/literatures/facets/?user={self.other.id}').json()['total'], 2)
+
+    def test_library_scope_and_invalidation(self):
+        url = f'/literatures/facets/?library={self.library.id}'
+        self.assertEqual(self.client.get(url).json()['total'], 0)
+        self.library.literature_set.add(*self.literature[:3])
+        self.assertEqual(self.client.get(url).json()['total'], 3)
+        self.literature[0].delete()
+        self.assertEqual(self.client.get(url).json()['total'], 2)
+        self.assertEqual(self.client.get('/literatures/facets/').json()['total'], 6)
+
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+class AuthorTests(TestCase):
+
+    def setUp(self):
+        caches['literature'].clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def byline(self, literature_id):
+        return list(
+            LiteratureAuthor.objects.filter(literature_id=literature_id).order_by('position')
+            .values_list('author__name', flat=True)
+        )
+
+    def test_split_authors(self):
+        cases = {
+            'Donald Knuth, Leslie Lamport': ['Donald Knuth', 'Leslie Lamport'],
+            'Abelson, Sussman': ['Abelson', 'Sussman'],
+            'Doe, J.': ['Doe, J.'],
+            'Doe, Jane;': ['Doe, Jane'],
+            'Doe, Jane; Roe, Richard': ['Doe, Jane', 'Roe, Richard'],
+            'Doe, Jane and Roe, Richard': ['Doe, Jane', 'Roe, Richard'],
+            'Simon & Garfunkel': ['Simon', 'Garfunkel'],
+            'Knuth, D. E., Lamport, L.': ['Knuth, D. E.', 'Lamport, L.'],
+            'Knuth, Lamport, and Hoare': ['Knuth', 'Lamport', 'Hoare'],
+            'Jane Doe AND Richard Roe et al.': ['Jane Doe', 'Richard Roe'],
+        }
+        for authors, names in cases.items():
+            with self.subTest(authors=authors):
+                self.assertEqual(split_authors(authors), names)
+        names = ['Doe, Jane', 'Roe, Richard']
+        self.assertEqual(display_authors(names), 'Doe, Jane; Roe, Richard')
+        self.assertEqual(split_authors(display_authors(names)), names)
+
+        literature = make_literature(1, user=self.user, authors='Doe, Jane and Roe, Richard')[0]
+        self.assertEqual(self.byline(literature.id), names)
+
+    def test_long_bylines_are_kept_whole(self):
+        names = [f'Contributor Number {i}' for i in range(12)]
+        response = self.client.post('/literatures/', {
+            'title': 'Big collaboration', 'author_names': names, 'description': 'Description',
+            'url': 'https://example.com/big', 'literature_type': 2,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data['authors'].endswith(' et al.'))
+        self.assertLessEqual(len(response.data['authors']), 100)
+        self.assertEqual(self.byline(response.data['id']), names)
+
+        bibtex = (
+            '@article{big,\n  title = {Bigger},\n  abstract = {Abstract},\n  url = {https://example.com/bigger},\n'
+            '  author = {' + ' and '.join(names + ['Last One']) + '},\n}\n'
+        )
+        self.client.post('/literatures/import/', {
+            'file': SimpleUploadedFile('refs.bib', bibtex.encode('utf-8')),
+        }, format='multipart')
+        imported = Literature.objects.get(title='Bigger')
+        self.assertEqual(self.byline(imported.id), names + ['Last One'])
+
+    def test_autocomplete_and_author_filter(self):
+        first, second = make_literature(2, user=self.user, authors='Donald Knuth, Leslie Lamport')
+        other = make_literature(1, user=self.user, authors='donald  KNUTH')[0]
+        self.assertEqual(Author.objects.filter(name__icontains='knuth').count(), 1)
+        self.assertEqual(self.byline(other.id), ['Donald Knuth'])
+
+        results = self.client.get('/authors/?q=DON').json()['results']
+        self.assertEqual([item['name'] for item in results], ['Donald Knuth'])
+        knuth = results[0]['id']
+        lamport = self.client.get('/authors/?q=leslie').json()['results'][0]['id']
+        ids = [item['id'] for item in self.client.get(f'/literatures/?author={lamport}').json()['results']]
+        self.assertEqual(sorted(ids), [first.id, second.id])
+        ids = [item['id'] for item in self.client.get(f'/literatures/?author={knuth},{lamport}').json()['results']]
+        self.assertEqual(sorted(ids), [first.id, second.id, other.id])
+
+        response = self.client.patch(f'/literatures/{first.id}/', {'authors': 'Leslie Lamport'}, format='json')
+        self.assertEqual(response.data['authors'], 'Leslie Lamport')
+        self.assertEqual(self.byline(first.id), ['Leslie Lamport'])
+        second.delete()
+        first.delete()
+        self.assertEqual(self.client.get('/authors/?q=les').json()['results'], [])
+        self.assertEqual(self.client.get('/authors/').status_code, 400)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    """The test 'replica' is a separate, empty SQLite database, so reads that reach it are easy to tell apart."""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        caches['literature'].clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        make_literature(2, user=self.user)
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self.client.get('/literatures/').json()['results'], [])
+        Literature.objects.using('replica').create(
+            title='Replica', authors='Author', description='Description', url='https://example.com/r', literature_type=1,
+        )
+        results = self.client.get('/literatures/').json()['results']
+        self.assertEqual([item['title'] for item in results], ['Replica'])
+
+    def test_async_reads_go_to_the_replica(self):
+        response = async_to_sync(AsyncClient().get)('/async/literatures/')
+        self.assertEqual(response.json()['results'], [])
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        response = self.client.post('/libraries/', {'name': 'Reading list'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('db_pinned', response.cookies)
+        self.assertEqual(len(self.client.get('/literatures/').json()['results']), 2)
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get('/literatures/').json()['results'], [])
+
+    def test_pin_header_is_echoed_without_cookies(self):
+        # The cross-origin SPA sends no cookies; it echoes the header instead.
+        response = self.client.post('/libraries/', {'name': 'Reading list'}, format='json')
+        token = response['X-DB-Pin']
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/literatures/').json()['results'], [])
+        results = client.get('/literatures/', HTTP_X_DB_PIN=token).json()['results']
+        self.assertEqual(len(results), 2)
+        self.assertEqual(client.cookies, {})
+
+        # A forged token, or one past DATABASE_REPLICA_PIN_SECONDS, is ignored.
+        self.assertEqual(client.get('/literatures/', HTTP_X_DB_PIN='1').json()['results'], [])
+        with self.settings(DATABASE_REPLICA_PIN_SECONDS=-1):
+            self.assertEqual(client.get('/literatures/', HTTP_X_DB_PIN=token).json()['results'], [])
+
+    def test_pin_header_is_exposed_to_the_spa(self):
+        origin = {'HTTP_ORIGIN': 'http://localhost:5173'}
+        response = self.client.post('/libraries/', {'name': 'Reading list'}, format='json', **origin)
+        self.assertIn('x-db-pin', response['Access-Control-Expose-Headers'].lower())
+        preflight = self.client.options(
+            '/literatures/', HTTP_ACCESS_CONTROL_REQUEST_METHOD='GET',
+            HTTP_ACCESS_CONTROL_REQUEST_HEADERS='x-db-pin', **origin,
+        )
+        self.assertIn('x-db-pin', preflight['Access-Control-Allow-Headers'].lower())
+
+    def test_a_write_pins_the_rest_of_the_request(self):
+        token = current_routing.set(RequestRouting())
+        try:
+            self.assertEqual(Literature.objects.all().db, 'replica')
+            Library.objects.create(name='Reading list', user=self.user)
+            self.assertEqual(Literature.objects.all().db, 'default')
+        finally:
+            current_routing.reset(token)
+        self.assertEqual(Literature.objects.all().db, 'default')
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        caches['literature'].clear()
+        self.files = tempfile.TemporaryDirectory()
+        self.addCleanup(self.files.cleanup)
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.library = Library.objects.create(name='Reading list', user=self.user)
+
+    def run_jobs(self):
+        with self.settings(JOB_FILES_DIR=self.files.name):
+            call_command('run_jobs', workers=1, once=True, stdout=StringIO())
+
+    @override_settings(LIBRARY_DELETE_BACKGROUND_SIZE=2, JOB_BATCH_SIZE=2)
+    def test_large_library_delete_runs_in_background(self):
+        literature = make_literature(5, user=self.user, libraries=[self.library])
+        response = self.client.delete(f'/libraries/{self.library.id}/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Location'], f'/jobs/{response.data["id"]}/')
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertTrue(Library.objects.filter(id=self.library.id).exists())
+
+        self.run_jobs()
+        job = self.client.get(response['Location']).json()
+        self.assertEqual((job['status'], job['progress'], job['total']), ('succeeded', 5, 5))
+        self.assertEqual(job['result'], {'deleted': True, 'unlinked': 5})
+        self.assertFalse(Library.objects.filter(id=self.library.id).exists())
+        self.assertEqual(Literature.objects.filter(id__in=[item.id for item in literature]).count(), 5)
+
+        self.client.force_authenticate(User.objects.create_user('other', 'other@example.com', 'password'))
+        self.assertEqual(self.client.get(response['Location']).status_code, 404)
+
+    def test_background_import_and_export(self):
+        with self.settings(JOB_FILES_DIR=self.files.name):
+            response = self.client.post('/literatures/import/', {
+                'file': SimpleUploadedFile('refs.csv', (
+                    'title,authors,description,url,literature_type\n'
+                    'First,Ada Lovelace,Notes,https://example.com/1,1\n'
+                    'Second,Alan Turing,Paper,https://example.com/2,2\n'
+                ).encode('utf-8')),
+                'library': self.library.id, 'background': 'true',
+            }, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        self.run_jobs()
+        job = Job.objects.get(id=response.data['id'])
+        self.assertEqual((job.status, job.result['created'], job.progress), (Job.SUCCEEDED, 2, 2))
+        self.assertEqual(os.listdir(self.files.name), [])
+
+        response = self.client.get(f'/libraries/{self.library.id}/export/csv/?background=true')
+        self.assertEqual(self.client.get(f'/jobs/{response.data["id"]}/download/').status_code, 409)
+        self.run_jobs()
+        with self.settings(JOB_FILES_DIR=self.files.name):
+            download = self.client.get(f'/jobs/{response.data["id"]}/download/')
+        self.assertEqual(download['Content-Disposition'], f'attachment; filename="library-{self.library.id}.csv"')
+        content = b''.join(download.streaming_content).decode('utf-8')
+        self.assertIn('Ada Lovelace', content)
+        self.assertIn('Alan Turing', content)
+
+    def test_claims_failures_and_stale_jobs(self):
+        with mock.patch.dict(jobs.HANDLERS, {'boom': lambda context: 1 / 0, 'noop': lambda context: None}):
+            first = jobs.enqueue('boom')
+            second = jobs.enqueue('noop')
+            self.assertEqual(jobs.claim('worker-a').id, first.id)
+            self.assertEqual(jobs.claim('worker-b').id, second.id)
+            self.assertIsNone(jobs.claim('worker-c'))
+
+            with self.assertLogs('main_app.jobs', 'ERROR'):
+                jobs.run_job(Job.objects.get(id=first.id))
+            first.refresh_from_db()
+            self.assertEqual(first.status, Job.FAILED)
+            self.assertIn('ZeroDivisionError', first.error)
+            with self.assertRaises(ValueError):
+                jobs.enqueue('missing')
+
+        Job.objects.filter(id=second.id).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.fail_stale_jobs(), 1)
+        self.assertEqual(Job.objects.get(id=second.id).status, Job.FAILED)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, token):
+        response = self.client.get(f'/sync/?since={token}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_changes_are_compacted_and_scoped_to_the_caller(self):
+        start = self.client.get('/sync/').json()
+        self.assertTrue(start['reset'])
+        with self.captureOnCommitCallbacks(execute=True):
+            library = Library.objects.create(name='Reading list', user=self.user)
+            own, filed = make_literature(2, user=self.user)
+            filed_id = filed.id
+            foreign = make_literature(1, user=self.other, title='Foreign')[0]
+            foreign.libraries.add(library)
+            own.title = 'Renamed'
+            own.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            filed.delete()
+            make_literature(1, user=self.other, title='Unrelated')
+
+        changes = self.sync(start['token'])
+        self.assertEqual(changes['libraries'], {
+            'changed': [{'id': library.id, 'name': 'Reading list', 'user': self.user.id, 'literature_count': 1}],
+            'deleted': [],
+        })
+        self.assertEqual([item['title'] for item in changes['literature']['changed']], ['Renamed', 'Foreign'])
+        self.assertEqual(changes['literature']['deleted'], [filed_id])
+        self.assertEqual(changes['memberships'], {'added': [{'literature': foreign.id, 'library': library.id}], 'removed': []})
+        self.assertEqual(self.sync(changes['token'])['literature'], {'changed': [], 'deleted': []})
+
+        # Literature filed in the caller's library reaches them when its owner edits it.
+        with self.captureOnCommitCallbacks(execute=True):
+            foreign.title = 'Edited'
+            foreign.save()
+            library_id = library.id
+            library.delete()
+        later = self.sync(changes['token'])
+        self.assertEqual([item['title'] for item in later['literature']['changed']], ['Edited'])
+        self.assertEqual(later['libraries'], {'changed': [], 'deleted': [library_id]})
+        self.assertEqual(later['memberships'], {'added': [], 'removed': []})
+
+    @override_settings(SYNC_BATCH_SIZE=2, SYNC_LOG_MAX_ROWS=3, SYNC_LOG_PRUNE_INTERVAL=1)
+    def test_batches_settle_window_and_expired_tokens(self):
+        start = self.client.get('/sync/').json()['token']
+        with self.captureOnCommitCallbacks(execute=True):
+            make_literature(3, user=self.user)
+        first = self.sync(start)
+        self.assertTrue(first['more'])
+        self.assertEqual(len(first['literature']['changed']), 2)
+        second = self.sync(first['token'])
+        self.assertFalse(second['more'])
+        self.assertEqual(len(second['literature']['changed']), 1)
+
+        with self.settings(SYNC_SETTLE_SECONDS=60), self.captureOnCommitCallbacks(execute=True):
+            make_literature(1, user=self.user)
+            self.assertEqual(self.sync(second['token'])['literature']['changed'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_literature(3, user=self.user)
+        self.assertEqual(Change.objects.count(), 3)
+        response = self.client.get(f'/sync/?since={second["token"]}')
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(response.json()['reset'])
+        self.assertEqual(response.json()['token'], str(Change.objects.latest('id').id))
+        self.assertEqual(self.client.get('/sync/?since=x').status_code, 400)
+
+
+@override_settings(LIBRARY_LITERATURE_PAGE_SIZE=3)
+class LibraryLiteraturePageTests(TestCase):
+
+    def setUp(self):
+        caches['literature'].clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.library = Library.objects.create(name='Mine', user=self.user)
+        self.literature = make_literature(7, user=self.user, libraries=[self.library])
+
+    def test_nested_page_and_follow_up_pages(self):
+        with self.assertNumQueries(3):
+            body = self.client.get(f'/libraries/{self.library.id}/').json()
+        self.assertEqual(body['literature_count'], 7)
+        self.assertEqual([item['id'] for item in body['literature']], [item.id for item in self.literature[:3]])
+        self.assertTrue(body['literature_next'].startswith(f'http://testserver/libraries/{self.library.id}/literature/?'))
+
+        seen = [item['id'] for item in body['literature']]
+        link = body['literature_next']
+        while link:
+            page = self.client.get(link).json()
+            seen.extend(item['id'] for item in page['results'])
+            link = page['next']
+        self.assertEqual(seen, [item.id for item in self.literature])
+
+        # The header still costs the same queries in a bigger library.
+        make_literature(20, user=self.user, libraries=[self.library])
+        with self.assertNumQueries(3):
+            self.client.get(f'/libraries/{self.library.id}/')
+
+    def test_ordering_filter_and_page_size(self):
+        body = self.client.get(f'/libraries/{self.library.id}/?ordering=-title&literature_type=1,2&page_size=1').json()
+        titles = [item['title'] for item in body['literature']]
+        link = body['literature_next']
+        while link:
+            page = self.client.get(link).json()
+            self.assertEqual(len(page['results']), 1)
+            titles.extend(item['title'] for item in page['results'])
+            link = page['next']
+        self.assertEqual(titles, ['Title 6', 'Title 5', 'Title 1', 'Title 0'])
+
+        self.assertEqual(self.client.get(f'/libraries/{self.library.id}/?ordering=url').status_code, 400)
+        theirs = Library.objects.create(name='Theirs', user=User.objects.create_user('other', 'o@example.com', 'pw'))
+        self.assertEqual(self.client.get(f'/libraries/{theirs.id}/literature/').status_code, 404)
 
-# Create your tests here.
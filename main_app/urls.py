@@ -2,28 +2,60 @@
 from django.contrib import admin
 from django.urls import path, include
 from .views import (
-    LiteratureList, LiteratureDetail, 
-    LibraryList, LibraryDetail, 
-    CreateUserView, LoginView, VerifyUserView,
-    AddLibraryToLiterature, RemoveLibraryFromLiterature
+    LiteratureList, LiteratureDetail, LiteratureSearch, LiteratureImport, LiteratureExport,
+    LiteratureCacheStats, LiteratureFacets, LiteratureRelated,
+    LibraryList, LibraryDetail, LibraryLiterature, LibraryExport,
+    AuthorAutocomplete, AuthorReparse, JobDetail, JobDownload,
+    CreateUserView, LoginView, VerifyUserView, UserCacheStats, MetricsView, SyncView,
+    AddLibraryToLiterature, RemoveLibraryFromLiterature, LibraryMembershipBatch
 )
 
+from .async_views import AsyncLiteratureList, AsyncLiteratureDetail, AsyncLibraryList, AsyncLibraryDetail
+
 urlpatterns = [
     path('users/register/', CreateUserView.as_view(), name='register'),
     path('users/login/', LoginView.as_view(), name='login'),
     path('users/token/refresh/', VerifyUserView.as_view(), name='token_refresh'),
+    path('users/cache-stats/', UserCacheStats.as_view(), name='user-cache-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     
     
     path('literatures/', LiteratureList.as_view(), name='literature-list'),
+    path('literatures/import/', LiteratureImport.as_view(), name='literature-import'),
+    path('literatures/export/<str:export_format>/', LiteratureExport.as_view(), name='literature-export'),
+    path('literatures/cache-stats/', LiteratureCacheStats.as_view(), name='literature-cache-stats'),
+    path('literatures/search/', LiteratureSearch.as_view(), name='literature-search'),
+    path('literatures/facets/', LiteratureFacets.as_view(), name='literature-facets'),
     path('literatures/<int:id>/', LiteratureDetail.as_view(), name='literature-detail'),
+    path('literatures/<int:id>/related/', LiteratureRelated.as_view(), name='literature-related'),
     
     
+    path('authors/', AuthorAutocomplete.as_view(), name='author-autocomplete'),
+    path('authors/reparse/', AuthorReparse.as_view(), name='author-reparse'),
+
+
     path('libraries/', LibraryList.as_view(), name='library-list'),
     path('libraries/<int:id>/', LibraryDetail.as_view(), name='library-detail'),
+    path('libraries/<int:id>/literature/', LibraryLiterature.as_view(), name='library-literature'),
+    path('libraries/<int:id>/export/<str:export_format>/', LibraryExport.as_view(), name='library-export'),
     
     
     path('literatures/<int:literature_id>/add-library/<int:library_id>/', 
          AddLibraryToLiterature.as_view(), name='add-library'),
     path('literatures/<int:literature_id>/remove-library/<int:library_id>/', 
          RemoveLibraryFromLiterature.as_view(), name='remove-library'),
-]
\ No newline at end of file
+    path('libraries/memberships/', LibraryMembershipBatch.as_view(), name='library-memberships'),
+    
+    
+    path('jobs/<int:id>/', JobDetail.as_view(), name='job-detail'),
+    path('jobs/<int:id>/download/', JobDownload.as_view(), name='job-download'),
+
+
+    path('sync/', SyncView.as_view(), name='sync'),
+
+
+    path('async/literatures/', AsyncLiteratureList.as_view(), name='async-literature-list'),
+    path('async/literatures/<int:id>/', AsyncLiteratureDetail.as_view(), name='async-literature-detail'),
+    path('async/libraries/', AsyncLibraryList.as_view(), name='async-library-list'),
+    path('async/libraries/<int:id>/', AsyncLibraryDetail.as_view(), name='async-library-detail'),
+]
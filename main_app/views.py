@@ -1,15 +1,53 @@
 
+import io
+
+from django.db.models import Count, Max, Subquery
 from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import generics, status, permissions
+from rest_framework.parsers import MultiPartParser
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from .models import Literature, Library
-from .serializers import UserSerializer, LiteratureSerializer, LibrarySerializer, LibraryDetailSerializer
-from rest_framework.exceptions import PermissionDenied
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from .models import Job, Literature, Library
+from .serializers import (
+    UserSerializer, LiteratureSerializer, LibrarySerializer, LibraryDetailSerializer,
+    MembershipBatchSerializer
+)
+from rest_framework.exceptions import NotAuthenticated, NotFound, PermissionDenied, ValidationError
 from rest_framework.permissions import IsAuthenticatedOrReadOnly  # Add this import
+from .authentication import user_cache
+from .authors import autocomplete
+from .cache import literature_cache
+from .conditional import ConditionalGetMixin
+from .duplicates import fingerprint, similarity_index
+from .exporters import streaming_export
+from .facets import facet_cache
+from .fieldsets import (
+    LIBRARY_COLUMN_MAP, LIBRARY_DETAIL_FIELDS, LIBRARY_FIELDS, LITERATURE_COLUMN_MAP, LITERATURE_FIELDS,
+    SparseFieldsetViewMixin, model_columns, select_fields,
+)
+from .filters import LITERATURE_FILTERS, filter_literature, parse_id, parse_id_list
+from .formats import FormatError, get_reader, get_writer, guess_format
+from .hashers import hashing_slots
+from .importers import LiteratureImporter
+from .jobs import enqueue, job_file_path, job_payload, save_upload
+from .membership import apply_membership_operations, write_memberships
+from .metrics import registry, render_prometheus
+from .pagination import LibraryLiteraturePagination, LiteratureCursorPagination
+from .payloads import (
+    library_detail_payload, library_literature, library_literature_page, literature_columns, literature_payloads,
+    simple_literature_payloads,
+)
+from .related import related_index
+from .routing import pin_to_primary
+from .search import search_literature
+from .sync import changes_since, reset_payload
 
 
 
@@ -18,7 +56,8 @@ class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
 
     def create(self, request, *args, **kwargs):
-        response = super().create(request, *args, **kwargs)
+        with hashing_slots.acquire():
+            response = super().create(request, *args, **kwargs)
         user = User.objects.get(username=response.data['username'])
         refresh = RefreshToken.for_user(user)
         return Response({
@@ -34,7 +73,8 @@ class LoginView(APIView):
     def post(self, request):
         username = request.data.get('username')
         password = request.data.get('password')
-        user = authenticate(username=username, password=password)
+        with hashing_slots.acquire():
+            user = authenticate(username=username, password=password)
         if user:
             refresh = RefreshToken.for_user(user)
             return Response({
@@ -49,23 +89,99 @@ class VerifyUserView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        user = User.objects.get(username=request.user)
         refresh = RefreshToken.for_user(request.user)
         return Response({
             'refresh': str(refresh),
             'access': str(refresh.access_token),
-            'user': UserSerializer(user).data
+            'user': UserSerializer(request.user).data
         })
 
 
-class LiteratureList(generics.ListCreateAPIView):
+class UserCacheStats(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(user_cache.snapshot())
+
+
+class MetricsView(APIView):
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        # Hidden until a token is configured.
+        token = settings.METRICS_TOKEN
+        if not token:
+            raise NotFound()
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            raise PermissionDenied()
+        return HttpResponse(
+            render_prometheus(registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+
+
+def is_true(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def job_accepted(job):
+    """202 for work handed to `manage.py run_jobs`; poll the Location for progress."""
+    location = reverse('job-detail', args=[job.id])
+    return Response(job_payload(job), status=status.HTTP_202_ACCEPTED, headers={'Location': location})
+
+
+def check_export_format(export_format):
+    try:
+        get_writer(export_format)
+    except FormatError as exc:
+        raise ValidationError({'format': str(exc)})
+
+
+class LiteratureList(ConditionalGetMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
     serializer_class = LiteratureSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]  
+    pagination_class = LiteratureCursorPagination
+    sparse_fields = LITERATURE_FIELDS
 
     def get_queryset(self):
-        
-        
-        return Literature.objects.all()
+        return filter_literature(Literature.objects.with_libraries(), self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        # Same output as LiteratureSerializer, built from .values() rows.
+        fieldset = self.get_fieldset()
+        queryset = filter_literature(
+            Literature.objects.values(*literature_columns(fieldset)), request.query_params
+        )
+        rows = self.paginate_queryset(queryset)
+        return self.get_paginated_response(literature_payloads(rows, fieldset))
+
+    def get_validators(self, request):
+        # Run the page query on timestamps only, then check its libraries.
+        queryset = filter_literature(
+            Literature.objects.only('id', 'created_at', 'updated_at'), request.query_params
+        )
+        rows = self.pagination_class().paginate_rows(queryset, request.query_params)
+        libraries_updated = Library.objects.filter(
+            literature__in=[row.id for row in rows]
+        ).aggregate(latest=Max('updated_at'))['latest']
+
+        stamps = [row.updated_at for row in rows] + [libraries_updated]
+        parts = ([(row.id, row.updated_at) for row in rows], libraries_updated)
+        return parts, max(filter(None, stamps), default=None)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if settings.LITERATURE_DUPLICATE_CHECK_ON_CREATE and not is_true(request.query_params.get('allow_duplicate')):
+            duplicates = similarity_index.find([fingerprint(serializer.validated_data)])[0]
+            if duplicates:
+                return Response({
+                    'detail': 'This literature looks like a duplicate. Pass ?allow_duplicate=true to create it anyway.',
+                    'duplicates': duplicates,
+                }, status=status.HTTP_409_CONFLICT)
+        self.perform_create(serializer)
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
     def perform_create(self, serializer):
         # Only authenticated users can create
@@ -75,34 +191,234 @@ class LiteratureList(generics.ListCreateAPIView):
             raise PermissionDenied({"message": "You must be logged in to create literature."})
 
 
-class LiteratureDetail(generics.RetrieveUpdateDestroyAPIView):
+class LiteratureImport(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'No file was uploaded.'})
+
+        format_name = request.data.get('format') or guess_format(upload.name)
+        if not format_name:
+            raise ValidationError({'format': 'Could not tell the format from the file name; pass it explicitly.'})
+        try:
+            get_reader(format_name)
+        except FormatError as exc:
+            raise ValidationError({'format': str(exc)})
+
+        try:
+            batch_size = int(request.data.get('batch_size') or settings.LITERATURE_IMPORT_BATCH_SIZE)
+        except ValueError:
+            raise ValidationError({'batch_size': 'Expected an integer.'})
+        batch_size = max(1, min(batch_size, settings.LITERATURE_IMPORT_MAX_BATCH_SIZE))
+
+        library = None
+        library_id = request.data.get('library')
+        if library_id:
+            try:
+                library = Library.objects.get(id=library_id)
+            except (Library.DoesNotExist, ValueError):
+                return Response(
+                    {'error': 'Library not found.'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            if library.user_id != request.user.id:
+                return Response(
+                    {'error': 'You do not own this library.'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+        skip_duplicates = is_true(request.data.get('skip_duplicates'))
+        if upload.size > settings.LITERATURE_IMPORT_BACKGROUND_BYTES or is_true(request.data.get('background')):
+            return job_accepted(enqueue(
+                'import_literature', user=request.user, filename=save_upload(upload), format_name=format_name,
+                library_id=library.id if library else None, batch_size=batch_size, skip_duplicates=skip_duplicates,
+            ))
+
+        importer = LiteratureImporter(
+            request.user, library=library, batch_size=batch_size, skip_duplicates=skip_duplicates,
+        )
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            report = importer.run(stream, format_name)
+        except UnicodeDecodeError:
+            raise ValidationError({'file': 'The file must be UTF-8 encoded.'})
+        return Response(report)
+
+
+class LiteratureExport(APIView):
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request, export_format):
+        check_export_format(export_format)
+        if is_true(request.query_params.get('background')):
+            if not request.user.is_authenticated:
+                raise NotAuthenticated()
+            filters = {name: request.query_params[name] for name in LITERATURE_FILTERS if name in request.query_params}
+            return job_accepted(enqueue('export_literature', user=request.user, format_name=export_format, filters=filters))
+        queryset = filter_literature(Literature.objects.all(), request.query_params)
+        return streaming_export(queryset, export_format, 'literature')
+
+
+class LiteratureSearch(SparseFieldsetViewMixin, generics.GenericAPIView):
+    serializer_class = LiteratureSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    sparse_fields = LITERATURE_FIELDS
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This query parameter is required.'})
+
+        literature_types = parse_id_list(request.query_params, 'literature_type')
+        limit = LiteratureCursorPagination().get_page_size(request.query_params)
+        fieldset = self.get_fieldset()
+        queryset = Literature.objects.all()
+        if fieldset is not None:
+            queryset = queryset.only(*model_columns(fieldset, LITERATURE_COLUMN_MAP))
+        if fieldset is None or 'libraries' in fieldset:
+            queryset = queryset.with_libraries()
+        results = search_literature(query, literature_types, limit, queryset=queryset)
+        return Response({
+            'query': query,
+            'results': self.get_serializer(results, many=True).data
+        })
+
+
+class LiteratureFacets(APIView):
+    """
+    Counts per literature type, per year and for the top authors, over the
+    whole catalogue, ?user=<id> or ?library=<id> (one of your own).
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request):
+        user_id = parse_id(request.query_params, 'user')
+        library_id = parse_id(request.query_params, 'library')
+        if library_id is not None:
+            if not request.user.is_authenticated:
+                raise NotAuthenticated()
+            if not Library.objects.filter(id=library_id, user=request.user).exists():
+                raise NotFound()
+        facets = facet_cache.get_facets(user_id, library_id)
+        return Response({'user': user_id, 'library': library_id, **facets})
+
+
+class LiteratureRelated(APIView):
+    """Literature most often filed in the same libraries, best first."""
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request, id):
+        try:
+            limit = int(request.query_params.get('limit') or settings.RELATED_LITERATURE_TOP_K)
+        except ValueError:
+            raise ValidationError({'limit': 'Expected an integer.'})
+        limit = max(1, min(limit, settings.RELATED_LITERATURE_TOP_K))
+
+        results = related_index.related(id, limit)
+        if not results and not Literature.objects.filter(id=id).exists():
+            raise NotFound()
+        return Response({'literature': id, 'results': results})
+
+
+class AuthorAutocomplete(APIView):
+    """Authors whose name starts with ?q=, for filtering /literatures/?author=<id>."""
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This query parameter is required.'})
+        try:
+            limit = int(request.query_params.get('limit') or settings.AUTHOR_AUTOCOMPLETE_LIMIT)
+        except ValueError:
+            raise ValidationError({'limit': 'Expected an integer.'})
+        limit = max(1, min(limit, settings.AUTHOR_AUTOCOMPLETE_LIMIT))
+        return Response({'query': query, 'results': autocomplete(query, limit)})
+
+
+class AuthorReparse(APIView):
+    """Re-parse every authors string into Author rows in the background (admin only)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        return job_accepted(enqueue('reparse_authors', user=request.user))
+
+
+class LiteratureCacheStats(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(literature_cache.stats.snapshot())
+
+
+class LiteratureDetail(ConditionalGetMixin, SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Literature.objects.all()
     serializer_class = LiteratureSerializer
     lookup_field = 'id'
     permission_classes = [IsAuthenticatedOrReadOnly]
+    sparse_fields = LITERATURE_FIELDS
 
     def get_queryset(self):
-        return Literature.objects.all()
+        return Literature.objects.with_libraries()
+
+    def get_validators(self, request, id):
+        fields = ['updated_at', 'libraries_updated']
+        queryset = Literature.objects.filter(id=id).annotate(libraries_updated=Max('libraries__updated_at'))
+        if request.user.is_authenticated:
+            # The user's own libraries appear in the response too.
+            own = Library.objects.filter(user=request.user).order_by().values('user')
+            queryset = queryset.annotate(
+                user_libraries_updated=Subquery(own.annotate(latest=Max('updated_at')).values('latest')),
+                user_libraries_count=Subquery(own.annotate(total=Count('id')).values('total')),
+            )
+            fields += ['user_libraries_updated', 'user_libraries_count']
+
+        row = queryset.values_list(*fields).first()
+        if row is None:
+            raise NotFound()
+        # row[:3] holds the timestamps; the library count is not one.
+        return row, max(stamp for stamp in row[:3] if stamp is not None)
 
     
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
+        literature_id = kwargs[self.lookup_field]
+        literature = literature_cache.get_literature(literature_id)
+        if literature is None:
+            # Always cache the full payload; the fieldset is applied below.
+            instance = self.get_object()
+            literature = self.get_serializer(instance, fields=None).data
+            literature_cache.set_literature(literature_id, literature)
     
         if request.user.is_authenticated:
-            user_libraries = Library.objects.filter(user=request.user)
-            libraries_not_associated = user_libraries.exclude(id__in=instance.libraries.all())
-            user_associated_libraries = instance.libraries.filter(user=request.user)
+            membership, version = literature_cache.get_membership(literature_id, request.user.id)
+            if membership is None:
+                # The payload already lists the literature's libraries, so
+                # only the user's remaining libraries need a query.
+                associated_ids = [library['id'] for library in literature['libraries']]
+                libraries_not_associated = (
+                    Library.objects.filter(user=request.user).exclude(id__in=associated_ids)
+                )
+                membership = {
+                    'libraries_not_associated': LibrarySerializer(libraries_not_associated, many=True).data,
+                    'user_associated_libraries': [
+                        library for library in literature['libraries']
+                        if library['user'] == request.user.id
+                    ],
+                }
+                literature_cache.set_membership(literature_id, request.user.id, version, membership)
         
             return Response({
-                'literature': serializer.data,
-                'libraries_not_associated': LibrarySerializer(libraries_not_associated, many=True).data,
-                'user_associated_libraries': LibrarySerializer(user_associated_libraries, many=True).data,
-                'user_owns': instance.user == request.user
+                'literature': select_fields(literature, self.get_fieldset()),
+                'libraries_not_associated': membership['libraries_not_associated'],
+                'user_associated_libraries': membership['user_associated_libraries'],
+                'user_owns': literature['user'] == request.user.id
         })
         else:
             return Response({
-                'literature': serializer.data,
+                'literature': select_fields(literature, self.get_fieldset()),
                 'user_owns': False
         })
         
@@ -118,12 +434,23 @@ class LiteratureDetail(generics.RetrieveUpdateDestroyAPIView):
         instance.delete()
 
 
-class LibraryList(generics.ListCreateAPIView):
+class LibraryList(ConditionalGetMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
     serializer_class = LibrarySerializer  
     permission_classes = [permissions.IsAuthenticated]
+    sparse_fields = LIBRARY_FIELDS
 
     def get_queryset(self):
-        return Library.objects.filter(user=self.request.user)
+        queryset = Library.objects.filter(user=self.request.user).order_by('name', 'id')
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            queryset = queryset.only(*model_columns(fieldset, LIBRARY_COLUMN_MAP))
+        return queryset
+
+    def get_validators(self, request):
+        row = Library.objects.filter(user=request.user).aggregate(
+            latest=Max('updated_at'), total=Count('id')
+        )
+        return (row['latest'], row['total']), row['latest']
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -134,12 +461,37 @@ class LibraryList(generics.ListCreateAPIView):
         serializer.save(user=self.request.user)
 
 
-class LibraryDetail(generics.RetrieveUpdateDestroyAPIView):
+class LibraryDetail(ConditionalGetMixin, SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'id'
+    sparse_fields = LIBRARY_DETAIL_FIELDS
+
+    def get_validators(self, request, id):
+        row = (
+            Library.objects.filter(id=id, user=request.user)
+            .annotate(literature_updated=Max('literature__updated_at'))
+            .values_list('updated_at', 'literature_updated')
+            .first()
+        )
+        if row is None:
+            raise NotFound()
+        return row, max(stamp for stamp in row if stamp is not None)
 
     def get_queryset(self):
-        return Library.objects.filter(user=self.request.user)
+        queryset = Library.objects.filter(user=self.request.user)
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            queryset = queryset.only(*model_columns(fieldset, LIBRARY_COLUMN_MAP))
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        # Same output as LibraryDetailSerializer, built from .values() rows.
+        library = self.get_object()
+        fieldset = self.get_fieldset()
+        literature, literature_next = [], None
+        if fieldset is None or {'literature', 'literature_next'} & set(fieldset):
+            literature, literature_next = library_literature_page(library, request.query_params, request)
+        return Response(library_detail_payload(library, fieldset, literature, literature_next))
     
     def get_serializer_class(self):
         
@@ -152,6 +504,50 @@ class LibraryDetail(generics.RetrieveUpdateDestroyAPIView):
         context['request'] = self.request
         return context
 
+    def destroy(self, request, *args, **kwargs):
+        library = self.get_object()
+        if library.literature_count > settings.LIBRARY_DELETE_BACKGROUND_SIZE:
+            return job_accepted(enqueue('delete_library', user=request.user, library_id=library.id))
+        library.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class LibraryLiterature(generics.GenericAPIView):
+    """
+    The pages after the one nested in GET /libraries/<id>/, which links
+    here. Takes the same ?page_size=, ?ordering= and filters.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = LibraryLiteraturePagination
+
+    def get(self, request, id):
+        library = Library.objects.filter(id=id, user=request.user).first()
+        if library is None:
+            raise NotFound()
+        rows = self.paginate_queryset(library_literature(library, request.query_params))
+        return self.get_paginated_response(simple_literature_payloads(rows))
+
+
+class LibraryExport(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, id, export_format):
+        check_export_format(export_format)
+        try:
+            library = Library.objects.get(id=id, user=request.user)
+        except Library.DoesNotExist:
+            return Response(
+                {'error': 'Library not found.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if is_true(request.query_params.get('background')):
+            return job_accepted(enqueue(
+                'export_literature', user=request.user, format_name=export_format, library_id=library.id,
+                download_name=f'library-{library.id}',
+            ))
+        queryset = Literature.objects.filter(libraries=library)
+        return streaming_export(queryset, export_format, f'library-{library.id}')
+
+
 class AddLibraryToLiterature(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
@@ -167,7 +563,8 @@ class AddLibraryToLiterature(APIView):
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            literature.libraries.add(library)
+            write_memberships({library.id: library}, added=[(literature.id, library.id)])
+            library.refresh_from_db(fields=['literature_count'])
             return Response({
                 'message': f'Library {library.name} added to literature {literature.title}',
                 'library': LibrarySerializer(library).data
@@ -198,7 +595,7 @@ class RemoveLibraryFromLiterature(APIView):
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            literature.libraries.remove(library)
+            write_memberships({library.id: library}, removed=[(literature.id, library.id)])
             return Response({
                 'message': f'Library {library.name} removed from literature {literature.title}'
             })
@@ -211,4 +608,69 @@ class RemoveLibraryFromLiterature(APIView):
             return Response(
                 {'error': 'Library not found.'}, 
                 status=status.HTTP_404_NOT_FOUND
-            )
\ No newline at end of file
+            )
+
+
+class LibraryMembershipBatch(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = MembershipBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = apply_membership_operations(request.user, serializer.validated_data['operations'])
+        return Response({'results': results})
+
+
+class JobDetail(APIView):
+    """Status and progress of a background job started by the caller."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_job(self, request, id):
+        job = Job.objects.filter(id=id).first()
+        if job is None or (job.user_id != request.user.id and not request.user.is_staff):
+            raise NotFound()
+        return job
+
+    def get(self, request, id):
+        return Response(job_payload(self.get_job(request, id)))
+
+
+class JobDownload(JobDetail):
+    """The file written by a finished background export."""
+
+    def get(self, request, id):
+        job = self.get_job(request, id)
+        if job.status != Job.SUCCEEDED or not (job.result or {}).get('filename'):
+            return Response(
+                {'error': 'This job has no file to download yet.', 'status': job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        try:
+            stream = open(job_file_path(job.result['filename']), 'rb')
+        except FileNotFoundError:
+            raise NotFound('The export file has been removed.')
+        return FileResponse(
+            stream, as_attachment=True, filename=job.result['download_name'], content_type=job.result['content_type'],
+        )
+
+
+class SyncView(APIView):
+    """
+    Changes to the caller's libraries, memberships and literature since
+    ?since=<token>. Without a token, or with an expired one (410), the
+    answer is only a token: fetch everything, then sync from it.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        since = parse_id(request.query_params, 'since')
+        pin_to_primary()
+        if since is None:
+            return Response(reset_payload())
+        changes = changes_since(request.user, since)
+        if changes is None:
+            return Response({
+                'detail': 'This sync token has expired. Fetch everything again, then sync from the new token.',
+                **reset_payload(),
+            }, status=status.HTTP_410_GONE)
+        return Response(changes)
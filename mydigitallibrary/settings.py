@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,6 +32,13 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Adjust the port if your frontend runs on a different one
 ]
 
+# The SPA reads the replica pin token from writes and sends it back on its
+# next requests (see main_app/routing.py).
+from corsheaders.defaults import default_headers
+
+CORS_EXPOSE_HEADERS = ['X-DB-Pin']
+CORS_ALLOW_HEADERS = (*default_headers, 'x-db-pin')
+
 
 # Application definition
 
@@ -47,6 +55,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main_app.middleware.PerformanceMiddleware',
+    'main_app.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,10 +69,20 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'main_app.authentication.CachedJWTAuthentication',
+    ),
+    # orjson-backed when orjson is installed; see main_app/renderers.py.
+    'DEFAULT_RENDERER_CLASSES': (
+        'main_app.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
+# CachedJWTAuthentication keeps each authenticated User in a per-process
+# LRU for this many seconds, so most requests skip the auth_user lookup.
+AUTH_USER_CACHE_TTL = 60
+AUTH_USER_CACHE_MAX_ENTRIES = 10000
+
 # Configuration for simple JWT
 from datetime import timedelta
 
@@ -106,6 +126,11 @@ TEMPLATES = [
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# Connections are kept open for CONN_MAX_AGE seconds and reused by later
+# requests on the same worker, after a health check. psycopg2 has no pool of
+# its own; put PgBouncer in front of the server to share connections between
+# workers.
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -113,9 +138,117 @@ DATABASES = {
         # 'HOST': 'localhost',
         # 'USER': 'lib_admin',
         # 'PASSWORD': '123',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # A read replica: the same settings with the replica's HOST. List it in
+    # DATABASE_REPLICAS below.
+    # 'replica': {
+    #     'ENGINE': 'django.db.backends.postgresql',
+    #     'NAME': 'digitallibrary',
+    #     'HOST': 'replica.internal',
+    #     'CONN_MAX_AGE': 60,
+    #     'CONN_HEALTH_CHECKS': True,
+    # },
+}
+
+# The test suite runs against SQLite so it does not need a PostgreSQL server.
+# The second database stands in for a replica in the routing tests. It only
+# exists as a test database (in memory), so no file is created for it.
+if 'test' in sys.argv:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        },
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        },
     }
+
+# Read replicas (main_app/routing.py)
+# GET requests read from one of these DATABASES aliases; everything else,
+# and any request after it writes, uses 'default'. A write also pins the
+# client to 'default' for DATABASE_REPLICA_PIN_SECONDS, to ride out
+# replication lag: clients send the X-DB-Pin token of the write's response
+# back as a request header.
+
+DATABASE_ROUTERS = ['main_app.routing.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_PIN_SECONDS = 5
+
+
+# Caches
+# LiteratureDetail responses and facet counts are cached in the 'literature'
+# alias. Its invalidations only reach the workers that share the backend, so
+# use Redis or Memcached, for example:
+#
+#     'literature': {
+#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#         'LOCATION': 'redis://127.0.0.1:6379/1',
+#         'TIMEOUT': 300,
+#     },
+#
+# With a process-local backend such as LocMemCache nothing is cached, unless
+# LITERATURE_CACHE_ALLOW_LOCAL says the site runs as a single process.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'literature': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'literature',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'CULL_FREQUENCY': 3,
+        },
+    },
 }
 
+LITERATURE_CACHE_ALIAS = 'literature'
+# The test suite runs in a single process.
+LITERATURE_CACHE_ALLOW_LOCAL = 'test' in sys.argv
+
+
+# Request metrics
+# PerformanceMiddleware times this fraction of requests (Server-Timing
+# header plus per-view histograms at /metrics/). Point METRICS_DIR at a
+# directory shared by the gunicorn workers so /metrics/ covers all of them.
+# Keep it on the local host and empty it when the server starts; scrapes
+# fold the files of exited workers into one aggregate file.
+# /metrics/ answers 404 until METRICS_TOKEN is set, and then requires
+# `Authorization: Bearer <token>`.
+
+METRICS_SAMPLE_RATE = 0.1
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = None
+
+
+# Password hashing (main_app/hashers.py)
+# At most PASSWORD_HASHING_MAX_CONCURRENT logins and sign-ups hash at once,
+# across every worker process on the host. Others get a 503 with Retry-After
+# straight away instead of tying up more request workers. The hashes run on
+# a pool of PASSWORD_HASHING_WORKERS threads in each process.
+
+PASSWORD_HASHING_MAX_CONCURRENT = 4
+PASSWORD_HASHING_RETRY_AFTER = 1
+PASSWORD_HASHING_SLOTS_DIR = BASE_DIR / 'hashing_slots'
+PASSWORD_HASHING_WORKERS = 2
+
+# Django's PBKDF2PasswordHasher is left out: it has the same pbkdf2_sha256
+# name and would verify existing hashes off the pool.
+PASSWORD_HASHERS = [
+    'main_app.hashers.BoundedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -152,3 +285,86 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+
+# Keyset pagination for GET /literatures/
+# Clients may ask for up to LITERATURE_MAX_PAGE_SIZE rows with ?page_size=
+
+LITERATURE_PAGE_SIZE = 25
+LITERATURE_MAX_PAGE_SIZE = 100
+
+# The literature nested in GET /libraries/<id>/ is one keyset page; the
+# rest follows from /libraries/<id>/literature/ (up to
+# LIBRARY_LITERATURE_MAX_PAGE_SIZE rows with ?page_size=)
+
+LIBRARY_LITERATURE_PAGE_SIZE = 50
+LIBRARY_LITERATURE_MAX_PAGE_SIZE = 500
+
+# Bulk literature import (POST /literatures/import/ and manage.py import_literature)
+
+LITERATURE_IMPORT_BATCH_SIZE = 500
+LITERATURE_IMPORT_MAX_BATCH_SIZE = 5000
+
+# Rows fetched per round trip while streaming an export
+
+LITERATURE_EXPORT_CHUNK_SIZE = 2000
+
+# Near-duplicate detection (main_app/duplicates.py)
+# Literature whose normalized URL matches, or whose title/author shingles
+# reach this Jaccard similarity, counts as a duplicate. With
+# LITERATURE_DUPLICATE_CHECK_ON_CREATE on (it is opt-in), POST /literatures/
+# answers 409 for one unless ?allow_duplicate=true. Imports report them and
+# skip them when asked to. `manage.py find_duplicates` scans the table.
+
+LITERATURE_DUPLICATE_THRESHOLD = 0.8
+LITERATURE_DUPLICATE_MAX_MATCHES = 5
+LITERATURE_DUPLICATE_CHECK_ON_CREATE = False
+LITERATURE_DUPLICATE_CHECK_ON_IMPORT = True
+
+# Facet counts (GET /literatures/facets/, main_app/facets.py)
+# Cached in the 'literature' alias for this many seconds; any literature or
+# membership change invalidates them sooner.
+
+LITERATURE_FACETS_CACHE_TIMEOUT = 60
+LITERATURE_FACETS_TOP_AUTHORS = 10
+
+# Most names returned by GET /authors/?q= (main_app/authors.py)
+
+AUTHOR_AUTOCOMPLETE_LIMIT = 10
+
+# Related literature (GET /literatures/<id>/related/, main_app/related.py)
+# Top-K co-occurrence neighbours kept per item. Libraries larger than
+# RELATED_LITERATURE_MAX_LIBRARY_SIZE do not count towards relatedness.
+# `manage.py rebuild_related` recomputes the table from scratch.
+
+RELATED_LITERATURE_TOP_K = 10
+RELATED_LITERATURE_MAX_LIBRARY_SIZE = 1000
+
+# Background jobs (main_app/jobs.py, `manage.py run_jobs`)
+# Imports larger than LITERATURE_IMPORT_BACKGROUND_BYTES, deletes of
+# libraries holding more than LIBRARY_DELETE_BACKGROUND_SIZE items and
+# exports asked for with ?background=true answer 202 and run in a worker.
+# Uploads and finished exports are kept in JOB_FILES_DIR.
+
+JOB_WORKERS = 2
+JOB_POLL_INTERVAL = 1.0
+JOB_STALE_AFTER = 900
+JOB_BATCH_SIZE = 1000
+JOB_FILES_DIR = BASE_DIR / 'job_files'
+LITERATURE_IMPORT_BACKGROUND_BYTES = 5 * 1024 * 1024
+LIBRARY_DELETE_BACKGROUND_SIZE = 5000
+
+# Delta sync (main_app/sync.py, GET /sync/?since=<token>)
+# A batch carries at most SYNC_BATCH_SIZE log entries. Entries younger than
+# SYNC_SETTLE_SECONDS are held back until transactions that took ids before
+# them have committed. The log keeps about SYNC_LOG_MAX_ROWS entries and is
+# trimmed every SYNC_LOG_PRUNE_INTERVAL ids; older tokens get 410.
+
+SYNC_BATCH_SIZE = 500
+SYNC_SETTLE_SECONDS = 2
+SYNC_LOG_MAX_ROWS = 200_000
+SYNC_LOG_PRUNE_INTERVAL = 1000
+
+# Maximum add/remove operations accepted by POST /libraries/memberships/
+
+LIBRARY_MEMBERSHIP_BATCH_LIMIT = 1000